@@ -0,0 +1,90 @@
+"""Compare summary report latency: Mongo pipelines vs the Parquet archive.
+
+Runs the same window through
+
+* ``rollups``  - rollup collections + HyperLogLog sketches (the API default)
+* ``exact``    - rollups + exact unique visitors from raw page views
+* ``archive``  - ``services.archive_query.summary`` over Parquet files
+
+and prints per-path timings as JSON. Archive the data first
+(``python manage.py archive-events``), then from the backend directory::
+
+    python -m benchmarks.archive_vs_mongo --days 365 --repeat 5
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from services.settings import get_settings
+
+# .env first: the archive directory is read from the environment on import
+get_settings()
+
+from services import archive_query, rollups, sketches
+from services.database import MongoProvider
+
+
+async def mongo_summary(db, start: datetime, end: datetime, exact: bool):
+    return await asyncio.gather(
+        rollups.page_view_facets(db, start, end, include_daily=True),
+        rollups.top_referrers(db, start, end),
+        sketches.exact_window_uniques(db, start, end) if exact else sketches.window_uniques(db, start, end),
+    )
+
+
+def describe(samples):
+    ordered = sorted(samples)
+    return {
+        "runs": len(ordered),
+        "min_ms": round(ordered[0], 3),
+        "median_ms": round(statistics.median(ordered), 3),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+async def run(days: int, repeat: int):
+    end = datetime.utcnow()
+    start = end - timedelta(days=days)
+    timings = {"rollups": [], "exact": [], "archive": []}
+
+    mongo = MongoProvider.from_env()
+    db = mongo.connect()
+    try:
+        for _ in range(repeat):
+            for name, exact in (("rollups", False), ("exact", True)):
+                began = time.perf_counter()
+                await mongo_summary(db, start, end, exact)
+                timings[name].append((time.perf_counter() - began) * 1000)
+
+            began = time.perf_counter()
+            report = archive_query.summary(start, end)
+            timings["archive"].append((time.perf_counter() - began) * 1000)
+    finally:
+        mongo.close()
+
+    return {
+        "window_days": days,
+        "archived_views": report["total_views"],
+        "coverage": archive_query.archive_coverage(),
+        "timings": {name: describe(samples) for name, samples in timings.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.days, args.repeat)), indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
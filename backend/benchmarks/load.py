@@ -0,0 +1,302 @@
+"""Concurrent load generator and latency report for the API.
+
+Drives a weighted mix of requests with N concurrent clients and reports
+throughput, p50/p95/p99 latency and error rate per endpoint as JSON.
+
+Targets:
+
+* in-process (default): the FastAPI app is driven through httpx's ASGI
+  transport with its lifespan running, against the MONGO_URL/DB_NAME from
+  .env (use a local mongod, never production)
+* ``--memory-db``: same, but with mongomock-motor as an in-memory stand-in
+  for Mongo (``pip install mongomock-motor``); useful for app-side CPU
+  comparisons, not for database timings
+* ``--url http://127.0.0.1:8001``: a running uvicorn
+
+From the backend directory::
+
+    python -m benchmarks.load --duration 30 --concurrency 32 --output runs/today.json
+    python -m benchmarks.load --memory-db --compare runs/last-release.json
+
+Requests are spread over ``--clients`` synthetic client addresses (sent as
+X-Forwarded-For) so per-IP admission limits behave as they would for real
+visitors; 429s show up under ``status_codes`` but do not count as errors.
+The in-process targets trust one proxy hop for this. Start a server
+targeted with ``--url`` with ``ADMISSION_TRUSTED_PROXIES=1``.
+
+``--compare`` prints endpoints whose p95 or error rate regressed against an
+earlier JSON result and exits with status 1 if any did.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+from contextlib import asynccontextmanager, redirect_stdout
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+PAGES = ["/", "/#about", "/#experience", "/#projects", "/#skills", "/#contact"]
+ACTIONS = ["click", "scroll", "download", "section_view"]
+
+DEFAULT_MIX = "portfolio=50,pageview=25,interaction=15,dashboard=5,contact=5"
+
+
+def _pageview() -> Tuple[str, str, Optional[Dict[str, Any]]]:
+    return "POST", "/api/analytics/pageview", {
+        "page": random.choice(PAGES),
+        "referrer": random.choice([None, "https://www.google.com/", "https://www.linkedin.com/"]),
+        "user_agent": "benchmarks/load",
+        "session_id": f"bench-{random.randrange(500)}",
+    }
+
+
+def _interaction() -> Tuple[str, str, Optional[Dict[str, Any]]]:
+    return "POST", "/api/analytics/interaction", {
+        "action": random.choice(ACTIONS),
+        "element": "button",
+        "page": random.choice(PAGES),
+        "session_id": f"bench-{random.randrange(500)}",
+    }
+
+
+def _contact() -> Tuple[str, str, Optional[Dict[str, Any]]]:
+    return "POST", "/api/contact", {
+        "name": "Load Test",
+        "email": "load-test@example.com",
+        "subject": "Benchmark",
+        "message": f"Benchmark message {uuid.uuid4()}",
+    }
+
+
+SCENARIOS: Dict[str, Callable[[], Tuple[str, str, Optional[Dict[str, Any]]]]] = {
+    "portfolio": lambda: ("GET", "/api/portfolio", None),
+    "pageview": _pageview,
+    "interaction": _interaction,
+    "dashboard": lambda: ("GET", "/api/analytics/dashboard", None),
+    "summary": lambda: ("GET", "/api/analytics/summary", None),
+    "contact": _contact,
+}
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+@asynccontextmanager
+async def in_process_client(memory_db: bool):
+    """httpx client bound to the ASGI app, with the app lifespan running"""
+    from dataclasses import replace
+
+    from services.settings import get_settings
+
+    settings = get_settings()
+    # Requests carry their synthetic client address in X-Forwarded-For
+    os.environ.setdefault("ADMISSION_TRUSTED_PROXIES", "1")
+    if memory_db:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            raise SystemExit("--memory-db needs mongomock-motor: pip install mongomock-motor")
+        from services import database
+
+        settings = replace(
+            settings,
+            mongo_url=settings.mongo_url or "mongodb://in-memory",
+            db_name=settings.db_name or "benchmark"
+        )
+        shared = AsyncMongoMockClient()
+        database.AsyncIOMotorClient = lambda *args, **kwargs: shared
+
+    import server
+
+    app = server.create_app(settings)
+    async with server.lifespan(app):
+        if memory_db:
+            from seed_data import seed_portfolio_data
+
+            # Keep stdout clean for the JSON report
+            with redirect_stdout(sys.stderr):
+                await seed_portfolio_data(app.state.mongo.db)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            yield client
+
+
+@asynccontextmanager
+async def remote_client(url: str, concurrency: int):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30.0) as client:
+        yield client
+
+
+async def drive(
+    client: httpx.AsyncClient,
+    weights: Dict[str, float],
+    concurrency: int,
+    duration: float,
+    max_requests: Optional[int],
+    warmup: float,
+    clients: int = 1
+) -> Tuple[Dict[str, Dict[str, list]], float]:
+    names = list(weights)
+    chances = [weights[name] for name in names]
+    samples: Dict[str, Dict[str, list]] = defaultdict(lambda: {"latencies": [], "statuses": []})
+    issued = 0
+    measure_from = time.perf_counter() + warmup
+    stop_at = measure_from + duration
+
+    async def worker():
+        nonlocal issued
+        while time.perf_counter() < stop_at and (max_requests is None or issued < max_requests):
+            name = random.choices(names, chances)[0]
+            method, path, body = SCENARIOS[name]()
+            # 198.18.0.0/15 is reserved for benchmarking
+            address = random.randrange(clients)
+            headers = {"X-Forwarded-For": f"198.18.{address // 256}.{address % 256}"}
+            began = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body, headers=headers)
+                status = response.status_code
+            except httpx.HTTPError:
+                status = 0
+            finished = time.perf_counter()
+            if began >= measure_from:
+                issued += 1
+                samples[name]["latencies"].append((finished - began) * 1000)
+                samples[name]["statuses"].append(status)
+
+    began = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - max(began, measure_from)
+    return samples, elapsed
+
+
+def summarize(samples: Dict[str, Dict[str, list]], elapsed: float) -> Dict[str, Any]:
+    endpoints = {}
+    all_latencies: List[float] = []
+    all_errors = 0
+    for name, sample in sorted(samples.items()):
+        latencies = np.array(sample["latencies"])
+        statuses = np.array(sample["statuses"])
+        errors = int(((statuses == 0) | (statuses >= 500)).sum())
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        endpoints[name] = {
+            "requests": int(latencies.size),
+            "errors": errors,
+            "error_rate": round(errors / latencies.size, 4),
+            "throughput_rps": round(latencies.size / elapsed, 2),
+            "latency_ms": {
+                "p50": round(float(p50), 3),
+                "p95": round(float(p95), 3),
+                "p99": round(float(p99), 3),
+                "max": round(float(latencies.max()), 3),
+            },
+            "status_codes": {str(code): int(count) for code, count in zip(*np.unique(statuses, return_counts=True))},
+        }
+        all_latencies.extend(sample["latencies"])
+        all_errors += errors
+
+    total = len(all_latencies)
+    overall = {"requests": total, "errors": all_errors, "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0}
+    if total:
+        p50, p95, p99 = np.percentile(all_latencies, [50, 95, 99])
+        overall["error_rate"] = round(all_errors / total, 4)
+        overall["latency_ms"] = {"p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3)}
+    return {"overall": overall, "endpoints": endpoints}
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Endpoints whose p95 grew by more than ``tolerance`` or whose error rate rose"""
+    regressions = []
+    for name, current in result["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(name)
+        if previous is None:
+            continue
+        before, after = previous["latency_ms"]["p95"], current["latency_ms"]["p95"]
+        if before and after > before * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before:.1f}ms -> {after:.1f}ms")
+        if current["error_rate"] > previous["error_rate"]:
+            regressions.append(f"{name}: error rate {previous['error_rate']:.2%} -> {current['error_rate']:.2%}")
+    return regressions
+
+
+async def run(args) -> Dict[str, Any]:
+    weights = parse_mix(args.mix)
+    if args.url:
+        target = args.url
+        client_factory = remote_client(args.url, args.concurrency)
+    else:
+        target = "in-process (memory db)" if args.memory_db else "in-process"
+        client_factory = in_process_client(args.memory_db)
+
+    async with client_factory as client:
+        samples, elapsed = await drive(
+            client, weights, args.concurrency, args.duration, args.requests, args.warmup, args.clients
+        )
+
+    return {
+        "started_at": datetime.utcnow().isoformat(),
+        "config": {
+            "target": target,
+            "concurrency": args.concurrency,
+            "clients": args.clients,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "mix": weights,
+        },
+        "elapsed_seconds": round(elapsed, 3),
+        **summarize(samples, elapsed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="Base URL of a running server (default: in-process ASGI)")
+    parser.add_argument("--memory-db", action="store_true", help="In-process with an in-memory Mongo stand-in")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--clients", type=int, default=256, help="Distinct client addresses (max 131072)")
+    parser.add_argument("--duration", type=float, default=15.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Unmeasured seconds before measuring")
+    parser.add_argument("--requests", type=int, help="Stop after this many measured requests")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Weighted scenarios (default: {DEFAULT_MIX})")
+    parser.add_argument("--output", type=Path, help="Write the JSON result here")
+    parser.add_argument("--compare", type=Path, help="Earlier JSON result to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95 growth for --compare")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    encoded = json.dumps(result, indent=2)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(encoded)
+    print(encoded)
+
+    if args.compare:
+        regressions = compare(result, json.loads(args.compare.read_text()), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Per-request CPU of the serialization paths, before and after.
+
+Compares, per operation:
+
+* ingest - building the stored document from a request payload
+  (``Model(**create.dict()).dict()``, which also pays for the v1
+  deprecation shims, vs cached TypeAdapter + ``model_dump``)
+* portfolio / events / dashboard - encoding a response body
+  (``jsonable_encoder`` + ``json.dumps``, FastAPI's default for a returned
+  dict, vs ``services.serialization.dumps``)
+
+From the backend directory::
+
+    python -m benchmarks.serialization --number 2000
+"""
+import argparse
+import json
+import sys
+import timeit
+import uuid
+import warnings
+from datetime import datetime, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from fastapi.encoders import jsonable_encoder
+
+from models.analytics import AnalyticsSummary, PageView, PageViewCreate
+from seed_data import build_portfolio
+from services.serialization import PAGE_VIEW_CREATE, dumps
+
+PAYLOAD = {
+    "page": "/#projects",
+    "referrer": "https://www.google.com/",
+    "user_agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36",
+    "session_id": "session-1234",
+}
+
+
+def old_ingest():
+    return PageView(**PageViewCreate(**PAYLOAD).dict(), ip_address="203.0.113.7").dict()
+
+
+def new_ingest():
+    return PageView(
+        **PAGE_VIEW_CREATE.validate_python(PAYLOAD).model_dump(),
+        ip_address="203.0.113.7"
+    ).model_dump()
+
+
+def old_encode(content):
+    # What FastAPI does with a returned dict: jsonable_encoder, then JSONResponse.render
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def build_payloads():
+    now = datetime.utcnow()
+    events = {
+        "items": [
+            {**PAYLOAD, "id": str(uuid.uuid4()), "ip_address": "203.0.113.7",
+             "timestamp": now - timedelta(seconds=i), "duration": None}
+            for i in range(100)
+        ],
+        "next_cursor": "opaque",
+    }
+    pages = [{"page": f"/page-{i}", "views": 1000 - i, "unique_visitors": 500 - i} for i in range(10)]
+    summary = AnalyticsSummary(
+        total_views=12345,
+        unique_visitors=678,
+        popular_pages=pages,
+        top_referrers=[{"referrer": f"https://ref-{i}.example/", "count": 100 - i} for i in range(10)],
+        avg_session_duration=93.4,
+        bounce_rate=0.41,
+        contact_form_submissions=12,
+        date_range={"start": now - timedelta(days=30), "end": now},
+    )
+    dashboard = {
+        "summary": summary,
+        "daily_views": [
+            {"date": now - timedelta(days=i), "views": 400 + i, "unique_visitors": 100 + i} for i in range(30)
+        ],
+        "top_interactions": [{"action": f"action-{i}", "count": 50 - i} for i in range(10)],
+        "recent_contacts": [],
+        "last_updated": now,
+    }
+    return {
+        "portfolio": build_portfolio().model_dump(),
+        "events": events,
+        "dashboard": dashboard,
+    }
+
+
+def measure(function, number: int) -> float:
+    """Best-of-5 microseconds per call"""
+    return min(timeit.repeat(function, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=2000, help="Calls per timing run")
+    args = parser.parse_args()
+    # The old path is timed as is; only silence the deprecation output
+    warnings.simplefilter("ignore", DeprecationWarning)
+
+    cases = {"ingest": (old_ingest, new_ingest)}
+    for name, content in build_payloads().items():
+        assert json.loads(old_encode(content)) == json.loads(dumps(content)), name
+        cases[name] = (lambda content=content: old_encode(content), lambda content=content: dumps(content))
+
+    results = {}
+    for name, (old, new) in cases.items():
+        before, after = measure(old, args.number), measure(new, args.number)
+        results[name] = {
+            "before_us": round(before, 2),
+            "after_us": round(after, 2),
+            "speedup": round(before / after, 2),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Worker startup time: import, app build, lifespan startup and first request.
+
+Every run is a fresh interpreter, so nothing is cached between runs:
+
+* ``import_ms``        - ``import server``
+* ``create_app_ms``    - ``server.create_app(settings)``: route modules and the
+  app's services
+* ``startup_ms``       - lifespan startup: Mongo client, index check,
+  background tasks
+* ``first_request_ms`` - first request through the ASGI app
+* ``process_ms``       - wall time of the whole child process, interpreter
+  start included
+
+Medians, minima and maxima over ``--runs`` are printed as JSON. Use
+``--memory-db`` (needs mongomock-motor) to run without a database, and
+``--slowest N`` to also list the N slowest imports of one
+``python -X importtime`` run.
+
+From the backend directory::
+
+    python -m benchmarks.startup --memory-db --runs 10
+    python -m benchmarks.startup --path /api/analytics/dashboard --slowest 15
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+PHASES = ["import_ms", "create_app_ms", "startup_ms", "first_request_ms"]
+
+
+async def measure(path: str, memory_db: bool) -> Dict[str, float]:
+    """One startup in this process; must run in a fresh interpreter"""
+    timings = {}
+    started = time.perf_counter()
+    import server
+    timings["import_ms"] = (time.perf_counter() - started) * 1000
+
+    from dataclasses import replace
+
+    import httpx
+
+    from services.settings import get_settings
+
+    settings = get_settings()
+    if memory_db:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            raise SystemExit("--memory-db needs mongomock-motor: pip install mongomock-motor")
+        from services import database
+
+        settings = replace(
+            settings,
+            mongo_url=settings.mongo_url or "mongodb://in-memory",
+            db_name=settings.db_name or "benchmark"
+        )
+        shared = AsyncMongoMockClient()
+        database.AsyncIOMotorClient = lambda *args, **kwargs: shared
+
+    started = time.perf_counter()
+    app = server.create_app(settings)
+    timings["create_app_ms"] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    async with server.lifespan(app):
+        timings["startup_ms"] = (time.perf_counter() - started) * 1000
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            started = time.perf_counter()
+            response = await client.get(path)
+            timings["first_request_ms"] = (time.perf_counter() - started) * 1000
+            timings["status"] = response.status_code
+    return timings
+
+
+def child_command(args: argparse.Namespace) -> List[str]:
+    command = [sys.executable, "-m", "benchmarks.startup", "--child", "--path", args.path]
+    if args.memory_db:
+        command.append("--memory-db")
+    return command
+
+
+def run_child(args: argparse.Namespace) -> Dict[str, float]:
+    started = time.perf_counter()
+    completed = subprocess.run(
+        child_command(args), cwd=BACKEND_DIR, capture_output=True, text=True, check=False
+    )
+    elapsed = (time.perf_counter() - started) * 1000
+    if completed.returncode != 0:
+        raise SystemExit(f"Startup run failed:\n{completed.stderr}")
+    timings = json.loads(completed.stdout.strip().splitlines()[-1])
+    timings["process_ms"] = elapsed
+    return timings
+
+
+def slowest_imports(limit: int) -> List[Dict[str, Any]]:
+    """Largest cumulative times from ``python -X importtime -c 'import server'``"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    imports = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, name = (part.strip() for part in line.replace("import time:", "|", 1).split("|"))
+        imports.append({"module": name, "cumulative_ms": int(cumulative_us) / 1000, "self_ms": int(self_us) / 1000})
+    imports.sort(key=lambda entry: entry["cumulative_ms"], reverse=True)
+    return imports[:limit]
+
+
+def summarize(runs: List[Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    summary = {}
+    for phase in PHASES + ["process_ms"]:
+        values = [run[phase] for run in runs]
+        summary[phase] = {
+            "median": round(statistics.median(values), 2),
+            "min": round(min(values), 2),
+            "max": round(max(values), 2),
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes to start")
+    parser.add_argument("--path", default="/api/", help="Path of the first request")
+    parser.add_argument("--memory-db", action="store_true", help="In-memory Mongo stand-in")
+    parser.add_argument("--slowest", type=int, default=0, help="Also list the N slowest imports")
+    parser.add_argument("--output", type=Path, help="Write the JSON result here")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(measure(args.path, args.memory_db))))
+        return
+
+    runs = [run_child(args) for _ in range(args.runs)]
+    result = {
+        "config": {"runs": args.runs, "path": args.path, "memory_db": args.memory_db},
+        "status_codes": sorted({run["status"] for run in runs}),
+        "phases": summarize(runs),
+    }
+    if args.slowest:
+        result["slowest_imports"] = slowest_imports(args.slowest)
+
+    text = json.dumps(result, indent=2)
+    print(text)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Maintenance commands for the portfolio backend.
+
+Run from the backend directory, for example::
+
+    python manage.py rebuild-rollups --days 7
+"""
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+
+import typer
+
+from services.settings import get_settings
+
+# Loads .env before any service reads its settings from the environment
+settings = get_settings()
+
+from services.database import MongoProvider
+
+app = typer.Typer(help="Portfolio backend maintenance commands")
+
+
+def run_with_db(operation, *args, **kwargs):
+    """Run ``operation(db, *args, **kwargs)`` on a short-lived client"""
+    async def runner():
+        mongo = MongoProvider.from_settings(settings)
+        try:
+            return await operation(mongo.connect(), *args, **kwargs)
+        finally:
+            mongo.close()
+
+    return asyncio.run(runner())
+
+
+@app.command("rebuild-rollups")
+def rebuild_rollups_command(
+    days: Optional[int] = typer.Option(
+        None, help="Only rebuild the last N days (default: all retained raw history)"
+    )
+):
+    """Regenerate the analytics rollups and visitor sketches from raw events."""
+    from services.retention import clamp_to_horizon
+    from services.rollups import rebuild_rollups
+    from services.sketches import SKETCH_COLLECTION, rebuild_sketches
+
+    start = datetime.utcnow() - timedelta(days=days) if days is not None else None
+    # Never reach back past the raw-event TTL: older aggregates cannot be rebuilt
+    start = clamp_to_horizon(start)
+    written = run_with_db(rebuild_rollups, start=start)
+    written[SKETCH_COLLECTION] = run_with_db(rebuild_sketches, start=start)
+    for collection, buckets in written.items():
+        typer.echo(f"{collection}: {buckets} buckets")
+
+
+@app.command("archive-events")
+def archive_events_command(
+    since: Optional[datetime] = typer.Option(
+        None, formats=["%Y-%m-%d"], help="First day to archive (default: oldest event)"
+    ),
+    overwrite: bool = typer.Option(False, help="Rewrite days that are already archived")
+):
+    """Write closed days of raw events to the Parquet archive."""
+    from services.archive import ARCHIVE_DIR, archive_closed_days
+
+    written = run_with_db(
+        archive_closed_days,
+        since=since.date() if since else None,
+        overwrite=overwrite
+    )
+    for collection, days in written.items():
+        typer.echo(f"{collection}: {len(days)} days, {sum(days.values())} rows -> {ARCHIVE_DIR / collection}")
+
+
+@app.command("archive-summary")
+def archive_summary_command(
+    days: int = typer.Option(365, help="Report window in days, ending now")
+):
+    """Print the analytics summary computed from the Parquet archive only."""
+    from bson import json_util
+    from services.archive_query import summary
+
+    end = datetime.utcnow()
+    typer.echo(json_util.dumps(summary(end - timedelta(days=days), end), indent=2))
+
+
+@app.command("sessionize")
+def sessionize_command():
+    """Fold events since the last watermark into analytics sessions."""
+    from services.sessions import Sessionizer
+
+    processed = run_with_db(Sessionizer.from_env().run_once)
+    if processed is None:
+        typer.echo("Another worker holds the sessionizer lease; try again later", err=True)
+        raise typer.Exit(code=1)
+    typer.echo(f"{processed['events']} events, {processed['opened']} sessions opened, {processed['closed']} closed")
+
+
+@app.command("compact")
+def compact_command():
+    """Fold raw events that are about to expire into the durable aggregates."""
+    from services.retention import Compactor
+
+    compacted = run_with_db(Compactor.from_env().run_once)
+    if compacted is None:
+        typer.echo("Another worker holds the compaction lease; try again later", err=True)
+        raise typer.Exit(code=1)
+    typer.echo(f"Compacted {len(compacted)} days: {', '.join(compacted) or '-'}")
+
+
+@app.command("ensure-indexes")
+def ensure_indexes_command():
+    """Create every index declared in services/indexes.py."""
+    from services.indexes import ensure_indexes
+
+    for collection, names in run_with_db(ensure_indexes).items():
+        typer.echo(f"{collection}: {', '.join(names)}")
+
+
+@app.command("check-query-plans")
+def check_query_plans_command(
+    ensure: bool = typer.Option(True, help="Ensure indexes before explaining")
+):
+    """Explain every registered query shape and fail on any COLLSCAN."""
+    from services.indexes import check_query_plans, ensure_indexes
+
+    async def check(db):
+        if ensure:
+            await ensure_indexes(db)
+        return await check_query_plans(db)
+
+    reports = run_with_db(check)
+    for report in reports:
+        status = "COLLSCAN" if report["collscan"] else "ok"
+        typer.echo(f"{status:9} {report['name']}: {' > '.join(report['stages'])}")
+
+    regressions = [report["name"] for report in reports if report["collscan"]]
+    if regressions:
+        typer.echo(f"{len(regressions)} query shape(s) fall back to COLLSCAN", err=True)
+        raise typer.Exit(code=1)
+
+
+if __name__ == "__main__":
+    app()
@@ -21,6 +21,7 @@ class UserInteraction(BaseModel):
     session_id: Optional[str] = None
     data: Optional[Dict[str, Any]] = None  # additional interaction data
     timestamp: datetime = Field(default_factory=datetime.utcnow)
+    weight: int = 1  # interactions this one stands for when sampled; see services/sampling.py
 
 class AnalyticsSession(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -49,10 +50,19 @@ class PageViewCreate(BaseModel):
     user_agent: Optional[str] = None
     referrer: Optional[str] = None
     session_id: Optional[str] = None
+    # Client-chosen id; resending the same id is dropped as a duplicate
+    event_id: Optional[str] = Field(None, min_length=8, max_length=128)
 
 class UserInteractionCreate(BaseModel):
     action: str
     element: Optional[str] = None
     page: str
     session_id: Optional[str] = None
-    data: Optional[Dict[str, Any]] = None
\ No newline at end of file
+    data: Optional[Dict[str, Any]] = None
+    event_id: Optional[str] = Field(None, min_length=8, max_length=128)
+
+class AnalyticsBatch(BaseModel):
+    # Each event carries a "type" of "pageview" or "interaction" plus the
+    # fields of the matching create model; items are validated one by one so
+    # a bad event only rejects itself, not the whole batch.
+    events: List[Dict[str, Any]] = Field(..., min_length=1, max_length=500)
@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import FileResponse
+from services.container import Services, get_services
+from services.profiling import Profiler
+from typing import Optional
+
+router = APIRouter()
+
+def get_profiler(services: Services = Depends(get_services)) -> Profiler:
+    """This app's profiler, also installed as ProfilingMiddleware by server.py"""
+    return services.profiler
+
+def require_admin_token(
+    x_admin_token: Optional[str] = Header(None),
+    profiler: Profiler = Depends(get_profiler)
+):
+    """Reject requests without the PROFILING_ADMIN_TOKEN header
+
+    Guards the profiling endpoints here and the raw event export.
+    """
+    if not profiler.admin_token:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled")
+    if not profiler.token_valid(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@router.get("/admin/profiles", dependencies=[Depends(require_admin_token)])
+async def list_profiles(profiler: Profiler = Depends(get_profiler)):
+    """List captured requests, newest first"""
+    return {
+        "profiler": profiler.snapshot(),
+        "captures": profiler.store.list()
+    }
+
+@router.get("/admin/profiles/{name}", dependencies=[Depends(require_admin_token)])
+async def download_profile(name: str, profiler: Profiler = Depends(get_profiler)):
+    """Download one capture (.json metadata or .prof pstats file)"""
+    path = profiler.store.path_for(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Capture not found")
+
+    media_type = "application/json" if path.suffix == ".json" else "application/octet-stream"
+    return FileResponse(path, media_type=media_type, filename=name)
@@ -1,152 +1,401 @@
-from fastapi import APIRouter, HTTPException, Request
-from motor.motor_asyncio import AsyncIOMotorClient
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
 from models.analytics import (
-    PageView, UserInteraction, AnalyticsSession, AnalyticsSummary,
-    PageViewCreate, UserInteractionCreate
+    PageView, UserInteraction, AnalyticsSummary,
+    PageViewCreate, UserInteractionCreate, AnalyticsBatch
 )
-import os
+from services.event_buffer import DUPLICATE_KEY
+from services.sessions import session_stats
+from services.retention import raw_horizon
+from services import rollups, sketches
+from services.timing import QueryTimer, timing_requested
+from services.cache import ResponseCache, cache_key, ttl_for
+from services.container import Services, get_services
+from services.database import get_db
+from services.pagination import InvalidCursor, fetch_page
+from services.serialization import INTERACTION_CREATE, PAGE_VIEW_CREATE, dumps, json_response, loads
+from services.compression import EncodedBody, encoded_response
+from services.admission import enforce, get_client_ip, rate_limit
+from services import export as event_export
+from routes.admin import require_admin_token
+import asyncio
 from datetime import datetime, timedelta
-from typing import Optional
-from collections import defaultdict
-import json
+from typing import Any, Dict, Optional
 
 router = APIRouter()
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+def write_pressure(request: Request):
+    """(ingest queue fill ratio, recent Mongo pool wait in ms) for load shedding"""
+    return get_services(request).event_buffer.fill_ratio, request.app.state.mongo.pool_listener.recent_wait_ms
 
-@router.post("/analytics/pageview")
-async def track_page_view(request: Request, page_view_data: PageViewCreate):
+def event_fields(event) -> Dict[str, Any]:
+    """Create-model fields, with a client-supplied event_id as the document id"""
+    fields = event.model_dump()
+    event_id = fields.pop("event_id", None)
+    if event_id:
+        fields["id"] = event_id
+    return fields
+
+def format_validation_error(error: ValidationError) -> str:
+    """Flatten a pydantic ValidationError into a single readable line"""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}"
+        for err in error.errors()
+    )
+
+@router.post("/analytics/pageview", status_code=202, dependencies=[Depends(rate_limit("pageview"))])
+async def track_page_view(
+    request: Request,
+    page_view_data: PageViewCreate,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    services: Services = Depends(get_services)
+):
     """Track a page view"""
     try:
-        # Get client IP
-        client_ip = request.client.host
-        if 'x-forwarded-for' in request.headers:
-            client_ip = request.headers['x-forwarded-for'].split(',')[0].strip()
-        
-        page_view = PageView(
-            **page_view_data.dict(),
-            ip_address=client_ip
-        )
-        
-        page_view_dict = page_view.dict()
-        result = await db.page_views.insert_one(page_view_dict)
-        
-        if not result.inserted_id:
-            raise HTTPException(status_code=400, detail="Failed to track page view")
-        
-        return {"message": "Page view tracked successfully", "id": page_view.id}
+        event_id = page_view_data.event_id
+        if event_id and await services.deduplicator.is_duplicate(db, "page_views", event_id):
+            return {"message": "Duplicate page view ignored", "id": event_id}
+        
+        # The id now counts as seen; any failure below must release it, or
+        # the client's retry would be answered "duplicate" and never stored
+        accepted = False
+        try:
+            client_ip = get_client_ip(request)
+            
+            page_view = PageView(
+                **event_fields(page_view_data),
+                ip_address=client_ip
+            )
+            
+            # Queued for the background writer; we do not wait on Mongo here
+            document = page_view.model_dump()
+            if not await services.event_buffer.put("page_views", document):
+                raise HTTPException(status_code=503, detail="Analytics buffer full, page view dropped")
+            services.realtime_counters.record("page_views", document)
+            accepted = True
+        finally:
+            if event_id and not accepted:
+                services.deduplicator.forget("page_views", event_id)
+        
+        return {"message": "Page view accepted", "id": page_view.id}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/analytics/interaction")
-async def track_user_interaction(request: Request, interaction_data: UserInteractionCreate):
+@router.post("/analytics/interaction", status_code=202, dependencies=[Depends(rate_limit("interaction"))])
+async def track_user_interaction(
+    request: Request,
+    interaction_data: UserInteractionCreate,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    services: Services = Depends(get_services)
+):
     """Track a user interaction"""
     try:
-        interaction = UserInteraction(**interaction_data.dict())
-        interaction_dict = interaction.dict()
-        
-        result = await db.user_interactions.insert_one(interaction_dict)
-        
-        if not result.inserted_id:
-            raise HTTPException(status_code=400, detail="Failed to track interaction")
+        event_id = interaction_data.event_id
+        weight = services.sampler.weight(interaction_data.action, event_id)
+        if not weight:
+            return {"message": "Interaction sampled out"}
+        
+        if services.admission.should_shed(interaction_data.action, *write_pressure(request)):
+            return {"message": "Interaction shed under load"}
+        
+        if event_id and await services.deduplicator.is_duplicate(db, "user_interactions", event_id):
+            return {"message": "Duplicate interaction ignored", "id": event_id}
+        
+        # As for page views: release the id on any failure so a retry is stored
+        accepted = False
+        try:
+            interaction = UserInteraction(**event_fields(interaction_data), weight=weight)
+            
+            document = interaction.model_dump()
+            if not await services.event_buffer.put("user_interactions", document):
+                raise HTTPException(status_code=503, detail="Analytics buffer full, interaction dropped")
+            services.realtime_counters.record("user_interactions", document)
+            accepted = True
+        finally:
+            if event_id and not accepted:
+                services.deduplicator.forget("user_interactions", event_id)
+        
+        return {"message": "Interaction accepted", "id": interaction.id}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/analytics/stats")
+async def get_analytics_stats(services: Services = Depends(get_services)):
+    """Get ingest pipeline counters (admin endpoint)"""
+    return {
+        "buffer": services.event_buffer.snapshot(),
+        "cache": services.analytics_cache.snapshot(),
+        "sessionizer": services.sessionizer.snapshot(),
+        "compaction": services.compactor.snapshot(),
+        "dashboard_stream": services.dashboard_stream.snapshot(),
+        "realtime": services.realtime_counters.snapshot(),
+        "admission": services.admission.snapshot(),
+        "dedup": services.deduplicator.snapshot(),
+        "sampling": services.sampler.snapshot()
+    }
+
+@router.get("/analytics/realtime")
+async def get_realtime(services: Services = Depends(get_services)):
+    """Views per page, interactions per action and active sessions over the last 1/5/15 minutes
+    
+    Served from in-memory counters without querying Mongo; other workers'
+    numbers are as of the last sync (see services/realtime.py).
+    """
+    return json_response(services.realtime_counters.view())
+
+@router.post("/analytics/batch")
+async def track_batch(
+    request: Request,
+    batch: AnalyticsBatch,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    services: Services = Depends(get_services)
+):
+    """Track a mixed batch of page views and interactions
+    
+    Charged against the client's rate limit per event. Under load,
+    low-value interactions are answered with status "shed" and not stored.
+    Events resending an earlier event_id get status "duplicate", and
+    interactions dropped by the sampling policy get status "sampled".
+    """
+    enforce("batch", request, cost=len(batch.events))
+    # collection name -> list of (batch index, document)
+    pending = {"page_views": [], "user_interactions": []}
+    # Collections whose insert_many has returned; ids in the others may not
+    # have been stored and are released again if the request fails
+    written_collections = set()
+    completed = False
+    try:
+        client_ip = get_client_ip(request)
+        pressure = write_pressure(request)
+        results = [None] * len(batch.events)
+        
+        for index, event in enumerate(batch.events):
+            event = dict(event)
+            event_type = event.pop("type", None)
+            try:
+                if event_type == "pageview":
+                    create = PAGE_VIEW_CREATE.validate_python(event)
+                    collection = "page_views"
+                    document = PageView(**event_fields(create), ip_address=client_ip).model_dump()
+                elif event_type == "interaction":
+                    create = INTERACTION_CREATE.validate_python(event)
+                    weight = services.sampler.weight(create.action, create.event_id)
+                    if not weight:
+                        results[index] = {"index": index, "status": "sampled"}
+                        continue
+                    if services.admission.should_shed(create.action, *pressure):
+                        results[index] = {"index": index, "status": "shed"}
+                        continue
+                    collection = "user_interactions"
+                    document = UserInteraction(**event_fields(create), weight=weight).model_dump()
+                else:
+                    results[index] = {
+                        "index": index,
+                        "status": "rejected",
+                        "error": f"Unknown event type: {event_type!r}"
+                    }
+                    continue
+            except ValidationError as e:
+                results[index] = {
+                    "index": index,
+                    "status": "rejected",
+                    "error": format_validation_error(e)
+                }
+                continue
+            
+            if create.event_id and await services.deduplicator.is_duplicate(db, collection, create.event_id):
+                results[index] = {"index": index, "status": "duplicate", "id": create.event_id}
+            else:
+                pending[collection].append((index, document))
+        
+        # One unordered insert_many per collection: a failing document does
+        # not stop the rest of the batch from being written.
+        for collection, items in pending.items():
+            if not items:
+                continue
+            
+            write_errors = {}
+            try:
+                await db[collection].insert_many(
+                    [doc for _, doc in items],
+                    ordered=False
+                )
+            except BulkWriteError as e:
+                write_errors = {err["index"]: err for err in e.details.get("writeErrors", [])}
+            written_collections.add(collection)
+            
+            written = [
+                doc for position, (_, doc) in enumerate(items)
+                if position not in write_errors
+            ]
+            # The same hooks the event buffer runs after each flush
+            await rollups.apply_rollups(db, collection, written)
+            await sketches.apply_sketches(db, collection, written)
+            await services.dashboard_stream.notify(db, collection, written)
+            for doc in written:
+                services.realtime_counters.record(collection, doc)
+            
+            for position, (index, doc) in enumerate(items):
+                error = write_errors.get(position)
+                if error is None:
+                    results[index] = {
+                        "index": index,
+                        "status": "accepted",
+                        "id": doc["id"]
+                    }
+                elif error.get("code") == DUPLICATE_KEY:
+                    # Same event id sent through another worker
+                    results[index] = {"index": index, "status": "duplicate", "id": doc["id"]}
+                else:
+                    services.deduplicator.forget(collection, doc["id"])
+                    results[index] = {
+                        "index": index,
+                        "status": "rejected",
+                        "error": error.get("errmsg", "Write failed")
+                    }
         
-        return {"message": "Interaction tracked successfully", "id": interaction.id}
+        accepted = sum(1 for result in results if result["status"] == "accepted")
+        shed = sum(1 for result in results if result["status"] == "shed")
+        duplicates = sum(1 for result in results if result["status"] == "duplicate")
+        sampled = sum(1 for result in results if result["status"] == "sampled")
+        completed = True
+        
+        return {
+            "message": "Batch processed",
+            "accepted": accepted,
+            "rejected": len(results) - accepted - shed - duplicates - sampled,
+            "shed": shed,
+            "duplicates": duplicates,
+            "sampled": sampled,
+            "results": results
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if not completed:
+            # e.g. AutoReconnect: the client resends the same event ids
+            for collection, items in pending.items():
+                if collection not in written_collections:
+                    for _, doc in items:
+                        services.deduplicator.forget(collection, doc["id"])
+
+async def _contact_facets(db, start_date: datetime, end_date: datetime, include_recent: bool):
+    """Submission count and (optionally) the latest messages in one $facet"""
+    facets = {"count": [{"$count": "count"}]}
+    if include_recent:
+        facets["recent"] = [
+            {"$sort": {"created_at": -1}},
+            {"$limit": 5},
+            {"$project": {"_id": 0, "message": 0}}  # Exclude message content for privacy
+        ]
+    
+    result = await db.contact_messages.aggregate([
+        {"$match": {"created_at": {"$gte": start_date, "$lte": end_date}}},
+        {"$facet": facets}
+    ]).to_list(1)
+    result = result[0] if result else {}
+    
+    count = result.get("count") or [{"count": 0}]
+    return {"count": count[0]["count"], "recent": result.get("recent", [])}
+
+async def _load_analytics(
+    db,
+    start_date: datetime,
+    end_date: datetime,
+    exact: bool,
+    include_dashboard: bool,
+    timer: QueryTimer
+):
+    """Run one query per collection, all of them concurrently"""
+    # Exact counts need raw events, which only exist back to the TTL horizon
+    horizon = raw_horizon()
+    exact = exact and (horizon is None or start_date >= horizon)
+    
+    queries = {
+        "page_view_rollups": rollups.page_view_facets(
+            db, start_date, end_date, include_daily=include_dashboard
+        ),
+        "referrer_rollups": rollups.top_referrers(db, start_date, end_date),
+        "uniques": (
+            sketches.exact_window_uniques(db, start_date, end_date) if exact
+            else sketches.window_uniques(db, start_date, end_date)
+        ),
+        "contact_messages": _contact_facets(db, start_date, end_date, include_dashboard),
+        "sessions": session_stats(db, start_date, end_date),
+    }
+    if include_dashboard:
+        queries["interaction_rollups"] = rollups.top_interactions(db, start_date, end_date)
+    
+    results = await asyncio.gather(*(
+        timer.track(name, query) for name, query in queries.items()
+    ))
+    return dict(zip(queries, results))
+
+def _build_summary(data, start_date: datetime, end_date: datetime) -> AnalyticsSummary:
+    page_views = data["page_view_rollups"]
+    uniques = data["uniques"]
+    
+    popular_pages = page_views["popular_pages"]
+    for page in popular_pages:
+        page["unique_visitors"] = uniques["by_page"].get(page["page"], 0)
+    
+    # Closed sessions only; see services/sessions.py
+    sessions = data["sessions"]
+    
+    return AnalyticsSummary(
+        total_views=page_views["total_views"],
+        unique_visitors=uniques["unique_visitors"],
+        popular_pages=popular_pages,
+        top_referrers=data["referrer_rollups"],
+        avg_session_duration=sessions["avg_session_duration"],
+        bounce_rate=sessions["bounce_rate"],
+        contact_form_submissions=data["contact_messages"]["count"],
+        date_range={
+            "start": start_date,
+            "end": end_date
+        }
+    )
 
 @router.get("/analytics/summary")
-async def get_analytics_summary(days: Optional[int] = 30):
-    """Get analytics summary for the specified period"""
+async def get_analytics_summary(
+    request: Request,
+    days: Optional[int] = 30,
+    exact: bool = False,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    services: Services = Depends(get_services)
+):
+    """Get analytics summary for the specified period
+    
+    Views and referrers come from the rollups; unique visitor figures from
+    daily HyperLogLog sketches (about 1% error). Pass exact=true to count
+    unique visitors from raw events instead.
+    """
     try:
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
         
-        # Total page views
-        total_views = await db.page_views.count_documents({
-            "timestamp": {"$gte": start_date, "$lte": end_date}
-        })
-        
-        # Unique visitors (based on IP + User Agent combination)
-        unique_visitors_pipeline = [
-            {"$match": {"timestamp": {"$gte": start_date, "$lte": end_date}}},
-            {"$group": {
-                "_id": {"ip": "$ip_address", "ua": "$user_agent"},
-                "count": {"$sum": 1}
-            }},
-            {"$count": "unique_visitors"}
-        ]
-        
-        unique_visitors_result = await db.page_views.aggregate(unique_visitors_pipeline).to_list(1)
-        unique_visitors = unique_visitors_result[0]["unique_visitors"] if unique_visitors_result else 0
-        
-        # Popular pages
-        popular_pages_pipeline = [
-            {"$match": {"timestamp": {"$gte": start_date, "$lte": end_date}}},
-            {"$group": {
-                "_id": "$page",
-                "views": {"$sum": 1},
-                "unique_visitors": {"$addToSet": "$ip_address"}
-            }},
-            {"$project": {
-                "page": "$_id",
-                "views": 1,
-                "unique_visitors": {"$size": "$unique_visitors"}
-            }},
-            {"$sort": {"views": -1}},
-            {"$limit": 10}
-        ]
+        timer = QueryTimer()
         
-        popular_pages = await db.page_views.aggregate(popular_pages_pipeline).to_list(10)
+        async def compute():
+            data = await _load_analytics(db, start_date, end_date, exact, False, timer)
+            # Cached encoded and pre-compressed; hits only pick a variant
+            return EncodedBody(dumps(_build_summary(data, start_date, end_date)))
         
-        # Top referrers
-        referrers_pipeline = [
-            {"$match": {
-                "timestamp": {"$gte": start_date, "$lte": end_date},
-                "referrer": {"$ne": None, "$ne": ""}
-            }},
-            {"$group": {
-                "_id": "$referrer",
-                "count": {"$sum": 1}
-            }},
-            {"$project": {
-                "referrer": "$_id",
-                "count": 1
-            }},
-            {"$sort": {"count": -1}},
-            {"$limit": 10}
-        ]
-        
-        top_referrers = await db.page_views.aggregate(referrers_pipeline).to_list(10)
-        
-        # Average session duration (mock calculation for now)
-        avg_session_duration = 120.5  # This would need proper session tracking
-        
-        # Bounce rate (mock calculation)
-        bounce_rate = 0.35  # 35% bounce rate
-        
-        # Contact form submissions
-        contact_submissions = await db.contact_messages.count_documents({
-            "created_at": {"$gte": start_date, "$lte": end_date}
-        })
-        
-        summary = AnalyticsSummary(
-            total_views=total_views,
-            unique_visitors=unique_visitors,
-            popular_pages=popular_pages,
-            top_referrers=top_referrers,
-            avg_session_duration=avg_session_duration,
-            bounce_rate=bounce_rate,
-            contact_form_submissions=contact_submissions,
-            date_range={
-                "start": start_date,
-                "end": end_date
-            }
+        summary = await services.analytics_cache.get_or_compute(
+            cache_key("summary", days=days, exact=exact),
+            ttl_for("summary"),
+            compute
         )
         
-        return summary
+        headers = {"Server-Timing": timer.header_value()} if timing_requested(request) else None
+        return encoded_response(summary, request.headers.get("accept-encoding"), headers)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -154,9 +403,16 @@ async def get_analytics_summary(days: Optional[int] = 30):
 async def get_page_views(
     page: Optional[str] = None,
     days: Optional[int] = 7,
-    limit: Optional[int] = 100
+    limit: Optional[int] = 100,
+    cursor: Optional[str] = None,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    services: Services = Depends(get_services)
 ):
-    """Get page views with optional filtering"""
+    """Get page views with optional filtering, newest first
+    
+    Returns {"items", "next_cursor"}; pass next_cursor back as cursor to
+    fetch the following page.
+    """
     try:
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
@@ -165,12 +421,17 @@ async def get_page_views(
         if page:
             query["page"] = page
         
-        page_views = await db.page_views.find(
-            query, 
-            {"_id": 0}
-        ).sort("timestamp", -1).limit(limit).to_list(limit)
+        async def compute():
+            return await fetch_page(db.page_views, query, "timestamp", limit, cursor)
         
-        return page_views
+        results = await services.analytics_cache.get_or_compute(
+            cache_key("page_views", page=page, days=days, limit=limit, cursor=cursor),
+            ttl_for("page_views"),
+            compute
+        )
+        return json_response(results)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -179,9 +440,15 @@ async def get_user_interactions(
     action: Optional[str] = None,
     page: Optional[str] = None,
     days: Optional[int] = 7,
-    limit: Optional[int] = 100
+    limit: Optional[int] = 100,
+    cursor: Optional[str] = None,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    services: Services = Depends(get_services)
 ):
-    """Get user interactions with optional filtering"""
+    """Get user interactions with optional filtering, newest first
+    
+    Paginated the same way as /analytics/page-views.
+    """
     try:
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
@@ -192,82 +459,154 @@ async def get_user_interactions(
         if page:
             query["page"] = page
         
-        interactions = await db.user_interactions.find(
-            query,
-            {"_id": 0}
-        ).sort("timestamp", -1).limit(limit).to_list(limit)
+        async def compute():
+            return await fetch_page(db.user_interactions, query, "timestamp", limit, cursor)
         
-        return interactions
+        results = await services.analytics_cache.get_or_compute(
+            cache_key("interactions", action=action, page=page, days=days, limit=limit, cursor=cursor),
+            ttl_for("interactions"),
+            compute
+        )
+        return json_response(results)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/analytics/dashboard")
-async def get_analytics_dashboard():
-    """Get comprehensive analytics dashboard data"""
+@router.get("/analytics/export", dependencies=[Depends(require_admin_token)])
+async def export_events(
+    collection: str = "page_views",
+    format: str = "ndjson",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    fields: Optional[str] = None,
+    batch_size: int = event_export.DEFAULT_BATCH_SIZE,
+    after_timestamp: Optional[datetime] = None,
+    after_id: Optional[str] = None,
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Stream raw events as NDJSON or CSV, oldest first (admin endpoint)
+    
+    Needs the X-Admin-Token header. ip_address and user_agent are only
+    included when named in fields.
+    
+    To resume an interrupted export, repeat the request with the timestamp
+    and id of the last row received as after_timestamp/after_id.
+    """
+    if collection not in event_export.EXPORTS:
+        raise HTTPException(status_code=400, detail=f"collection must be one of {', '.join(event_export.EXPORTS)}")
+    if format not in event_export.FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(event_export.FORMATS)}")
+    if not 1 <= batch_size <= event_export.MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"batch_size must be between 1 and {event_export.MAX_BATCH_SIZE}")
+    
     try:
-        # Get data for last 30 days
-        end_date = datetime.utcnow()
-        start_date = end_date - timedelta(days=30)
-        
-        # Daily page views for the last 30 days
-        daily_views_pipeline = [
-            {"$match": {"timestamp": {"$gte": start_date, "$lte": end_date}}},
-            {"$group": {
-                "_id": {
-                    "year": {"$year": "$timestamp"},
-                    "month": {"$month": "$timestamp"},
-                    "day": {"$dayOfMonth": "$timestamp"}
-                },
-                "views": {"$sum": 1},
-                "unique_visitors": {"$addToSet": "$ip_address"}
-            }},
-            {"$project": {
-                "date": {
-                    "$dateFromParts": {
-                        "year": "$_id.year",
-                        "month": "$_id.month",
-                        "day": "$_id.day"
-                    }
-                },
-                "views": 1,
-                "unique_visitors": {"$size": "$unique_visitors"}
-            }},
-            {"$sort": {"date": 1}}
-        ]
-        
-        daily_views = await db.page_views.aggregate(daily_views_pipeline).to_list(30)
-        
-        # Top interactions
-        top_interactions_pipeline = [
-            {"$match": {"timestamp": {"$gte": start_date, "$lte": end_date}}},
-            {"$group": {
-                "_id": "$action",
-                "count": {"$sum": 1}
-            }},
-            {"$project": {
-                "action": "$_id",
-                "count": 1
-            }},
-            {"$sort": {"count": -1}},
-            {"$limit": 10}
-        ]
-        
-        top_interactions = await db.user_interactions.aggregate(top_interactions_pipeline).to_list(10)
-        
-        # Recent contact messages
-        recent_contacts = await db.contact_messages.find(
-            {"created_at": {"$gte": start_date, "$lte": end_date}},
-            {"_id": 0, "message": 0}  # Exclude message content for privacy
-        ).sort("created_at", -1).limit(5).to_list(5)
-        
-        dashboard_data = {
-            "summary": await get_analytics_summary(30),
+        export_fields = event_export.resolve_fields(collection, fields)
+    except event_export.ExportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    query = event_export.build_query(start, end, after_timestamp, after_id)
+    filename = f"{collection}-{datetime.utcnow():%Y%m%dT%H%M%S}.{format}"
+    
+    return StreamingResponse(
+        event_export.stream_events(db, collection, format, query, export_fields, batch_size),
+        media_type=event_export.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+async def _dashboard_snapshot(db, cache: ResponseCache, exact: bool, timer: QueryTimer) -> EncodedBody:
+    """Encoded dashboard payload for the last 30 days, shared through the cache"""
+    end_date = datetime.utcnow()
+    start_date = end_date - timedelta(days=30)
+    
+    async def compute():
+        # Summary and dashboard panels share a single concurrent round of queries
+        data = await _load_analytics(db, start_date, end_date, exact, True, timer)
+        
+        daily_views = data["page_view_rollups"]["daily_views"]
+        for day in daily_views:
+            day["unique_visitors"] = data["uniques"]["by_day"].get(day["date"], 0)
+        
+        return EncodedBody(dumps({
+            "summary": _build_summary(data, start_date, end_date),
             "daily_views": daily_views,
-            "top_interactions": top_interactions,
-            "recent_contacts": recent_contacts,
+            "top_interactions": data["interaction_rollups"],
+            "recent_contacts": data["contact_messages"]["recent"],
             "last_updated": datetime.utcnow()
-        }
+        }))
+    
+    return await cache.get_or_compute(
+        cache_key("dashboard", exact=exact),
+        ttl_for("dashboard"),
+        compute
+    )
+
+@router.get("/analytics/dashboard")
+async def get_analytics_dashboard(
+    request: Request,
+    exact: bool = False,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    services: Services = Depends(get_services)
+):
+    """Get comprehensive analytics dashboard data"""
+    try:
+        timer = QueryTimer()
+        dashboard_data = await _dashboard_snapshot(db, services.analytics_cache, exact, timer)
         
-        return dashboard_data
+        headers = {"Server-Timing": timer.header_value()} if timing_requested(request) else None
+        return encoded_response(dashboard_data, request.headers.get("accept-encoding"), headers)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _sse(event: str, data: bytes) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + data + b"\n\n"
+
+@router.get("/analytics/dashboard/stream")
+async def stream_analytics_dashboard(
+    exact: bool = False,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    services: Services = Depends(get_services)
+):
+    """Live dashboard as server-sent events
+    
+    Sends one "snapshot" event (the /analytics/dashboard payload), then
+    "delta" events with new page views per page, interactions per action
+    and per page, and new contact messages. All open streams in a worker
+    share one producer; see services/dashboard_stream.py.
+    """
+    subscription = services.dashboard_stream.subscribe(db)
+    try:
+        snapshot = await _dashboard_snapshot(db, services.analytics_cache, exact, QueryTimer())
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        services.dashboard_stream.unsubscribe(subscription)
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    async def events():
+        try:
+            yield _sse("snapshot", snapshot.raw)
+            
+            # The snapshot may be cached; replay what happened since it was built
+            since = datetime.fromisoformat(loads(snapshot.raw)["last_updated"])
+            delta, covered_seq = await services.dashboard_stream.catch_up(since)
+            if any(delta.values()):
+                yield _sse("delta", dumps({"seq": covered_seq, **delta}))
+            
+            while True:
+                try:
+                    delta = await asyncio.wait_for(subscription.queue.get(), services.dashboard_stream.heartbeat)
+                except asyncio.TimeoutError:
+                    # Comment line; keeps proxies from closing an idle stream
+                    yield b": keepalive\n\n"
+                    continue
+                if delta is None:
+                    return
+                if delta["seq"] > covered_seq:
+                    yield _sse("delta", dumps(delta))
+        finally:
+            services.dashboard_stream.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
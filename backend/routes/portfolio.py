@@ -1,38 +1,54 @@
-from fastapi import APIRouter, HTTPException
-from motor.motor_asyncio import AsyncIOMotorClient
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from models.portfolio import Portfolio, ContactMessage, ContactMessageCreate
-import os
+from services.portfolio_cache import etag_matches, variant_etag
+from services.container import Services, get_services
+from services.database import get_db
+from services.pagination import InvalidCursor, fetch_page
+from services.serialization import json_response
+from services.admission import rate_limit
 from datetime import datetime
-from dotenv import load_dotenv
-from pathlib import Path
-
-# Load environment variables
-ROOT_DIR = Path(__file__).parent.parent
-load_dotenv(ROOT_DIR / '.env')
+from typing import Optional
 
 router = APIRouter()
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
 @router.get("/portfolio")
-async def get_portfolio():
+async def get_portfolio(
+    request: Request,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    services: Services = Depends(get_services)
+):
     """Get complete portfolio data"""
     try:
-        portfolio = await db.portfolio.find_one({}, {"_id": 0})
-        if not portfolio:
+        cached = await services.portfolio_cache.get(db)
+        if cached is None:
             raise HTTPException(status_code=404, detail="Portfolio not found")
-        return portfolio
+        
+        encoded, etag = cached
+        # Pre-compressed variant picked by Accept-Encoding, each with its own tag
+        body, headers = encoded.headers(request.headers.get("accept-encoding"))
+        headers["ETag"] = variant_etag(etag, headers.get("Content-Encoding"))
+        headers["Cache-Control"] = "no-cache"
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            services.portfolio_cache.stats["not_modified"] += 1
+            headers.pop("Content-Encoding", None)
+            return Response(status_code=304, headers=headers)
+        
+        return Response(content=body, media_type=encoded.media_type, headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/portfolio")
-async def update_portfolio(portfolio_data: Portfolio):
+async def update_portfolio(
+    portfolio_data: Portfolio,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    services: Services = Depends(get_services)
+):
     """Update portfolio data"""
     try:
-        portfolio_dict = portfolio_data.dict()
+        portfolio_dict = portfolio_data.model_dump()
         portfolio_dict["updated_at"] = datetime.utcnow()
         
         result = await db.portfolio.replace_one(
@@ -44,16 +60,24 @@ async def update_portfolio(portfolio_data: Portfolio):
         if result.modified_count == 0 and result.upserted_id is None:
             raise HTTPException(status_code=400, detail="Failed to update portfolio")
         
+        # Rebuild our copy now; other workers pick up the bumped version stamp
+        await services.portfolio_cache.invalidate(db)
+        
         return {"message": "Portfolio updated successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/contact")
-async def create_contact_message(message_data: ContactMessageCreate):
+@router.post("/contact", dependencies=[Depends(rate_limit("contact"))])
+async def create_contact_message(
+    message_data: ContactMessageCreate,
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
     """Create a new contact message"""
     try:
-        message = ContactMessage(**message_data.dict())
-        message_dict = message.dict()
+        message = ContactMessage(**message_data.model_dump())
+        message_dict = message.model_dump()
         
         result = await db.contact_messages.insert_one(message_dict)
         
@@ -68,16 +92,25 @@ async def create_contact_message(message_data: ContactMessageCreate):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/contact/messages")
-async def get_contact_messages():
-    """Get all contact messages (admin endpoint)"""
+async def get_contact_messages(
+    limit: Optional[int] = 50,
+    cursor: Optional[str] = None,
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Get contact messages, newest first (admin endpoint)
+    
+    Returns {"items", "next_cursor"}; pass next_cursor back as cursor to
+    fetch the following page.
+    """
     try:
-        messages = await db.contact_messages.find({}, {"_id": 0}).sort("created_at", -1).to_list(100)
-        return messages
+        return json_response(await fetch_page(db.contact_messages, {}, "created_at", limit, cursor))
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/contact/messages/{message_id}/read")
-async def mark_message_read(message_id: str):
+async def mark_message_read(message_id: str, db: AsyncIOMotorDatabase = Depends(get_db)):
     """Mark a contact message as read"""
     try:
         result = await db.contact_messages.update_one(
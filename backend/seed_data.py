@@ -1,29 +1,11 @@
 import asyncio
-from motor.motor_asyncio import AsyncIOMotorClient
 from models.portfolio import Portfolio, Personal, Skills, Experience, Project, Certification, Contact, Education, Skill
-import os
-from dotenv import load_dotenv
-from pathlib import Path
+from services.portfolio_cache import bump_portfolio_version
+from services.database import MongoProvider
 
-ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
-
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
-async def seed_portfolio_data():
-    """Seed the database with initial portfolio data"""
-    
-    # Check if portfolio already exists
-    existing = await db.portfolio.find_one({})
-    if existing:
-        print("Portfolio data already exists. Skipping seed.")
-        return
-    
-    # Create portfolio data
-    portfolio = Portfolio(
+def build_portfolio() -> Portfolio:
+    """The initial portfolio document"""
+    return Portfolio(
         personal=Personal(
             name="Albee John",
             tagline="Data Scientist & Analytics Professional",
@@ -133,18 +115,32 @@ async def seed_portfolio_data():
             "Regular participant in tech meetups and coding communities"
         ]
     )
+
+async def seed_portfolio_data(db):
+    """Seed the database with initial portfolio data"""
+    
+    # Check if portfolio already exists
+    existing = await db.portfolio.find_one({})
+    if existing:
+        print("Portfolio data already exists. Skipping seed.")
+        return
     
     # Insert portfolio data
-    result = await db.portfolio.insert_one(portfolio.dict())
+    result = await db.portfolio.insert_one(build_portfolio().model_dump())
     
     if result.inserted_id:
+        # Let running API workers know their cached portfolio is stale
+        await bump_portfolio_version(db)
         print("✅ Portfolio data seeded successfully!")
     else:
         print("❌ Failed to seed portfolio data")
 
 async def main():
-    await seed_portfolio_data()
-    client.close()
+    mongo = MongoProvider.from_env()
+    try:
+        await seed_portfolio_data(mongo.connect())
+    finally:
+        mongo.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
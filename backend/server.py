@@ -1,26 +1,70 @@
-from fastapi import FastAPI, APIRouter
-from dotenv import load_dotenv
+"""FastAPI application for the portfolio API.
+
+``create_app(settings)`` builds the app. Route modules are imported when
+the app is built rather than when this module is imported, and each app
+gets its own services (event buffer, caches, background jobs; see
+services/container.py) on ``app.state.services``. The Mongo client is only
+created by the lifespan. Importing ``server`` is therefore cheap and needs
+no database, which suits tests and tooling.
+
+``server:app`` still works for ``uvicorn server:app``: the module-level
+``app`` is built from ``get_settings()`` on first access.
+``uvicorn --factory server:create_app`` works as well.
+"""
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Response
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from contextlib import asynccontextmanager
 import logging
-from pathlib import Path
+import time
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Optional
 import uuid
 from datetime import datetime
-from routes.portfolio import router as portfolio_router
 
-ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+from services.database import MongoProvider, get_db, get_mongo
+from services.pagination import InvalidCursor, fetch_page
+from services import metrics
+from services.serialization import json_response
+from services.settings import Settings, get_settings, load_env
+
+# Shared by every client this worker creates; see services/metrics.py
+mongo_command_metrics = metrics.MongoCommandMetrics()
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings: Settings = app.state.settings
+    services = app.state.services
+    # One MongoDB client (and connection pool) per worker, shared by all routers
+    mongo = MongoProvider.from_settings(settings, event_listeners=[mongo_command_metrics])
+    db = mongo.connect()
+    app.state.mongo = mongo
+    
+    if settings.ensure_indexes:
+        from services.indexes import ensure_indexes
+        try:
+            await ensure_indexes(db)
+        except Exception:
+            logger.exception("Failed to ensure MongoDB indexes")
+    
+    services.start(db)
+    try:
+        yield
+    finally:
+        await shutdown_db_client(mongo, services)
 
-# Create the main app without a prefix
-app = FastAPI(title="Albee John Portfolio API", version="1.0.0")
+# Worker-level gauges read at scrape time
+metrics.registry.gauge(
+    "process_cpu_seconds_total", "CPU time consumed by this worker",
+    callback=time.process_time
+)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -34,44 +78,95 @@ class StatusCheck(BaseModel):
 class StatusCheckCreate(BaseModel):
     client_name: str
 
+class StatusCheckPage(BaseModel):
+    items: List[StatusCheck]
+    next_cursor: Optional[str] = None
+
 # Add your routes to the router instead of directly to app
 @api_router.get("/")
 async def root():
     return {"message": "Albee John Portfolio API - Data Science Professional"}
 
 @api_router.post("/status", response_model=StatusCheck)
-async def create_status_check(input: StatusCheckCreate):
-    status_dict = input.dict()
+async def create_status_check(input: StatusCheckCreate, db: AsyncIOMotorDatabase = Depends(get_db)):
+    status_dict = input.model_dump()
     status_obj = StatusCheck(**status_dict)
-    _ = await db.status_checks.insert_one(status_obj.dict())
+    _ = await db.status_checks.insert_one(status_obj.model_dump())
     return status_obj
 
-@api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks():
-    status_checks = await db.status_checks.find().to_list(1000)
-    return [StatusCheck(**status_check) for status_check in status_checks]
+@api_router.get("/status", response_model=StatusCheckPage)
+async def get_status_checks(
+    limit: Optional[int] = 100,
+    cursor: Optional[str] = None,
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    try:
+        return json_response(await fetch_page(db.status_checks, {}, "timestamp", limit, cursor))
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-# Include portfolio routes
-api_router.include_router(portfolio_router)
+@api_router.get("/status/db")
+async def get_db_pool_stats(mongo: MongoProvider = Depends(get_mongo)):
+    """Connection pool options and checkout/wait statistics for this worker"""
+    return mongo.pool_stats()
 
-# Include the router in the main app
-app.include_router(api_router)
+@api_router.get("/metrics")
+async def get_metrics():
+    """Prometheus text exposition of this worker's metrics"""
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    """Build the API; ``settings`` defaults to ``get_settings()``"""
+    settings = settings or get_settings()
+    # Services read their own knobs from the environment, .env included
+    load_env()
+    
+    from routes.portfolio import router as portfolio_router
+    from routes.analytics import router as analytics_router
+    from routes.admin import router as admin_router
+    from services.container import Services
+    from services.profiling import ProfilingMiddleware
+    from services.compression import CompressionMiddleware
+    
+    app = FastAPI(title="Albee John Portfolio API", version="1.0.0", lifespan=lifespan)
+    app.state.settings = settings
+    # Started and stopped by the lifespan; routes use them through get_services
+    app.state.services = services = Services.from_env()
+    
+    app.include_router(api_router)
+    app.include_router(portfolio_router, prefix="/api")
+    app.include_router(analytics_router, prefix="/api")
+    # Admin (profiling) routes
+    app.include_router(admin_router, prefix="/api")
+    
+    # Compresses large dynamic bodies; cached ones arrive already encoded.
+    # Innermost, so metrics and profiles see the bytes actually sent.
+    app.add_middleware(CompressionMiddleware)
+    # Profiling runs inside the metrics middleware so it can read the Mongo trace
+    app.add_middleware(ProfilingMiddleware, profiler=services.profiler)
+    app.add_middleware(metrics.MetricsMiddleware)
+    
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=list(settings.cors_origins),
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    return app
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+_app: Optional[FastAPI] = None
+
+def __getattr__(name: str):
+    # ``server.app`` is built on first access, not on import
+    global _app
+    if name == "app":
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+async def shutdown_db_client(mongo: MongoProvider, services):
+    # Drain queued analytics events before the connection goes away
+    await services.stop()
+    mongo.close()
@@ -0,0 +1,247 @@
+"""Admission control and load shedding for the public write endpoints.
+
+Every write passes two token buckets: one per (policy, client IP) and one
+shared by all clients. A bucket refills at ``rate`` tokens per second up to
+``burst``. A request that finds either bucket empty gets a 429 with
+``Retry-After`` set to when a token will be there. Per-client buckets live
+in an LRU capped at ``ADMISSION_MAX_CLIENTS`` entries, so a scan from many
+addresses costs bounded memory; an evicted client simply starts again
+with a full bucket.
+
+Clients are told apart by the address of the connection. Behind reverse
+proxies, set ``ADMISSION_TRUSTED_PROXIES`` to how many there are, and the
+address that many hops from the right of ``X-Forwarded-For`` is used
+instead. Everything left of it is written by the client, so it is never
+trusted.
+
+Limits are configured per policy with ``ADMISSION_<POLICY>_RATE`` and
+``ADMISSION_<POLICY>_BURST`` (policies: pageview, interaction, batch,
+contact, plus ``GLOBAL``); a rate of 0 disables that bucket.
+
+Separately, low-value interactions (``ADMISSION_LOW_VALUE_ACTIONS``:
+scrolls, visibility changes and the like) are shed, i.e. acknowledged but
+not stored, while the ingest queue is more than
+``ADMISSION_SHED_QUEUE_FRACTION`` full or recent Mongo pool checkouts wait
+longer than ``ADMISSION_SHED_POOL_WAIT_MS``. That keeps page views, clicks
+and contact messages flowing when the database is the bottleneck.
+"""
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+from services import metrics
+
+# policy -> (tokens per second, burst)
+DEFAULT_LIMITS = {
+    "pageview": (5.0, 30.0),
+    "interaction": (10.0, 60.0),
+    # Counted per event in the batch
+    "batch": (20.0, 200.0),
+    "contact": (0.05, 3.0),
+    "global": (500.0, 1000.0),
+}
+
+DEFAULT_LOW_VALUE_ACTIONS = "scroll,page_hidden,page_visible,section_view"
+
+ADMISSION_REJECTED = metrics.registry.counter(
+    "admission_rejected_total", "Requests refused with 429 by admission control", ("policy", "bucket")
+)
+ADMISSION_SHED = metrics.registry.counter(
+    "admission_shed_total", "Low-value interactions dropped under load", ("action",)
+)
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated_at")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = now
+
+    def take(self, cost: float, now: float) -> float:
+        """Take ``cost`` tokens; returns 0 on success, else seconds until they are available
+
+        A cost above ``burst`` is charged as a full bucket.
+        """
+        cost = min(cost, self.burst)
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    def refund(self, cost: float) -> None:
+        self.tokens = min(self.burst, self.tokens + cost)
+
+
+def _limits_from_env() -> Dict[str, Tuple[float, float]]:
+    limits = {}
+    for policy, (rate, burst) in DEFAULT_LIMITS.items():
+        limits[policy] = (
+            float(os.environ.get(f"ADMISSION_{policy.upper()}_RATE", rate)),
+            float(os.environ.get(f"ADMISSION_{policy.upper()}_BURST", burst)),
+        )
+    return limits
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        limits: Optional[Dict[str, Tuple[float, float]]] = None,
+        max_clients: int = 10000,
+        low_value_actions: Tuple[str, ...] = tuple(DEFAULT_LOW_VALUE_ACTIONS.split(",")),
+        shed_queue_fraction: float = 0.5,
+        shed_pool_wait_ms: float = 50.0,
+        trusted_proxies: int = 0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.limits = dict(limits or DEFAULT_LIMITS)
+        self.max_clients = max_clients
+        self.low_value_actions = frozenset(low_value_actions)
+        self.shed_queue_fraction = shed_queue_fraction
+        self.shed_pool_wait_ms = shed_pool_wait_ms
+        self.trusted_proxies = trusted_proxies
+        self.clock = clock
+
+        # (policy, client) -> bucket, least recently used first
+        self._clients: OrderedDict[Tuple[str, str], TokenBucket] = OrderedDict()
+        self._global: Optional[TokenBucket] = None
+        self.stats = {"admitted": 0, "rejected": 0, "evictions": 0, "shed": 0}
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        actions = os.environ.get("ADMISSION_LOW_VALUE_ACTIONS", DEFAULT_LOW_VALUE_ACTIONS)
+        return cls(
+            limits=_limits_from_env(),
+            max_clients=int(os.environ.get("ADMISSION_MAX_CLIENTS", 10000)),
+            low_value_actions=tuple(action.strip() for action in actions.split(",") if action.strip()),
+            shed_queue_fraction=float(os.environ.get("ADMISSION_SHED_QUEUE_FRACTION", 0.5)),
+            shed_pool_wait_ms=float(os.environ.get("ADMISSION_SHED_POOL_WAIT_MS", 50.0)),
+            trusted_proxies=int(os.environ.get("ADMISSION_TRUSTED_PROXIES", 0)),
+        )
+
+    def admit(self, policy: str, client: str, cost: float = 1.0) -> float:
+        """0 if the request may proceed, else the Retry-After in seconds"""
+        now = self.clock()
+        client_bucket = self._client_bucket(policy, client, now)
+        if client_bucket is not None:
+            wait = client_bucket.take(cost, now)
+            if wait:
+                return self._reject(policy, "client", wait)
+
+        global_bucket = self._global_bucket(now)
+        if global_bucket is not None:
+            wait = global_bucket.take(cost, now)
+            if wait:
+                # Not this client's fault; give its tokens back
+                if client_bucket is not None:
+                    client_bucket.refund(cost)
+                return self._reject(policy, "global", wait)
+
+        self.stats["admitted"] += 1
+        return 0.0
+
+    def under_pressure(self, queue_fraction: float, pool_wait_ms: float) -> bool:
+        return queue_fraction >= self.shed_queue_fraction or pool_wait_ms >= self.shed_pool_wait_ms
+
+    def should_shed(self, action: str, queue_fraction: float, pool_wait_ms: float) -> bool:
+        """True for a low-value interaction while the write path is under pressure"""
+        if action not in self.low_value_actions or not self.under_pressure(queue_fraction, pool_wait_ms):
+            return False
+        self.stats["shed"] += 1
+        ADMISSION_SHED.inc(action=action)
+        return True
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "clients": len(self._clients),
+            "max_clients": self.max_clients,
+            "limits": {policy: {"rate": rate, "burst": burst} for policy, (rate, burst) in self.limits.items()},
+        }
+
+    def _client_bucket(self, policy: str, client: str, now: float) -> Optional[TokenBucket]:
+        rate, burst = self.limits.get(policy, (0.0, 0.0))
+        if rate <= 0:
+            return None
+        key = (policy, client)
+        bucket = self._clients.get(key)
+        if bucket is None:
+            bucket = self._clients[key] = TokenBucket(rate, burst, now)
+            if len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+                self.stats["evictions"] += 1
+        else:
+            self._clients.move_to_end(key)
+        return bucket
+
+    def _global_bucket(self, now: float) -> Optional[TokenBucket]:
+        rate, burst = self.limits.get("global", (0.0, 0.0))
+        if rate <= 0:
+            return None
+        if self._global is None:
+            self._global = TokenBucket(rate, burst, now)
+        return self._global
+
+    def _reject(self, policy: str, scope: str, wait: float) -> float:
+        self.stats["rejected"] += 1
+        ADMISSION_REJECTED.inc(policy=policy, bucket=scope)
+        return wait
+
+
+def get_client_ip(request: Request) -> str:
+    """Resolve the client IP, preferring the first x-forwarded-for hop
+
+    Client-supplied; good enough to attribute analytics events, not to
+    rate limit on (see ``client_address``).
+    """
+    client_ip = request.client.host
+    if 'x-forwarded-for' in request.headers:
+        client_ip = request.headers['x-forwarded-for'].split(',')[0].strip()
+    return client_ip
+
+
+def client_address(request: Request, trusted_proxies: int = 0) -> str:
+    """The peer address, or the one our ``trusted_proxies`` proxies report"""
+    host = request.client.host if request.client else ""
+    if trusted_proxies <= 0:
+        return host
+    hops = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+    if len(hops) < trusted_proxies:
+        # Did not come through all of our proxies
+        return host
+    return hops[-trusted_proxies]
+
+
+def enforce(policy: str, request: Request, cost: float = 1.0) -> None:
+    """Raise a 429 with Retry-After when the client or the server is over its limit
+
+    Uses the controller of the app serving ``request`` (``services.container``).
+    """
+    admission: AdmissionController = request.app.state.services.admission
+    client = client_address(request, admission.trusted_proxies)
+    retry_after = admission.admit(policy, client, cost)
+    if retry_after:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+
+def rate_limit(policy: str) -> Callable[[Request], Awaitable[None]]:
+    """Route dependency enforcing ``policy`` for the calling client
+
+    Async so it runs on the event loop like every other caller of
+    ``enforce``; the buckets are not thread-safe.
+    """
+    async def dependency(request: Request) -> None:
+        enforce(policy, request)
+    return dependency
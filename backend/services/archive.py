@@ -0,0 +1,135 @@
+"""Columnar day-partitioned Parquet archive of raw analytics events.
+
+Closed UTC days of ``page_views`` and ``user_interactions`` are written to
+``<ANALYTICS_ARCHIVE_DIR>/<collection>/date=YYYY-MM-DD/events.parquet``.
+Each day is written once to a temporary file and renamed into place, so a
+partition either exists complete or not at all and reruns skip it.
+``services/archive_query.py`` answers report questions from these files
+without touching Mongo. Run with ``python manage.py archive-events``.
+"""
+import json
+import logging
+import os
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = Path(os.environ.get(
+    "ANALYTICS_ARCHIVE_DIR",
+    Path(__file__).resolve().parent.parent / "var" / "archive"
+))
+
+PARTITION_FILE = "events.parquet"
+
+# Columns archived per collection; nested values are stored as JSON text
+COLUMNS: Dict[str, List[str]] = {
+    "page_views": [
+        "id", "timestamp", "page", "referrer", "session_id",
+        "ip_address", "user_agent", "duration",
+    ],
+    "user_interactions": [
+        "id", "timestamp", "action", "element", "page", "session_id", "data", "weight",
+    ],
+}
+
+READ_BATCH_SIZE = 5000
+
+
+def partition_path(root: Path, collection: str, day: date) -> Path:
+    return Path(root) / collection / f"date={day.isoformat()}" / PARTITION_FILE
+
+
+def archived_days(root: Path, collection: str) -> List[date]:
+    base = Path(root) / collection
+    if not base.is_dir():
+        return []
+    days = []
+    for partition in base.glob(f"date=*/{PARTITION_FILE}"):
+        days.append(date.fromisoformat(partition.parent.name.removeprefix("date=")))
+    return sorted(days)
+
+
+def _frame(collection: str, documents: List[dict]) -> "pd.DataFrame":
+    # Imported here: pandas takes longer to import than the rest of the API,
+    # and only archiving needs it
+    import pandas as pd
+
+    columns = COLUMNS[collection]
+    frame = pd.DataFrame.from_records(documents, columns=columns)
+    if "data" in frame:
+        # Documents without the field come back as NaN, not None
+        frame["data"] = frame["data"].map(lambda value: json.dumps(value, default=str), na_action="ignore")
+    frame["timestamp"] = pd.to_datetime(frame["timestamp"])
+    if "duration" in frame:
+        frame["duration"] = frame["duration"].astype("Int64")
+    if "weight" in frame:
+        frame["weight"] = frame["weight"].fillna(1).astype("Int64")
+    for column in columns:
+        if column not in ("timestamp", "duration", "weight"):
+            frame[column] = frame[column].astype("string")
+    return frame
+
+
+async def archive_day(db, collection: str, day: date, root: Path = ARCHIVE_DIR) -> int:
+    """Write one UTC day of ``collection`` to its partition; returns rows written"""
+    start = datetime.combine(day, datetime.min.time())
+    projection = {name: 1 for name in COLUMNS[collection]}
+    projection["_id"] = 0
+
+    cursor = db[collection].find(
+        {"timestamp": {"$gte": start, "$lt": start + timedelta(days=1)}},
+        projection,
+        batch_size=READ_BATCH_SIZE
+    ).sort([("timestamp", 1), ("id", 1)])
+    documents = [document async for document in cursor]
+    if not documents:
+        return 0
+
+    target = partition_path(root, collection, day)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    temporary = target.with_suffix(".tmp")
+    _frame(collection, documents).to_parquet(temporary, engine="pyarrow", compression="zstd", index=False)
+    os.replace(temporary, target)
+    return len(documents)
+
+
+async def _first_day(db, collection: str) -> Optional[date]:
+    first = await db[collection].find({}, {"_id": 0, "timestamp": 1}).sort("timestamp", 1).limit(1).to_list(1)
+    return first[0]["timestamp"].date() if first else None
+
+
+async def archive_closed_days(
+    db,
+    root: Path = ARCHIVE_DIR,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    overwrite: bool = False
+) -> Dict[str, Dict[str, int]]:
+    """Archive every closed day in [since, until) that has no partition yet.
+
+    ``until`` defaults to today (UTC), which is never archived because it is
+    still receiving events. Without ``since`` each collection starts from
+    its oldest event. Returns rows written per collection and day.
+    """
+    until = until or datetime.utcnow().date()
+    written: Dict[str, Dict[str, int]] = {}
+    for collection in COLUMNS:
+        start = since or await _first_day(db, collection)
+        if start is None:
+            continue
+        done = set() if overwrite else set(archived_days(root, collection))
+        written[collection] = {}
+        day = start
+        while day < until:
+            if day not in done:
+                rows = await archive_day(db, collection, day, root)
+                if rows:
+                    written[collection][day.isoformat()] = rows
+                    logger.info("Archived %s rows of %s for %s", rows, collection, day)
+            day += timedelta(days=1)
+    return written
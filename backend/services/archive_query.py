@@ -0,0 +1,121 @@
+"""Vectorized report queries over the Parquet event archive.
+
+Answers the same questions as ``GET /analytics/summary`` (views, unique
+visitors, popular pages, referrers, daily views) with pandas/NumPy over the
+day partitions written by ``services/archive.py``. Only partitions inside
+the requested window are opened and only the needed columns are read, so
+year-long reports never touch Mongo. Visitors are counted exactly with the
+same identity as ``sketches.exact_window_uniques``: (ip, user agent) site
+wide and ip per page.
+"""
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from services.archive import ARCHIVE_DIR, COLUMNS, archived_days, partition_path
+
+
+def load_events(
+    collection: str,
+    start: datetime,
+    end: datetime,
+    columns: Optional[List[str]] = None,
+    root: Path = ARCHIVE_DIR
+) -> pd.DataFrame:
+    """Rows of ``collection`` with start <= timestamp <= end, pruned by partition"""
+    columns = list(columns or COLUMNS[collection])
+    if "timestamp" not in columns:
+        columns.append("timestamp")
+
+    days = [day for day in archived_days(root, collection) if start.date() <= day <= end.date()]
+    if not days:
+        frame = pd.DataFrame({name: pd.Series(dtype="string") for name in columns})
+        frame["timestamp"] = pd.Series(dtype="datetime64[ns]")
+        return frame
+
+    frames = []
+    for day in days:
+        path = partition_path(root, collection, day)
+        # Partitions written before a column existed come back without it
+        present = set(pq.read_schema(path).names)
+        frames.append(pd.read_parquet(path, columns=[name for name in columns if name in present]))
+    frame = pd.concat(frames, ignore_index=True).reindex(columns=columns)
+    # Edge partitions may extend past the window
+    timestamps = frame["timestamp"].to_numpy()
+    mask = (timestamps >= np.datetime64(start)) & (timestamps <= np.datetime64(end))
+    return frame.loc[mask]
+
+
+def _ranked(counts: pd.Series, key: str, value: str, limit: int) -> List[Dict[str, Any]]:
+    top = counts.nlargest(limit)
+    return [{key: index, value: int(count)} for index, count in top.items()]
+
+
+def summary(
+    start: datetime,
+    end: datetime,
+    limit: int = 10,
+    root: Path = ARCHIVE_DIR
+) -> Dict[str, Any]:
+    """Views, visitors, top pages/referrers and daily views for a window"""
+    views = load_events(
+        "page_views", start, end,
+        ["page", "referrer", "ip_address", "user_agent", "timestamp"],
+        root
+    )
+
+    ip = views["ip_address"].fillna("")
+    visitor = ip + "|" + views["user_agent"].fillna("")
+
+    page_counts = views["page"].value_counts()
+    page_uniques = ip.groupby(views["page"]).nunique()
+    popular_pages = _ranked(page_counts, "page", "views", limit)
+    for row in popular_pages:
+        row["unique_visitors"] = int(page_uniques.get(row["page"], 0))
+
+    referrers = views["referrer"]
+    referrer_counts = referrers[referrers.notna() & (referrers != "")].value_counts()
+
+    day = views["timestamp"].dt.floor("D")
+    daily = pd.DataFrame({
+        "views": day.value_counts(),
+        "unique_visitors": visitor.groupby(day).nunique(),
+    }).sort_index()
+
+    return {
+        "total_views": int(len(views)),
+        "unique_visitors": int(visitor.nunique()),
+        "popular_pages": popular_pages,
+        "top_referrers": _ranked(referrer_counts, "referrer", "count", limit),
+        "daily_views": [
+            {"date": timestamp.to_pydatetime(), "views": int(row.views), "unique_visitors": int(row.unique_visitors)}
+            for timestamp, row in daily.iterrows()
+        ],
+        "date_range": {"start": start, "end": end},
+    }
+
+
+def top_interactions(
+    start: datetime,
+    end: datetime,
+    limit: int = 10,
+    root: Path = ARCHIVE_DIR
+) -> List[Dict[str, Any]]:
+    interactions = load_events("user_interactions", start, end, ["action", "weight", "timestamp"], root)
+    # Sampled interactions stand for ``weight`` events; older partitions have no weights
+    weights = interactions["weight"].fillna(1).astype("int64")
+    return _ranked(weights.groupby(interactions["action"]).sum(), "action", "count", limit)
+
+
+def archive_coverage(root: Path = ARCHIVE_DIR) -> Dict[str, Optional[Dict[str, date]]]:
+    """First and last archived day per collection"""
+    coverage = {}
+    for collection in COLUMNS:
+        days = archived_days(root, collection)
+        coverage[collection] = {"first": days[0], "last": days[-1]} if days else None
+    return coverage
+
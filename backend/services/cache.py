@@ -0,0 +1,103 @@
+"""In-process TTL + LRU cache with single-flight request coalescing."""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+# Seconds each cached read endpoint may serve a stored result for; override
+# with ANALYTICS_CACHE_TTL_<NAME>, e.g. ANALYTICS_CACHE_TTL_DASHBOARD=120
+DEFAULT_TTLS = {
+    "summary": 60.0,
+    "dashboard": 60.0,
+    "page_views": 15.0,
+    "interactions": 15.0,
+}
+
+
+def ttl_for(name: str) -> float:
+    return float(os.environ.get(f"ANALYTICS_CACHE_TTL_{name.upper()}", DEFAULT_TTLS[name]))
+
+
+def cache_key(endpoint: str, **params: Any) -> Tuple[Hashable, ...]:
+    """Normalise query params so equivalent requests share one entry"""
+    return (endpoint,) + tuple(sorted(
+        (name, value) for name, value in params.items() if value is not None
+    ))
+
+
+class ResponseCache:
+    """Cache of computed endpoint results.
+
+    ``get_or_compute`` serves a fresh entry when there is one. Otherwise it
+    runs ``compute`` once; concurrent callers for the same key await that
+    same computation instead of starting their own. Entries expire after
+    their TTL and the least recently used entry is evicted once
+    ``max_entries`` is reached.
+    """
+
+    def __init__(self, max_entries: int = 256, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+        }
+
+    async def get_or_compute(
+        self,
+        key: Hashable,
+        ttl: float,
+        compute: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > self.clock():
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return value
+            del self._entries[key]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["misses"] += 1
+            # Its own task, so the caller that started it going away (a
+            # disconnected client) does not cancel it for everyone else
+            task = asyncio.ensure_future(compute())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, ttl, done))
+        # shield: one waiter being cancelled must not cancel the shared work
+        return await asyncio.shield(task)
+
+    def invalidate(self, endpoint: Optional[str] = None) -> None:
+        """Drop every entry, or only those belonging to ``endpoint``"""
+        if endpoint is None:
+            self._entries.clear()
+            return
+        for key in [key for key in self._entries if key[0] == endpoint]:
+            del self._entries[key]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "entries": len(self._entries), "inflight": len(self._inflight)}
+
+    def _finish(self, key: Hashable, ttl: float, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if task.cancelled():
+            return
+        if task.exception() is None:
+            self._store(key, ttl, task.result())
+
+    def _store(self, key: Hashable, ttl: float, value: Any) -> None:
+        self._entries[key] = (self.clock() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
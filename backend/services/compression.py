@@ -0,0 +1,192 @@
+"""Response compression: pre-compressed variants plus on-the-fly fallback.
+
+Cacheable bodies (the portfolio document, dashboard and summary snapshots)
+are compressed once when they are built, at high levels, and kept next to
+the raw bytes as ``EncodedBody``; each request then just picks the variant
+its ``Accept-Encoding`` allows. Other responses go through
+``CompressionMiddleware``, which compresses complete bodies of at least
+``COMPRESSION_MIN_BYTES`` (default 1024) with cheaper settings. Streamed
+responses (exports, event streams) are passed through untouched.
+
+Brotli comes from the ``brotli`` package in requirements.txt. The import
+stays optional so a trimmed install still serves gzip.
+"""
+import gzip
+import os
+from typing import Dict, Iterable, Optional, Tuple
+
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+MIN_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", 1024))
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+# Levels for variants built once per cache fill vs per response
+STORED_LEVELS = {"br": 11, "gzip": 9}
+DYNAMIC_LEVELS = {"br": 4, "gzip": 6}
+
+
+def available_encodings() -> Tuple[str, ...]:
+    """Supported encodings in order of preference"""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def compress(body: bytes, encoding: str, level: int) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=level)
+    # mtime=0 keeps the output (and anything hashed from it) stable
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def parse_accept_encoding(header: Optional[str]) -> Dict[str, float]:
+    """Map each listed coding to its q-value"""
+    accepted = {}
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def negotiate(header: Optional[str], offered: Iterable[str]) -> Optional[str]:
+    """Best offered encoding the client accepts, or None for identity"""
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for encoding in offered:
+        quality = accepted.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    if not content_type or content_type.startswith("text/event-stream"):
+        return False
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class EncodedBody:
+    """Raw bytes plus their pre-compressed variants"""
+
+    def __init__(self, raw: bytes, media_type: str = "application/json", min_bytes: int = MIN_BYTES):
+        self.raw = raw
+        self.media_type = media_type
+        self.variants: Dict[str, bytes] = {}
+        if len(raw) >= min_bytes:
+            for encoding in available_encodings():
+                compressed = compress(raw, encoding, STORED_LEVELS[encoding])
+                if len(compressed) < len(raw):
+                    self.variants[encoding] = compressed
+
+    def select(self, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+        """(body, Content-Encoding or None) for a request's Accept-Encoding"""
+        encoding = negotiate(accept_encoding, self.variants)
+        if encoding is None:
+            return self.raw, None
+        return self.variants[encoding], encoding
+
+    def headers(self, accept_encoding: Optional[str]) -> Tuple[bytes, Dict[str, str]]:
+        """Body and the Content-Encoding/Vary headers that go with it"""
+        body, encoding = self.select(accept_encoding)
+        headers = {"Vary": "Accept-Encoding"} if self.variants else {}
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        return body, headers
+
+    def sizes(self) -> Dict[str, int]:
+        return {"identity": len(self.raw), **{name: len(body) for name, body in self.variants.items()}}
+
+
+def encoded_response(
+    encoded: EncodedBody,
+    accept_encoding: Optional[str],
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    body, encoding_headers = encoded.headers(accept_encoding)
+    return Response(content=body, media_type=encoded.media_type, headers={**(headers or {}), **encoding_headers})
+
+
+def _append_vary(headers: list) -> None:
+    for index, (name, value) in enumerate(headers):
+        if name.lower() == b"vary":
+            if b"accept-encoding" not in value.lower():
+                headers[index] = (name, value + b", Accept-Encoding")
+            return
+    headers.append((b"vary", b"Accept-Encoding"))
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing complete, uncompressed bodies above ``min_bytes``"""
+
+    def __init__(self, app, min_bytes: int = MIN_BYTES):
+        self.app = app
+        self.min_bytes = min_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = dict(scope.get("headers") or [])
+        accept_encoding = request_headers.get(b"accept-encoding", b"").decode("latin-1")
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                headers = dict(message.get("headers") or [])
+                content_type = headers.get(b"content-type", b"").decode("latin-1")
+                if b"content-encoding" in headers or not is_compressible(content_type):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            passthrough = True
+            body = message.get("body", b"")
+            if message.get("more_body", False) or len(body) < self.min_bytes:
+                # Streamed or small: send as is
+                await send(start_message)
+                await send(message)
+                return
+
+            headers = [
+                (name, value) for name, value in start_message.get("headers") or []
+                if name.lower() != b"content-length"
+            ]
+            _append_vary(headers)
+            encoding = negotiate(accept_encoding, available_encodings())
+            if encoding is not None:
+                compressed = compress(body, encoding, DYNAMIC_LEVELS[encoding])
+                if len(compressed) < len(body):
+                    body = compressed
+                    headers.append((b"content-encoding", encoding.encode("latin-1")))
+            headers.append((b"content-length", str(len(body)).encode("latin-1")))
+            await send({**start_message, "headers": headers})
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_wrapper)
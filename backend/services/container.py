@@ -0,0 +1,102 @@
+"""The per-app services: ingest buffer, caches, background jobs, limits.
+
+``create_app`` builds one ``Services`` and stores it on ``app.state``; the
+lifespan starts it and stops it again. Routes resolve it with the
+``get_services`` dependency, never from module globals, so every app (a
+test, a benchmark run, a second ``create_app``) has its own queue, caches
+and pollers, and stopping one app never touches another's.
+
+Each service reads its own knobs in ``from_env`` when ``Services.from_env``
+runs, i.e. after ``.env`` has been loaded by ``create_app``.
+"""
+import os
+from dataclasses import dataclass
+
+from fastapi import Request
+
+from services import metrics, rollups, sketches
+from services.admission import AdmissionController
+from services.cache import ResponseCache
+from services.dashboard_stream import DashboardStream
+from services.dedup import EventDeduplicator
+from services.event_buffer import EventBuffer
+from services.portfolio_cache import PortfolioCache
+from services.profiling import Profiler
+from services.realtime import RealtimeCounters
+from services.retention import Compactor
+from services.sampling import InteractionSampler
+from services.sessions import Sessionizer
+
+# Registered once per worker; reads the buffer of the app started last
+BUFFER_DEPTH = metrics.registry.gauge("analytics_buffer_depth", "Analytics events waiting to be written")
+
+
+@dataclass
+class Services:
+    # Write-behind queue for single-event ingest
+    event_buffer: EventBuffer
+    # Encoded portfolio held in memory, refreshed by a version poller
+    portfolio_cache: PortfolioCache
+    # Shared across analytics read endpoints; see services/cache.py for TTLs
+    analytics_cache: ResponseCache
+    # Background session builder
+    sessionizer: Sessionizer
+    # Folds raw events into durable aggregates before their TTL expires them
+    compactor: Compactor
+    # Live dashboard deltas; its producer runs only while a stream is open
+    dashboard_stream: DashboardStream
+    # Drops resent client event ids before they are queued for insert
+    deduplicator: EventDeduplicator
+    # Keeps 1 in N of high-rate actions such as scrolls, weighted by N
+    sampler: InteractionSampler
+    # "Last N minutes" counters and their cross-worker sync
+    realtime_counters: RealtimeCounters
+    # Rate limits and load shedding for the public write endpoints
+    admission: AdmissionController
+    # Request profiling; also handed to ProfilingMiddleware
+    profiler: Profiler
+
+    @classmethod
+    def from_env(cls) -> "Services":
+        services = cls(
+            event_buffer=EventBuffer.from_env(),
+            portfolio_cache=PortfolioCache.from_env(),
+            analytics_cache=ResponseCache(max_entries=int(os.environ.get("ANALYTICS_CACHE_MAX_ENTRIES", 256))),
+            sessionizer=Sessionizer.from_env(),
+            compactor=Compactor.from_env(),
+            dashboard_stream=DashboardStream.from_env(),
+            deduplicator=EventDeduplicator.from_env(),
+            sampler=InteractionSampler.from_env(),
+            realtime_counters=RealtimeCounters.from_env(),
+            admission=AdmissionController.from_env(),
+            profiler=Profiler.from_env(),
+        )
+        services.event_buffer.add_flush_hook(rollups.apply_rollups)
+        services.event_buffer.add_flush_hook(sketches.apply_sketches)
+        services.event_buffer.add_flush_hook(services.dashboard_stream.notify)
+        return services
+
+    def start(self, db) -> None:
+        event_buffer = self.event_buffer
+        BUFFER_DEPTH.callback = lambda: event_buffer.snapshot()["depth"]
+        self.event_buffer.start(db)
+        self.portfolio_cache.start(db)
+        self.sessionizer.start(db)
+        self.compactor.start(db)
+        self.realtime_counters.start(db)
+        self.profiler.loop_lag.start()
+
+    async def stop(self) -> None:
+        # Drain queued analytics events first, while the connection is still up
+        await self.event_buffer.stop()
+        await self.portfolio_cache.stop()
+        await self.sessionizer.stop()
+        await self.compactor.stop()
+        await self.dashboard_stream.stop()
+        await self.realtime_counters.stop()
+        await self.profiler.loop_lag.stop()
+
+
+def get_services(request: Request) -> Services:
+    """The services of the app serving this request"""
+    return request.app.state.services
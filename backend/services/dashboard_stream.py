@@ -0,0 +1,231 @@
+"""Live dashboard updates for ``GET /analytics/dashboard/stream``.
+
+Each worker runs at most one producer, and only while somebody is
+subscribed. The producer tails the raw event collections (and contact
+messages) by timestamp every ``DASHBOARD_STREAM_INTERVAL`` seconds, or
+sooner when the local event buffer flushes, and fans one delta per poll
+out to every subscriber's queue. Database load therefore depends on the
+number of workers, not on the number of open dashboards. Tailing Mongo
+rather than listening to the local buffer also picks up events ingested
+by other workers.
+
+Writes land a little after their timestamp (buffer flushes, other
+workers, clock skew), so each poll looks back ``DASHBOARD_STREAM_SETTLE``
+seconds past the previous one and skips ids it has already published.
+
+The producer remembers ``DASHBOARD_STREAM_REPLAY`` seconds of recent
+events. A new subscriber gets a dashboard snapshot, which may come from
+the response cache and be a little old, followed by a catch-up delta with
+everything newer than that snapshot.
+"""
+import asyncio
+import logging
+import os
+from collections import Counter, deque
+from datetime import datetime, timedelta
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# collection -> (time field, projection)
+TAILED = {
+    "page_views": ("timestamp", {"_id": 0, "id": 1, "page": 1, "timestamp": 1}),
+    "user_interactions": ("timestamp", {"_id": 0, "id": 1, "action": 1, "page": 1, "timestamp": 1, "weight": 1}),
+    # Same fields as the dashboard's recent contacts: no message body
+    "contact_messages": ("created_at", {"_id": 0, "message": 0}),
+}
+
+
+def build_delta(events: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+    """Fold (collection, document) pairs into per-page/per-action increments"""
+    page_views: Counter = Counter()
+    interactions: Counter = Counter()
+    interactions_by_page: Counter = Counter()
+    contacts = []
+    for collection, document in events:
+        if collection == "page_views":
+            page_views[document.get("page")] += 1
+        elif collection == "user_interactions":
+            weight = document.get("weight", 1)
+            interactions[document.get("action")] += weight
+            interactions_by_page[document.get("page")] += weight
+        else:
+            contacts.append(document)
+    contacts.sort(key=lambda contact: contact["created_at"], reverse=True)
+    return {
+        "page_views": dict(page_views),
+        "interactions": dict(interactions),
+        "interactions_by_page": dict(interactions_by_page),
+        "contact_messages": contacts,
+    }
+
+
+class Subscription:
+    """One connected dashboard; ``None`` in the queue means the stream must end"""
+
+    def __init__(self, queue_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.closed = False
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class DashboardStream:
+    def __init__(
+        self,
+        interval: float = 2.0,
+        settle: float = 5.0,
+        replay: float = 120.0,
+        queue_size: int = 100,
+        heartbeat: float = 15.0
+    ):
+        self.interval = interval
+        self.settle = settle
+        self.replay = replay
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+
+        self.seq = 0
+        self._subscriptions: Set[Subscription] = set()
+        self._recent: Deque[Tuple[datetime, str, Dict[str, Any]]] = deque()
+        self._seen: Dict[Tuple[str, str], datetime] = {}
+        self._since: Optional[datetime] = None
+        self._wake = asyncio.Event()
+        self._primed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"polls": 0, "deltas": 0, "events": 0, "lagged": 0, "failed": 0}
+
+    @classmethod
+    def from_env(cls) -> "DashboardStream":
+        return cls(
+            interval=float(os.environ.get("DASHBOARD_STREAM_INTERVAL", 2.0)),
+            settle=float(os.environ.get("DASHBOARD_STREAM_SETTLE", 5.0)),
+            replay=float(os.environ.get("DASHBOARD_STREAM_REPLAY", 120.0)),
+            queue_size=int(os.environ.get("DASHBOARD_STREAM_QUEUE_SIZE", 100)),
+            heartbeat=float(os.environ.get("DASHBOARD_STREAM_HEARTBEAT", 15.0)),
+        )
+
+    async def notify(self, db, collection: str, documents: List[Dict[str, Any]]) -> None:
+        """Event buffer flush hook: poll now rather than at the next tick"""
+        if self._subscriptions:
+            self._wake.set()
+
+    def subscribe(self, db) -> Subscription:
+        subscription = Subscription(self.queue_size)
+        self._subscriptions.add(subscription)
+        if self._task is None or self._task.done():
+            self._reset()
+            self._task = asyncio.create_task(self._run(db))
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscriptions.discard(subscription)
+        if not self._subscriptions:
+            # Let the producer notice straight away and exit
+            self._wake.set()
+
+    async def catch_up(self, since: datetime) -> Tuple[Dict[str, Any], int]:
+        """Delta of remembered events newer than ``since``, plus the seq it covers
+
+        Queued deltas with a seq at or below the returned one are already
+        included and should be skipped. Waits for the producer's first poll,
+        which loads the replay window, when it has only just started.
+        """
+        await self._primed.wait()
+        events = [(collection, document) for at, collection, document in self._recent if at > since]
+        return build_delta(events), self.seq
+
+    async def stop(self) -> None:
+        for subscription in list(self._subscriptions):
+            subscription.close()
+        self._subscriptions.clear()
+        self._primed.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "subscribers": len(self._subscriptions),
+            "running": self._task is not None and not self._task.done(),
+            "seq": self.seq,
+            "remembered_events": len(self._recent),
+        }
+
+    def _reset(self) -> None:
+        self._recent.clear()
+        self._seen.clear()
+        self._since = None
+        self._wake.clear()
+        self._primed.clear()
+
+    async def _run(self, db) -> None:
+        while self._subscriptions:
+            try:
+                await self._poll(db)
+            except Exception:
+                self.stats["failed"] += 1
+                logger.exception("Dashboard stream poll failed")
+            self._primed.set()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def _poll(self, db) -> None:
+        started = datetime.utcnow()
+        since = self._since or started - timedelta(seconds=self.replay)
+        results = await asyncio.gather(*(
+            db[collection].find({field: {"$gt": since}}, projection).sort(field, 1).to_list(None)
+            for collection, (field, projection) in TAILED.items()
+        ))
+        self.stats["polls"] += 1
+
+        fresh = []
+        for (collection, (field, _)), documents in zip(TAILED.items(), results):
+            for document in documents:
+                key = (collection, document.get("id"))
+                if key in self._seen:
+                    continue
+                self._seen[key] = document[field]
+                fresh.append((document[field], collection, document))
+
+        self._since = started - timedelta(seconds=self.settle)
+        self._seen = {key: at for key, at in self._seen.items() if at > self._since}
+        horizon = started - timedelta(seconds=self.replay)
+        while self._recent and self._recent[0][0] <= horizon:
+            self._recent.popleft()
+        if not fresh:
+            return
+
+        self.seq += 1
+        fresh.sort(key=lambda event: event[0])
+        self._recent.extend(event for event in fresh if event[0] > horizon)
+
+        delta = {"seq": self.seq, **build_delta([(c, d) for _, c, d in fresh]), "as_of": started}
+        self.stats["deltas"] += 1
+        self.stats["events"] += len(fresh)
+        self._publish(delta)
+
+    def _publish(self, delta: Dict[str, Any]) -> None:
+        for subscription in list(self._subscriptions):
+            try:
+                subscription.queue.put_nowait(delta)
+            except asyncio.QueueFull:
+                # Too slow to keep up: end its stream; the browser reconnects
+                # and starts again from a fresh snapshot
+                self.stats["lagged"] += 1
+                self._subscriptions.discard(subscription)
+                subscription.close()
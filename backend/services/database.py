@@ -0,0 +1,192 @@
+"""Single Mongo client per worker, owned by the FastAPI lifespan.
+
+The lifespan in ``server.py`` creates one ``MongoProvider`` at startup and
+stores it on ``app.state.mongo``; routers receive the database through the
+``get_db`` dependency instead of building their own clients at import time.
+Pool sizing and timeouts come from the MONGO_* settings (see
+``services/settings.py``) and the pool listener keeps checkout/wait
+statistics for sizing the pool under load.
+"""
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from fastapi import Request
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import monitoring
+
+from services.settings import Settings, get_settings
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Counts connection checkouts and how long callers waited for one.
+
+    PyMongo checks connections out synchronously on Motor's executor
+    threads, so the wait is measured between the started and checked-out
+    events of the same thread. ``recent_wait_ms`` is a moving average that
+    follows the current load rather than the whole uptime.
+    """
+
+    RECENT_WEIGHT = 0.1
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.connections_open = 0
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+        self.recent_wait_ms = 0.0
+
+    def _record_wait(self, waited: float) -> None:
+        self.wait_total_ms += waited
+        self.wait_max_ms = max(self.wait_max_ms, waited)
+        self.recent_wait_ms += (waited - self.recent_wait_ms) * self.RECENT_WEIGHT
+
+    def _wait_ms(self) -> float:
+        started = getattr(self._local, "started", None)
+        self._local.started = None
+        return (time.perf_counter() - started) * 1000 if started is not None else 0.0
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        waited = self._wait_ms()
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+            self._record_wait(waited)
+
+    def connection_check_out_failed(self, event):
+        waited = self._wait_ms()
+        with self._lock:
+            self.checkout_failures += 1
+            self._record_wait(waited)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_open += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_open -= 1
+
+    # Pool-level events carry nothing we aggregate
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            attempts = self.checkouts + self.checkout_failures
+            return {
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "checked_out": self.checked_out,
+                "max_checked_out": self.max_checked_out,
+                "connections_open": self.connections_open,
+                "wait_ms": {
+                    "total": round(self.wait_total_ms, 3),
+                    "max": round(self.wait_max_ms, 3),
+                    "avg": round(self.wait_total_ms / attempts, 3) if attempts else 0.0,
+                    "recent": round(self.recent_wait_ms, 3),
+                },
+            }
+
+
+class MongoProvider:
+    def __init__(
+        self,
+        url: str,
+        db_name: str,
+        max_pool_size: int = 100,
+        min_pool_size: int = 0,
+        wait_queue_timeout_ms: Optional[int] = None,
+        server_selection_timeout_ms: int = 5000,
+        connect_timeout_ms: Optional[int] = None,
+        event_listeners: Optional[List[Any]] = None,
+    ):
+        self.url = url
+        self.db_name = db_name
+        self.pool_listener = PoolStatsListener()
+        self.options = {
+            "maxPoolSize": max_pool_size,
+            "minPoolSize": min_pool_size,
+            "waitQueueTimeoutMS": wait_queue_timeout_ms,
+            "serverSelectionTimeoutMS": server_selection_timeout_ms,
+            "connectTimeoutMS": connect_timeout_ms,
+        }
+        self.event_listeners = [self.pool_listener] + list(event_listeners or [])
+        self.client: Optional[AsyncIOMotorClient] = None
+        self.db: Optional[AsyncIOMotorDatabase] = None
+
+    @classmethod
+    def from_settings(cls, settings: Settings, **kwargs) -> "MongoProvider":
+        if not settings.mongo_url or not settings.db_name:
+            raise RuntimeError("MONGO_URL and DB_NAME must be set to connect to MongoDB")
+        return cls(
+            url=settings.mongo_url,
+            db_name=settings.db_name,
+            max_pool_size=settings.mongo_max_pool_size,
+            min_pool_size=settings.mongo_min_pool_size,
+            wait_queue_timeout_ms=settings.mongo_wait_queue_timeout_ms,
+            server_selection_timeout_ms=settings.mongo_server_selection_timeout_ms,
+            connect_timeout_ms=settings.mongo_connect_timeout_ms,
+            **kwargs
+        )
+
+    @classmethod
+    def from_env(cls, **kwargs) -> "MongoProvider":
+        return cls.from_settings(get_settings(), **kwargs)
+
+    def connect(self) -> AsyncIOMotorDatabase:
+        if self.client is None:
+            options = {name: value for name, value in self.options.items() if value is not None}
+            self.client = AsyncIOMotorClient(
+                self.url,
+                event_listeners=self.event_listeners,
+                **options
+            )
+            self.db = self.client[self.db_name]
+        return self.db
+
+    def close(self) -> None:
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+            self.db = None
+
+    def pool_stats(self) -> Dict[str, Any]:
+        return {
+            "options": {name: value for name, value in self.options.items() if value is not None},
+            **self.pool_listener.snapshot(),
+        }
+
+
+def get_mongo(request: Request) -> MongoProvider:
+    return request.app.state.mongo
+
+
+def get_db(request: Request) -> AsyncIOMotorDatabase:
+    """FastAPI dependency returning the worker's shared database handle"""
+    return request.app.state.mongo.db
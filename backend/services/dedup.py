@@ -0,0 +1,153 @@
+"""Duplicate suppression for analytics events carrying a client ``event_id``.
+
+The client id becomes the document ``id``. Because ``id`` has a unique
+index in every event collection, a duplicate can never be stored twice.
+This stage drops most duplicates before they reach ``insert_many``:
+
+1. A rotating, time-partitioned Bloom filter answers "definitely new"
+   for the vast majority of events without touching Mongo. It is a ring
+   of ``DEDUP_PARTITIONS`` filters, each covering an equal slice of
+   ``DEDUP_WINDOW_SECONDS``. The oldest filter is dropped as time moves
+   on, or when the newest one has taken ``DEDUP_PARTITION_CAPACITY`` ids,
+   so the false-positive rate stays near ``DEDUP_ERROR_RATE``.
+2. A "maybe seen" answer is confirmed exactly, first against the ids
+   accepted recently by this worker, which may still sit in the write
+   buffer, and then against the collection itself.
+
+Anything that slips through (a duplicate sent to another worker, or one
+older than the window) is rejected by the unique index on insert and
+never reaches the rollups.
+"""
+import hashlib
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Tuple
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.size = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "big"), int.from_bytes(digest[8:], "big") | 1
+        # Kirsch-Mitzenmacher: k positions from two hashes
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RotatingBloomFilter:
+    """Bloom filters covering consecutive time slices; old slices are dropped"""
+
+    def __init__(
+        self,
+        window_seconds: float = 3600.0,
+        partitions: int = 4,
+        partition_capacity: int = 100000,
+        error_rate: float = 0.001,
+        clock=time.monotonic
+    ):
+        self.slice_seconds = window_seconds / partitions
+        self.partitions = partitions
+        self.partition_capacity = partition_capacity
+        self.error_rate = error_rate
+        self.clock = clock
+        self._filters: Deque[Tuple[float, BloomFilter]] = deque()
+        self.rotations = 0
+
+    @property
+    def partition_count(self) -> int:
+        return len(self._filters)
+
+    def seen_or_add(self, key: str) -> bool:
+        """True if ``key`` may have been added before; adds it either way"""
+        current = self._current()
+        if any(key in bloom for _, bloom in self._filters):
+            return True
+        current.add(key)
+        return False
+
+    def _current(self) -> BloomFilter:
+        now = self.clock()
+        # A slice that started a full window ago holds nothing worth keeping
+        while self._filters and now - self._filters[0][0] >= self.slice_seconds * self.partitions:
+            self._filters.popleft()
+        if (
+            not self._filters
+            or now - self._filters[-1][0] >= self.slice_seconds
+            or self._filters[-1][1].count >= self.partition_capacity
+        ):
+            self._filters.append((now, BloomFilter(self.partition_capacity, self.error_rate)))
+            if len(self._filters) > self.partitions:
+                self._filters.popleft()
+            self.rotations += 1
+        return self._filters[-1][1]
+
+
+class EventDeduplicator:
+    def __init__(self, bloom: RotatingBloomFilter, recent_size: int = 10000):
+        self.bloom = bloom
+        self.recent_size = recent_size
+        self._recent: "OrderedDict[str, None]" = OrderedDict()
+        self.stats = {"checked": 0, "duplicates": 0, "db_checks": 0, "unconfirmed": 0}
+
+    @classmethod
+    def from_env(cls) -> "EventDeduplicator":
+        return cls(
+            RotatingBloomFilter(
+                window_seconds=float(os.environ.get("DEDUP_WINDOW_SECONDS", 3600)),
+                partitions=int(os.environ.get("DEDUP_PARTITIONS", 4)),
+                partition_capacity=int(os.environ.get("DEDUP_PARTITION_CAPACITY", 100000)),
+                error_rate=float(os.environ.get("DEDUP_ERROR_RATE", 0.001)),
+            ),
+            recent_size=int(os.environ.get("DEDUP_RECENT_SIZE", 10000)),
+        )
+
+    async def is_duplicate(self, db, collection: str, event_id: str) -> bool:
+        """Check a client-supplied id; a new id is remembered as accepted"""
+        self.stats["checked"] += 1
+        key = f"{collection}:{event_id}"
+        if self.bloom.seen_or_add(key):
+            if key in self._recent:
+                self.stats["duplicates"] += 1
+                return True
+            self.stats["db_checks"] += 1
+            if await db[collection].find_one({"id": event_id}, {"_id": 1}) is not None:
+                self.stats["duplicates"] += 1
+                return True
+            # A false positive, or a duplicate queued elsewhere that the
+            # unique index will catch on insert
+            self.stats["unconfirmed"] += 1
+
+        self._recent[key] = None
+        if len(self._recent) > self.recent_size:
+            self._recent.popitem(last=False)
+        return False
+
+    def forget(self, collection: str, event_id: str) -> None:
+        """Call when an accepted event was not stored after all, so a retry gets through
+
+        The Bloom filter cannot forget; the retry then costs one exact lookup.
+        """
+        self._recent.pop(f"{collection}:{event_id}", None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "bloom_partitions": self.bloom.partition_count,
+            "bloom_rotations": self.bloom.rotations,
+            "recent": len(self._recent),
+        }
@@ -0,0 +1,301 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from bson import json_util
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY = 11000
+
+ROOT_DIR = Path(__file__).parent.parent
+
+OVERFLOW_POLICIES = ("drop", "block", "spill")
+
+# Replay spilled events while the queue is less full than this
+REPLAY_BELOW_FILL = 0.5
+# Wait this long before replaying again after a replay that spilled back
+REPLAY_RETRY_SECONDS = 30.0
+
+# Called as hook(db, collection, written_documents) after each flush
+FlushHook = Callable[[Any, str, List[Dict[str, Any]]], Awaitable[None]]
+
+
+class EventBuffer:
+    """Bounded in-process write-behind queue for analytics events.
+
+    Request handlers call ``put`` and return immediately; a background task
+    started with ``start`` writes queued documents with one ``insert_many``
+    per collection whenever ``batch_size`` events are waiting or
+    ``flush_interval`` seconds have passed. When the queue is full the
+    ``overflow_policy`` decides what happens to new events:
+
+    * ``drop``  - reject the event and count it as dropped
+    * ``block`` - wait up to ``block_timeout`` seconds for room, then drop
+    * ``spill`` - append the event to a local JSON-lines file that is
+      replayed into Mongo whenever the queue has room, and on ``stop``
+
+    Each worker spills to its own file (host name and pid appended to
+    ``spill_path``). A worker also replays the spill files left behind by
+    dead workers on the same host.
+
+    Flush hooks registered with ``add_flush_hook`` see every document that
+    was actually written, so derived data (rollups etc.) follows the raw
+    collections without a second pass.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        overflow_policy: str = "drop",
+        block_timeout: float = 1.0,
+        spill_path: Optional[Path] = None,
+    ):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(
+                f"overflow_policy must be one of {OVERFLOW_POLICIES}, got {overflow_policy!r}"
+            )
+
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout
+        base = Path(spill_path or ROOT_DIR / "var" / "analytics_spill.jsonl")
+        self._spill_prefix = f"{base.stem}-{socket.gethostname()}-"
+        self.spill_path = base.with_name(f"{self._spill_prefix}{os.getpid()}{base.suffix}")
+        self._replay_after = 0.0
+
+        self.db = None
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+        self._flush_hooks: List[FlushHook] = []
+        self.stats = {
+            "queued": 0,
+            "flushed": 0,
+            "dropped": 0,
+            "spilled": 0,
+            "failed": 0,
+            "duplicates": 0,
+            "flushes": 0,
+        }
+
+    @classmethod
+    def from_env(cls) -> "EventBuffer":
+        """Build a buffer from ANALYTICS_BUFFER_* environment variables"""
+        spill_path = os.environ.get("ANALYTICS_BUFFER_SPILL_PATH")
+        return cls(
+            max_size=int(os.environ.get("ANALYTICS_BUFFER_MAX_SIZE", 10000)),
+            batch_size=int(os.environ.get("ANALYTICS_BUFFER_BATCH_SIZE", 500)),
+            flush_interval=float(os.environ.get("ANALYTICS_BUFFER_FLUSH_INTERVAL", 1.0)),
+            overflow_policy=os.environ.get("ANALYTICS_BUFFER_OVERFLOW", "drop"),
+            block_timeout=float(os.environ.get("ANALYTICS_BUFFER_BLOCK_TIMEOUT", 1.0)),
+            spill_path=Path(spill_path) if spill_path else None,
+        )
+
+    def add_flush_hook(self, hook: FlushHook) -> None:
+        self._flush_hooks.append(hook)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, db) -> None:
+        """Start the background flush task against the given database"""
+        if self.running:
+            return
+        self.db = db
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush task and write out everything still queued"""
+        if self._task is None:
+            return
+        self._stopping.set()
+        await self._task
+        self._task = None
+
+        while not self._queue.empty():
+            batch = []
+            while not self._queue.empty() and len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+            await self._write(batch)
+        try:
+            await self._replay_spill()
+        except Exception:
+            logger.exception("Replaying spilled analytics events failed")
+
+        logger.info("Event buffer drained: %s", self.stats)
+
+    async def put(self, collection: str, document: Dict[str, Any]) -> bool:
+        """Queue a document for ``collection``; returns False if it was dropped"""
+        item = (collection, document)
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            if self.overflow_policy == "block":
+                try:
+                    await asyncio.wait_for(self._queue.put(item), timeout=self.block_timeout)
+                except asyncio.TimeoutError:
+                    self.stats["dropped"] += 1
+                    return False
+            elif self.overflow_policy == "spill":
+                self._spill([item])
+                return True
+            else:
+                self.stats["dropped"] += 1
+                return False
+
+        self.stats["queued"] += 1
+        return True
+
+    @property
+    def fill_ratio(self) -> float:
+        """How full the queue is, from 0 to 1"""
+        return self._queue.qsize() / self.max_size if self.max_size else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters plus current queue depth, for the stats endpoint"""
+        return {
+            **self.stats,
+            "depth": self._queue.qsize(),
+            "capacity": self.max_size,
+            "overflow_policy": self.overflow_policy,
+            "running": self.running,
+        }
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                batch = await self._collect()
+                if batch:
+                    await self._write(batch)
+                if self.fill_ratio < REPLAY_BELOW_FILL and time.monotonic() >= self._replay_after:
+                    spilled = self.stats["spilled"]
+                    await self._replay_spill()
+                    if self.stats["spilled"] > spilled:
+                        # Mongo is still failing; do not rewrite the file every interval
+                        self._replay_after = time.monotonic() + REPLAY_RETRY_SECONDS
+            except Exception:
+                # Never let one bad flush kill the writer
+                logger.exception("Event buffer flush failed")
+
+    async def _collect(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Wait for up to batch_size items or until flush_interval elapses"""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _write(self, batch: List[Tuple[str, Dict[str, Any]]]) -> None:
+        by_collection: Dict[str, List[Dict[str, Any]]] = {}
+        for collection, document in batch:
+            by_collection.setdefault(collection, []).append(document)
+
+        for collection, documents in by_collection.items():
+            written = documents
+            try:
+                await self.db[collection].insert_many(documents, ordered=False)
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                failed = {err["index"] for err in errors}
+                written = [doc for i, doc in enumerate(documents) if i not in failed]
+                # Repeated client event ids hit the unique id index; not a failure
+                duplicates = sum(1 for err in errors if err.get("code") == DUPLICATE_KEY)
+                self.stats["duplicates"] += duplicates
+                self.stats["failed"] += len(failed) - duplicates
+                if len(failed) > duplicates:
+                    logger.warning("%d %s documents rejected on flush", len(failed) - duplicates, collection)
+            except Exception:
+                logger.exception("Failed to flush %d %s documents", len(documents), collection)
+                if self.overflow_policy == "spill":
+                    self._spill([(collection, document) for document in documents])
+                else:
+                    self.stats["failed"] += len(documents)
+                continue
+
+            self.stats["flushed"] += len(written)
+            for hook in self._flush_hooks:
+                try:
+                    await hook(self.db, collection, written)
+                except Exception:
+                    logger.exception("Flush hook %r failed for %s", hook, collection)
+
+        self.stats["flushes"] += 1
+
+    def _spill(self, items: List[Tuple[str, Dict[str, Any]]]) -> None:
+        self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.spill_path, "a", encoding="utf-8") as spill_file:
+            for collection, document in items:
+                spill_file.write(json_util.dumps({"collection": collection, "document": document}))
+                spill_file.write("\n")
+        self.stats["spilled"] += len(items)
+
+    def _claim_orphan(self, replay_path: Path) -> bool:
+        """Move a dead worker's spill file on this host to ``replay_path``"""
+        for path in sorted(self.spill_path.parent.glob(f"{self._spill_prefix}*")):
+            pid = path.name[len(self._spill_prefix):].split(".")[0]
+            if not pid.isdigit() or int(pid) == os.getpid() or _pid_alive(int(pid)):
+                continue
+            try:
+                path.replace(replay_path)
+            except FileNotFoundError:
+                # Another worker claimed it first
+                continue
+            logger.info("Replaying analytics events spilled by dead worker %s", pid)
+            return True
+        return False
+
+    async def _replay_spill(self) -> None:
+        """Push spilled events back into Mongo"""
+        replay_path = self.spill_path.with_suffix(".replay")
+        # A replay file left over from an interrupted replay goes first;
+        # renaming onto it would lose its events
+        if not replay_path.exists():
+            if self.spill_path.exists():
+                # Rename first so new spills during replay go to a fresh file
+                self.spill_path.replace(replay_path)
+            elif not self.spill_path.parent.is_dir() or not self._claim_orphan(replay_path):
+                return
+
+        batch = []
+        with open(replay_path, encoding="utf-8") as replay_file:
+            for line in replay_file:
+                if not line.strip():
+                    continue
+                record = json_util.loads(line)
+                batch.append((record["collection"], record["document"]))
+                if len(batch) >= self.batch_size:
+                    await self._write(batch)
+                    batch = []
+        if batch:
+            await self._write(batch)
+
+        replay_path.unlink()
+        logger.info("Replayed spilled analytics events from %s", replay_path)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,140 @@
+"""Streaming bulk export of raw analytics events.
+
+``stream_events`` walks a Motor cursor in (timestamp, id) order and yields
+encoded chunks, one per cursor batch, so memory stays flat regardless of how
+many events the export covers. Every row carries ``timestamp`` and ``id``;
+a client whose download breaks passes the last pair back as
+``after_timestamp``/``after_id`` to resume right after it. ``ip_address``
+and ``user_agent`` are personal data and only exported when requested by
+name; the endpoint itself needs the admin token.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from models.analytics import PageView, UserInteraction
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_BATCH_SIZE = 10000
+
+# Export name -> (collection, exportable fields)
+EXPORTS = {
+    "page_views": ("page_views", list(PageView.model_fields)),
+    "interactions": ("user_interactions", list(UserInteraction.model_fields)),
+}
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+# Always exported: they form the resume checkpoint
+CHECKPOINT_FIELDS = ["timestamp", "id"]
+
+# Personal data; exported only when asked for by name
+PERSONAL_FIELDS = ["ip_address", "user_agent"]
+
+
+class ExportError(ValueError):
+    pass
+
+
+def resolve_fields(export: str, fields: Optional[str]) -> List[str]:
+    """Validate a comma-separated field list; defaults to every non-personal model field"""
+    allowed = EXPORTS[export][1]
+    if not fields:
+        return [name for name in allowed if name not in PERSONAL_FIELDS]
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in allowed]
+    if unknown:
+        raise ExportError(f"Unknown fields for {export}: {', '.join(unknown)}")
+    return CHECKPOINT_FIELDS + [name for name in requested if name not in CHECKPOINT_FIELDS]
+
+
+def build_query(
+    start: Optional[datetime],
+    end: Optional[datetime],
+    after_timestamp: Optional[datetime] = None,
+    after_id: Optional[str] = None
+) -> Dict[str, Any]:
+    clauses = []
+    window = {}
+    if start is not None:
+        window["$gte"] = start
+    if end is not None:
+        window["$lt"] = end
+    if window:
+        clauses.append({"timestamp": window})
+    if after_timestamp is not None:
+        if after_id is None:
+            clauses.append({"timestamp": {"$gt": after_timestamp}})
+        else:
+            clauses.append({"$or": [
+                {"timestamp": {"$gt": after_timestamp}},
+                {"timestamp": after_timestamp, "id": {"$gt": after_id}},
+            ]})
+    if not clauses:
+        return {}
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _encode_ndjson(docs: List[Dict[str, Any]], fields: List[str]) -> bytes:
+    lines = [
+        json.dumps({name: _plain(doc.get(name)) for name in fields}, separators=(",", ":"), default=str)
+        for doc in docs
+    ]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _encode_csv(docs: List[Dict[str, Any]], fields: List[str], header: bool) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(fields)
+    for doc in docs:
+        row = []
+        for name in fields:
+            value = _plain(doc.get(name))
+            if isinstance(value, (dict, list)):
+                value = json.dumps(value, separators=(",", ":"), default=str)
+            row.append("" if value is None else value)
+        writer.writerow(row)
+    return buffer.getvalue().encode("utf-8")
+
+
+async def stream_events(
+    db,
+    export: str,
+    fmt: str,
+    query: Dict[str, Any],
+    fields: List[str],
+    batch_size: int = DEFAULT_BATCH_SIZE
+) -> AsyncIterator[bytes]:
+    """Yield the export as encoded chunks of at most ``batch_size`` rows"""
+    collection = db[EXPORTS[export][0]]
+    projection = {name: 1 for name in fields}
+    projection["_id"] = 0
+    cursor = collection.find(query, projection, batch_size=batch_size).sort([("timestamp", 1), ("id", 1)])
+
+    header = fmt == "csv"
+    batch: List[Dict[str, Any]] = []
+    try:
+        async for doc in cursor:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                yield _encode_csv(batch, fields, header) if fmt == "csv" else _encode_ndjson(batch, fields)
+                header = False
+                batch = []
+        if batch or header:
+            yield _encode_csv(batch, fields, header) if fmt == "csv" else _encode_ndjson(batch, fields)
+    finally:
+        # Client disconnects cancel the generator; free the server-side cursor
+        await cursor.close()
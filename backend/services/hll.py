@@ -0,0 +1,125 @@
+"""HyperLogLog cardinality sketch.
+
+Fixed memory per counter (``2 ** precision`` one-byte registers) regardless
+of how many values are added, mergeable by taking the register-wise max, and
+serialisable to a small zlib-compressed blob for storage in Mongo.
+"""
+import hashlib
+import math
+import zlib
+from typing import Iterable, Optional
+
+import numpy as np
+
+MIN_PRECISION = 4
+MAX_PRECISION = 16
+SERIAL_VERSION = 1
+
+
+def precision_for_error(error_rate: float) -> int:
+    """Smallest precision whose standard error (1.04 / sqrt(m)) is <= error_rate"""
+    if not 0 < error_rate < 1:
+        raise ValueError("error_rate must be between 0 and 1")
+    precision = math.ceil(math.log2((1.04 / error_rate) ** 2))
+    return max(MIN_PRECISION, min(MAX_PRECISION, precision))
+
+
+def _alpha(m: int) -> float:
+    if m == 16:
+        return 0.673
+    if m == 32:
+        return 0.697
+    if m == 64:
+        return 0.709
+    return 0.7213 / (1 + 1.079 / m)
+
+
+class HyperLogLog:
+    def __init__(self, precision: int = 14, registers: Optional[np.ndarray] = None):
+        if not MIN_PRECISION <= precision <= MAX_PRECISION:
+            raise ValueError(f"precision must be in [{MIN_PRECISION}, {MAX_PRECISION}]")
+        self.precision = precision
+        self.m = 1 << precision
+        if registers is None:
+            registers = np.zeros(self.m, dtype=np.uint8)
+        self.registers = registers
+
+    @classmethod
+    def for_error_rate(cls, error_rate: float) -> "HyperLogLog":
+        return cls(precision_for_error(error_rate))
+
+    @property
+    def error_rate(self) -> float:
+        return 1.04 / math.sqrt(self.m)
+
+    def add(self, value: str) -> None:
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest()
+        hashed = int.from_bytes(digest, "big")
+        width = 64 - self.precision
+        index = hashed >> width
+        remainder = hashed & ((1 << width) - 1)
+        rank = width - remainder.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values: Iterable[str]) -> None:
+        for value in values:
+            self.add(value)
+
+    def count(self) -> int:
+        registers = self.registers.astype(np.float64)
+        estimate = _alpha(self.m) * self.m * self.m / np.sum(np.exp2(-registers))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        # Linear counting is more accurate while most registers are empty
+        if estimate <= 2.5 * self.m and zeros:
+            estimate = self.m * math.log(self.m / zeros)
+        return int(round(estimate))
+
+    def copy(self) -> "HyperLogLog":
+        return HyperLogLog(self.precision, self.registers.copy())
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """Fold ``other`` into this sketch in place (union of both sets)"""
+        if other.precision > self.precision:
+            other = other.reduce(self.precision)
+        elif other.precision < self.precision:
+            reduced = self.reduce(other.precision)
+            self.precision, self.m, self.registers = reduced.precision, reduced.m, reduced.registers
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def reduce(self, precision: int) -> "HyperLogLog":
+        """Return an equivalent sketch at a lower precision"""
+        if precision > self.precision:
+            raise ValueError("cannot increase sketch precision")
+        if precision == self.precision:
+            return self.copy()
+
+        shift = self.precision - precision
+        index = np.arange(self.m)
+        # Index bits that move into the hashed remainder at the new precision
+        moved = index & ((1 << shift) - 1)
+        moved_length = np.zeros(self.m, dtype=np.int64)
+        nonzero = moved > 0
+        moved_length[nonzero] = np.floor(np.log2(moved[nonzero])).astype(np.int64) + 1
+        ranks = np.where(
+            nonzero,
+            shift - moved_length + 1,
+            self.registers.astype(np.int64) + shift
+        )
+        ranks = np.where(self.registers > 0, ranks, 0).astype(np.uint8)
+
+        registers = np.zeros(1 << precision, dtype=np.uint8)
+        np.maximum.at(registers, index >> shift, ranks)
+        return HyperLogLog(precision, registers)
+
+    def to_bytes(self) -> bytes:
+        return bytes([SERIAL_VERSION, self.precision]) + zlib.compress(self.registers.tobytes())
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        version, precision = data[0], data[1]
+        if version != SERIAL_VERSION:
+            raise ValueError(f"unsupported sketch version {version}")
+        registers = np.frombuffer(zlib.decompress(data[2:]), dtype=np.uint8).copy()
+        return cls(precision, registers)
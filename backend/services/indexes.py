@@ -0,0 +1,209 @@
+"""Index registry and query-plan regression check.
+
+``INDEXES`` declares every index the API relies on; ``ensure_indexes``
+creates them at startup (creating an index that already exists is a no-op).
+``QUERY_SHAPES`` mirrors the queries the routes issue, and
+``check_query_plans`` runs ``explain`` on each one and reports any whose
+winning plan falls back to a COLLSCAN. Run it against a local mongod with
+``python manage.py check-query-plans`` after touching a query or an index.
+"""
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from services.retention import TTL_INDEX_NAME, ensure_ttl_indexes
+
+logger = logging.getLogger(__name__)
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    # (field, id) indexes back keyset pagination, see services/pagination.py
+    "page_views": [
+        IndexModel([("timestamp", ASCENDING), ("page", ASCENDING)], name="timestamp_page"),
+        IndexModel([("timestamp", DESCENDING), ("id", DESCENDING)], name="timestamp_id"),
+        IndexModel(
+            [("page", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)],
+            name="page_timestamp_id"
+        ),
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "user_interactions": [
+        IndexModel(
+            [("timestamp", ASCENDING), ("action", ASCENDING), ("page", ASCENDING)],
+            name="timestamp_action_page"
+        ),
+        IndexModel([("timestamp", DESCENDING), ("id", DESCENDING)], name="timestamp_id"),
+        IndexModel(
+            [("action", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)],
+            name="action_timestamp_id"
+        ),
+        IndexModel(
+            [("page", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)],
+            name="page_timestamp_id"
+        ),
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "contact_messages": [
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "status_checks": [
+        IndexModel([("timestamp", DESCENDING), ("id", DESCENDING)], name="timestamp_id"),
+    ],
+    "rollup_page_views_hourly": [
+        IndexModel([("bucket", ASCENDING), ("page", ASCENDING)], name="bucket_page", unique=True),
+    ],
+    "rollup_referrers_daily": [
+        IndexModel([("bucket", ASCENDING), ("referrer", ASCENDING)], name="bucket_referrer", unique=True),
+    ],
+    "rollup_interactions_daily": [
+        IndexModel([("bucket", ASCENDING), ("action", ASCENDING)], name="bucket_action", unique=True),
+    ],
+    "visitor_sketches": [
+        IndexModel([("bucket", ASCENDING), ("page", ASCENDING)], name="bucket_page", unique=True),
+    ],
+    "analytics_sessions": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("session_id", ASCENDING), ("closed", ASCENDING)], name="session_closed"),
+        IndexModel([("closed", ASCENDING), ("end_time", ASCENDING)], name="closed_end_time"),
+    ],
+    "rollup_sessions_daily": [
+        IndexModel([("bucket", ASCENDING)], name="bucket", unique=True),
+    ],
+}
+
+
+async def ensure_indexes(db) -> Dict[str, List[str]]:
+    """Create every registered index; returns index names per collection"""
+    created = {}
+    for collection, indexes in INDEXES.items():
+        created[collection] = await db[collection].create_indexes(indexes)
+
+    # TTL options depend on configuration and are retuned in place
+    for collection, seconds in (await ensure_ttl_indexes(db)).items():
+        if seconds is not None:
+            created[collection].append(TTL_INDEX_NAME)
+    return created
+
+
+@dataclass
+class QueryShape:
+    """One query the API issues, expressed as an explainable command"""
+    name: str
+    collection: str
+    filter: Dict[str, Any] = field(default_factory=dict)
+    sort: Optional[Dict[str, int]] = None
+    pipeline: Optional[List[Dict[str, Any]]] = None
+
+    def explain_command(self) -> Dict[str, Any]:
+        if self.pipeline is not None:
+            return {"aggregate": self.collection, "pipeline": self.pipeline, "cursor": {}}
+        command = {"find": self.collection, "filter": self.filter}
+        if self.sort:
+            command["sort"] = self.sort
+        return command
+
+
+def _keyset_page(field: str, query: Dict[str, Any]) -> Dict[str, Any]:
+    """A non-first page: ``query`` plus the after-cursor predicate"""
+    value = datetime.utcnow() - timedelta(days=1)
+    return {"$and": [query, {"$or": [
+        {field: {"$lt": value}},
+        {field: value, "id": {"$lt": "cursor-id"}},
+    ]}]}
+
+
+def query_shapes() -> List[QueryShape]:
+    """Representative instances of every hot query in routes/ and services/"""
+    end = datetime.utcnow()
+    window = {"$gte": end - timedelta(days=7), "$lte": end}
+    buckets = {"$gte": end - timedelta(days=30), "$lte": end}
+    newest_first = {"timestamp": -1, "id": -1}
+
+    shapes = [
+        QueryShape("page_views.exact_uniques", "page_views", pipeline=[{"$match": {"timestamp": window}}]),
+        QueryShape("contact_messages.list", "contact_messages", {}, {"created_at": -1, "id": -1}),
+        QueryShape(
+            "contact_messages.list_next_page", "contact_messages",
+            _keyset_page("created_at", {}), {"created_at": -1, "id": -1}
+        ),
+        QueryShape("status_checks.list", "status_checks", {}, newest_first),
+        QueryShape("contact_messages.mark_read", "contact_messages", {"id": "message-id"}),
+        QueryShape(
+            "contact_messages.summary_facet", "contact_messages",
+            pipeline=[{"$match": {"created_at": buckets}}]
+        ),
+        QueryShape("visitor_sketches.window", "visitor_sketches", {"bucket": buckets}),
+        QueryShape(
+            "visitor_sketches.merge", "visitor_sketches",
+            {"bucket": end.replace(hour=0, minute=0, second=0, microsecond=0), "page": "/"}
+        ),
+    ]
+    listings = [
+        ("page_views.list", "page_views", {"timestamp": window}),
+        ("page_views.list_by_page", "page_views", {"timestamp": window, "page": "/"}),
+        ("user_interactions.list", "user_interactions", {"timestamp": window}),
+        ("user_interactions.list_by_action", "user_interactions", {"timestamp": window, "action": "click"}),
+        ("user_interactions.list_by_page", "user_interactions", {"timestamp": window, "page": "/"}),
+    ]
+    for collection in ("page_views", "user_interactions"):
+        shapes.append(QueryShape(
+            f"{collection}.export", collection,
+            {"timestamp": window}, {"timestamp": 1, "id": 1}
+        ))
+
+    for name, collection, query in listings:
+        shapes.append(QueryShape(name, collection, query, newest_first))
+        shapes.append(QueryShape(f"{name}_next_page", collection, _keyset_page("timestamp", query), newest_first))
+
+    shapes.append(QueryShape(
+        "analytics_sessions.open_for_ids", "analytics_sessions",
+        {"session_id": {"$in": ["session-id"]}, "closed": False}
+    ))
+    shapes.append(QueryShape(
+        "analytics_sessions.idle", "analytics_sessions",
+        {"closed": False, "end_time": {"$lt": end - timedelta(minutes=30)}}
+    ))
+
+    for collection in (
+        "rollup_page_views_hourly", "rollup_referrers_daily",
+        "rollup_interactions_daily", "rollup_sessions_daily"
+    ):
+        shapes.append(QueryShape(
+            f"{collection}.window", collection,
+            pipeline=[{"$match": {"bucket": buckets}}]
+        ))
+    return shapes
+
+
+def _winning_stages(explain: Any, inside_plan: bool = False) -> List[str]:
+    """Collect every plan stage name found under a winningPlan"""
+    stages = []
+    if isinstance(explain, dict):
+        for key, value in explain.items():
+            if key == "stage" and inside_plan and isinstance(value, str):
+                stages.append(value)
+            elif key == "rejectedPlans":
+                continue
+            else:
+                stages.extend(_winning_stages(value, inside_plan or key == "winningPlan"))
+    elif isinstance(explain, list):
+        for item in explain:
+            stages.extend(_winning_stages(item, inside_plan))
+    return stages
+
+
+async def check_query_plans(db) -> List[Dict[str, Any]]:
+    """Explain every registered query shape; returns one report per shape"""
+    reports = []
+    for shape in query_shapes():
+        explain = await db.command("explain", shape.explain_command(), verbosity="queryPlanner")
+        stages = _winning_stages(explain)
+        reports.append({
+            "name": shape.name,
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages,
+        })
+    return reports
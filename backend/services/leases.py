@@ -0,0 +1,32 @@
+"""Named leases so only one worker runs a periodic job at a time.
+
+Each lease is one document in ``leases``. ``acquire_lease`` takes it when it
+is free, expired or already ours; the upsert hits the unique ``_id`` when
+another worker holds it, which is how we learn we lost.
+"""
+from datetime import datetime, timedelta
+from typing import Optional
+
+from pymongo.errors import DuplicateKeyError
+
+LEASE_COLLECTION = "leases"
+
+
+async def acquire_lease(db, name: str, owner: str, seconds: float, now: Optional[datetime] = None) -> bool:
+    now = now or datetime.utcnow()
+    try:
+        await db[LEASE_COLLECTION].find_one_and_update(
+            {"_id": name, "$or": [{"lease_until": {"$lt": now}}, {"owner": owner}]},
+            {"$set": {"owner": owner, "lease_until": now + timedelta(seconds=seconds)}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        return False
+
+
+async def release_lease(db, name: str, owner: str) -> None:
+    await db[LEASE_COLLECTION].update_one(
+        {"_id": name, "owner": owner},
+        {"$set": {"lease_until": datetime.min}}
+    )
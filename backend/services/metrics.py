@@ -0,0 +1,320 @@
+"""Prometheus text-format metrics for HTTP requests and Mongo commands.
+
+``MetricsMiddleware`` records per-route request counts, latency, in-flight
+requests and payload sizes. ``MongoCommandMetrics`` is a PyMongo command
+listener timing every command per collection. PyMongo runs commands on
+Motor's executor threads, which inherit the request's context, so each
+command also lands in the current request's ``RequestTrace``; the
+middleware then splits the request's wall time into Mongo wait (the union
+of its command intervals, so concurrent queries are not double counted) and
+everything else, i.e. time spent in the application.
+
+The metric types are deliberately minimal and thread-safe; ``render()``
+produces the text exposition format served at ``GET /api/metrics``.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (128, 512, 2048, 8192, 32768, 131072, 524288, 2097152)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Labels:
+        return tuple((name, str(labels.get(name, ""))) for name in self.label_names)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        header = f"# HELP {self.name} {self.help_text}\n# TYPE {self.name} {self.kind}\n"
+        return header + "".join(f"{line}\n" for line in self.samples())
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(key)} {_format_value(value)}"
+
+
+class Gauge(Metric):
+    """Set directly, or computed at render time from ``callback``"""
+    kind = "gauge"
+
+    def __init__(self, *args, callback: Optional[Callable[[], float]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.callback = callback
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def samples(self) -> Iterable[str]:
+        if self.callback is not None:
+            yield f"{self.name} {_format_value(self.callback())}"
+            return
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(key)} {_format_value(value)}"
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(buckets)
+        # labels -> (per-bucket counts incl. +Inf, sum)
+        self._values: Dict[Labels, Tuple[List[int], float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(key, ('le', _format_value(float(bound))))} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(key)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help_text, label_names))
+
+    def gauge(self, name: str, help_text: str, label_names: Sequence[str] = (), callback=None) -> Gauge:
+        return self.register(Gauge(name, help_text, label_names, callback=callback))
+
+    def histogram(self, name: str, help_text: str, label_names: Sequence[str] = (), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, label_names, buckets=buckets))
+
+    def render(self) -> str:
+        return "".join(metric.render() for metric in self._metrics)
+
+
+registry = Registry()
+
+HTTP_REQUESTS = registry.counter(
+    "http_requests_total", "HTTP requests by route and status code", ("method", "route", "status")
+)
+HTTP_LATENCY = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route", "status")
+)
+HTTP_IN_FLIGHT = registry.gauge("http_requests_in_flight", "HTTP requests currently being served")
+HTTP_REQUEST_SIZE = registry.histogram(
+    "http_request_size_bytes", "HTTP request body size (Content-Length)", ("method", "route"), SIZE_BUCKETS
+)
+HTTP_RESPONSE_SIZE = registry.histogram(
+    "http_response_size_bytes", "HTTP response body size", ("method", "route"), SIZE_BUCKETS
+)
+HTTP_DB_WAIT = registry.histogram(
+    "http_request_db_wait_seconds", "Time a request spent waiting on Mongo commands", ("method", "route")
+)
+HTTP_APP_TIME = registry.histogram(
+    "http_request_app_seconds", "Request time not spent waiting on Mongo", ("method", "route")
+)
+MONGO_COMMANDS = registry.histogram(
+    "mongodb_command_duration_seconds", "Mongo command duration", ("collection", "command")
+)
+MONGO_FAILURES = registry.counter(
+    "mongodb_command_failures_total", "Failed Mongo commands", ("collection", "command")
+)
+
+
+class RequestTrace:
+    """Mongo command intervals recorded while serving one request"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.commands: List[Dict[str, Any]] = []
+
+    def add(self, collection: str, command: str, started: float, finished: float, ok: bool) -> None:
+        with self._lock:
+            self.commands.append({
+                "collection": collection,
+                "command": command,
+                "started": started,
+                "duration": finished - started,
+                "ok": ok,
+            })
+
+    def db_wait(self) -> float:
+        """Length of the union of command intervals"""
+        with self._lock:
+            intervals = sorted((c["started"], c["started"] + c["duration"]) for c in self.commands)
+        total = 0.0
+        current_start = current_end = None
+        for start, end in intervals:
+            if current_end is None or start > current_end:
+                if current_end is not None:
+                    total += current_end - current_start
+                current_start, current_end = start, end
+            else:
+                current_end = max(current_end, end)
+        if current_end is not None:
+            total += current_end - current_start
+        return total
+
+
+current_trace: contextvars.ContextVar[Optional[RequestTrace]] = contextvars.ContextVar("current_trace", default=None)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Times every command and attributes it to the active request, if any"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[Any, int], Tuple[str, str, Optional[RequestTrace]]] = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = "admin" if event.command_name in ("ping", "hello", "isMaster", "ismaster") else "-"
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (
+                collection, event.command_name, current_trace.get()
+            )
+
+    def _finish(self, event, ok: bool) -> None:
+        with self._lock:
+            pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+        collection, command, trace = pending
+        seconds = event.duration_micros / 1_000_000
+        MONGO_COMMANDS.observe(seconds, collection=collection, command=command)
+        if not ok:
+            MONGO_FAILURES.inc(collection=collection, command=command)
+        if trace is not None:
+            finished = time.perf_counter()
+            trace.add(collection, command, finished - seconds, finished, ok)
+
+    def succeeded(self, event):
+        self._finish(event, True)
+
+    def failed(self, event):
+        self._finish(event, False)
+
+
+def route_label(scope: Dict[str, Any]) -> str:
+    """The matched route template, keeping label cardinality bounded"""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request metrics; works with streamed bodies"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace()
+        token = current_trace.set(trace)
+        status = {"code": 500}
+        response_bytes = 0
+
+        async def send_wrapper(message):
+            nonlocal response_bytes
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_IN_FLIGHT.dec()
+            current_trace.reset(token)
+
+            method = scope["method"]
+            route = route_label(scope)
+            HTTP_REQUESTS.inc(method=method, route=route, status=status["code"])
+            HTTP_LATENCY.observe(elapsed, method=method, route=route, status=status["code"])
+            HTTP_RESPONSE_SIZE.observe(response_bytes, method=method, route=route)
+            content_length = dict(scope.get("headers") or []).get(b"content-length")
+            if content_length and content_length.isdigit():
+                HTTP_REQUEST_SIZE.observe(int(content_length), method=method, route=route)
+
+            db_wait = min(trace.db_wait(), elapsed)
+            HTTP_DB_WAIT.observe(db_wait, method=method, route=route)
+            HTTP_APP_TIME.observe(elapsed - db_wait, method=method, route=route)
+
+
+def render() -> str:
+    return registry.render()
@@ -0,0 +1,83 @@
+"""Keyset (cursor) pagination over (sort field, id), newest first.
+
+Each page asks for documents strictly after the last one returned, using
+an index on (field, id), so page N costs the same as page 1: no skip and no
+unbounded ``to_list``. Cursors are opaque URL-safe tokens.
+"""
+import base64
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import json_util
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def clamp_limit(limit: Optional[int]) -> int:
+    if not limit:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def encode_cursor(value: datetime, document_id: str) -> str:
+    payload = json_util.dumps({"v": value, "id": document_id}).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json_util.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        value, document_id = payload["v"], payload["id"]
+    except Exception as e:
+        raise InvalidCursor("Invalid pagination cursor") from e
+    # Both end up in the query; anything else (e.g. an operator document) is refused
+    if not isinstance(value, datetime) or not isinstance(document_id, str):
+        raise InvalidCursor("Invalid pagination cursor")
+    return value, document_id
+
+
+def after_cursor(field: str, cursor: Optional[str], descending: bool = True) -> Dict[str, Any]:
+    """Filter selecting documents that come after ``cursor`` in (field, id) order"""
+    if not cursor:
+        return {}
+    value, document_id = decode_cursor(cursor)
+    op = "$lt" if descending else "$gt"
+    return {"$or": [
+        {field: {op: value}},
+        {field: value, "id": {op: document_id}},
+    ]}
+
+
+async def fetch_page(
+    collection,
+    query: Dict[str, Any],
+    field: str,
+    limit: Optional[int],
+    cursor: Optional[str] = None,
+    projection: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Return ``{"items": [...], "next_cursor": str | None}`` for one page"""
+    limit = clamp_limit(limit)
+    keyset = after_cursor(field, cursor)
+    if keyset:
+        query = {"$and": [query, keyset]} if query else keyset
+
+    # One extra document tells us whether another page exists
+    items: List[Dict[str, Any]] = await collection.find(
+        query,
+        projection if projection is not None else {"_id": 0}
+    ).sort([(field, -1), ("id", -1)]).limit(limit + 1).to_list(limit + 1)
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = encode_cursor(last[field], last["id"])
+
+    return {"items": items, "next_cursor": next_cursor}
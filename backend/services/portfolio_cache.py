@@ -0,0 +1,145 @@
+"""Pre-encoded, ETag-stamped copy of the portfolio document.
+
+The portfolio only changes through ``PUT /portfolio`` (or the seed script),
+so each worker keeps the serialised document in memory and answers reads
+without touching Mongo. Writers bump a version stamp stored in the
+``cache_versions`` collection; a background task in every worker polls that
+one small document and rebuilds its copy when the stamp moves, which
+spreads invalidation across uvicorn workers. The gzip/brotli variants are
+compressed once per rebuild and served by ``Accept-Encoding``.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from services.compression import EncodedBody
+from services.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+VERSION_COLLECTION = "cache_versions"
+PORTFOLIO_VERSION_ID = "portfolio"
+
+
+async def bump_portfolio_version(db) -> int:
+    """Record that the portfolio document changed; returns the new version"""
+    result = await db[VERSION_COLLECTION].find_one_and_update(
+        {"_id": PORTFOLIO_VERSION_ID},
+        {"$inc": {"version": 1}},
+        upsert=True,
+        return_document=True
+    )
+    return result["version"]
+
+
+async def read_portfolio_version(db) -> int:
+    stamp = await db[VERSION_COLLECTION].find_one({"_id": PORTFOLIO_VERSION_ID})
+    return stamp["version"] if stamp else 0
+
+
+def variant_etag(etag: str, encoding: Optional[str]) -> str:
+    """Distinct tag per Content-Encoding: '"abc"' becomes '"abc-gzip"'"""
+    return etag if encoding is None else f'{etag[:-1]}-{encoding}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """RFC 7232 weak comparison of an If-None-Match header against our ETag
+
+    A tag we issued for any encoded variant of the same document matches too.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")]
+    return any(
+        candidate == etag or (candidate.startswith(etag[:-1] + "-") and candidate.endswith('"'))
+        for candidate in candidates
+    )
+
+
+class PortfolioCache:
+    def __init__(self, poll_interval: float = 5.0):
+        self.poll_interval = poll_interval
+        self.body: Optional[EncodedBody] = None
+        self.etag: Optional[str] = None
+        self.version: Optional[int] = None
+        self._loaded = False
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"hits": 0, "misses": 0, "not_modified": 0, "rebuilds": 0}
+
+    @classmethod
+    def from_env(cls) -> "PortfolioCache":
+        return cls(poll_interval=float(os.environ.get("PORTFOLIO_CACHE_POLL_SECONDS", 5.0)))
+
+    async def get(self, db) -> Optional[Tuple[EncodedBody, str]]:
+        """Return (encoded body, etag), loading on first use; None if there is no portfolio"""
+        if self._loaded:
+            self.stats["hits"] += 1
+        else:
+            self.stats["misses"] += 1
+            await self.rebuild(db)
+        if self.body is None:
+            return None
+        return self.body, self.etag
+
+    async def rebuild(self, db, version: Optional[int] = None) -> None:
+        """Re-read and re-encode the portfolio document"""
+        async with self._lock:
+            # Read the stamp before the document: if a write lands in between
+            # we cache the newer document under the older stamp and simply
+            # rebuild once more on the next poll, never the other way round.
+            if version is None:
+                version = await read_portfolio_version(db)
+            portfolio = await db.portfolio.find_one({}, {"_id": 0})
+            self._set(portfolio, version)
+
+    async def invalidate(self, db) -> None:
+        """Called after a local write: bump the shared stamp and rebuild now"""
+        version = await bump_portfolio_version(db)
+        await self.rebuild(db, version)
+
+    def start(self, db) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._poll(db))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "version": self.version,
+            "etag": self.etag,
+            "sizes": self.body.sizes() if self.body is not None else None
+        }
+
+    def _set(self, portfolio: Optional[Dict[str, Any]], version: int) -> None:
+        if portfolio is None:
+            self.body = self.etag = None
+        else:
+            raw = dumps(portfolio)
+            self.body = EncodedBody(raw)
+            self.etag = '"' + hashlib.sha256(raw).hexdigest()[:32] + '"'
+        self.version = version
+        self._loaded = True
+        self.stats["rebuilds"] += 1
+
+    async def _poll(self, db) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                version = await read_portfolio_version(db)
+                if version != self.version:
+                    await self.rebuild(db, version)
+            except Exception:
+                logger.exception("Portfolio cache version check failed")
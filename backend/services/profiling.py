@@ -0,0 +1,252 @@
+"""Opt-in request profiling and slow-request capture.
+
+A request is profiled with cProfile when
+
+* it carries ``X-Profile: 1`` together with ``X-Admin-Token`` matching
+  ``PROFILING_ADMIN_TOKEN``, or
+* automatic sampling is on (``PROFILING_SAMPLE_RATE`` > 0) and the request
+  is picked; the profile is kept only if the request then turns out slower
+  than ``PROFILING_SLOW_MS``.
+
+Any request slower than ``PROFILING_SLOW_MS`` is captured even when it was
+not profiled, with its Mongo calls (from ``services.metrics``) and the
+worst event-loop lag seen while it ran. Captures go to
+``PROFILING_DIR`` (default ``backend/var/profiles``) as ``<name>.json``
+plus ``<name>.prof`` (pstats, open with ``snakeviz`` or ``pstats``) and
+only the newest ``PROFILING_MAX_CAPTURES`` are kept.
+
+cProfile sees the whole event-loop thread, so a profile also contains
+whatever other requests ran concurrently; only one request is profiled at
+a time.
+"""
+import asyncio
+import cProfile
+import hmac
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from services.metrics import current_trace, route_label
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).parent.parent
+CAPTURE_NAME = re.compile(r"^[0-9TZ\-]+-[0-9a-f]{8}\.(json|prof)$")
+
+
+class LoopLagMonitor:
+    """Measures how late a periodic wake-up fires; late means the loop was blocked"""
+
+    def __init__(self, interval: float = 0.05, history_seconds: float = 300.0):
+        self.interval = interval
+        self._samples: Deque[Tuple[float, float]] = deque(maxlen=int(history_seconds / interval))
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def max_lag(self, since: float) -> float:
+        """Worst lag (seconds) among samples taken after ``since`` (perf_counter)"""
+        return max((lag for at, lag in list(self._samples) if at >= since), default=0.0)
+
+    async def _run(self) -> None:
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            self._samples.append((now, max(0.0, now - expected)))
+
+
+class CaptureStore:
+    """Rotating directory of captured requests"""
+
+    def __init__(self, directory: Path, max_captures: int = 50):
+        self.directory = Path(directory)
+        self.max_captures = max_captures
+
+    def save(self, meta: Dict[str, Any], profile: Optional[cProfile.Profile]) -> str:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = f"{datetime.utcnow():%Y%m%dT%H%M%S}Z-{uuid.uuid4().hex[:8]}"
+        if profile is not None:
+            profile.dump_stats(self.directory / f"{name}.prof")
+            meta["profile"] = f"{name}.prof"
+            meta["top_functions"] = _top_functions(profile)
+        (self.directory / f"{name}.json").write_text(json.dumps(meta, indent=2, default=str))
+        self._rotate()
+        return name
+
+    def list(self) -> List[Dict[str, Any]]:
+        captures = []
+        for path in sorted(self.directory.glob("*.json"), reverse=True):
+            try:
+                meta = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            meta.pop("top_functions", None)
+            meta.pop("mongo_calls", None)
+            captures.append({"name": path.name, **meta})
+        return captures
+
+    def path_for(self, name: str) -> Optional[Path]:
+        if not CAPTURE_NAME.match(name):
+            return None
+        path = self.directory / name
+        return path if path.is_file() else None
+
+    def _rotate(self) -> None:
+        captures = sorted(self.directory.glob("*.json"))
+        for stale in captures[:-self.max_captures] if self.max_captures else captures:
+            stale.unlink(missing_ok=True)
+            stale.with_suffix(".prof").unlink(missing_ok=True)
+
+
+def _top_functions(profile: cProfile.Profile, limit: int = 25) -> str:
+    output = io.StringIO()
+    pstats.Stats(profile, stream=output).sort_stats("cumulative").print_stats(limit)
+    return output.getvalue()
+
+
+class Profiler:
+    def __init__(
+        self,
+        directory: Path,
+        admin_token: Optional[str] = None,
+        slow_ms: float = 1000.0,
+        sample_rate: float = 0.0,
+        max_captures: int = 50
+    ):
+        self.admin_token = admin_token
+        self.slow_seconds = slow_ms / 1000
+        self.sample_rate = sample_rate
+        self.store = CaptureStore(directory, max_captures)
+        self.loop_lag = LoopLagMonitor()
+        self.active = False
+        self.stats = {"profiled": 0, "captured": 0, "busy": 0}
+
+    @classmethod
+    def from_env(cls) -> "Profiler":
+        directory = os.environ.get("PROFILING_DIR")
+        return cls(
+            directory=Path(directory) if directory else ROOT_DIR / "var" / "profiles",
+            admin_token=os.environ.get("PROFILING_ADMIN_TOKEN") or None,
+            slow_ms=float(os.environ.get("PROFILING_SLOW_MS", 1000)),
+            sample_rate=float(os.environ.get("PROFILING_SAMPLE_RATE", 0)),
+            max_captures=int(os.environ.get("PROFILING_MAX_CAPTURES", 50)),
+        )
+
+    def token_valid(self, token: Optional[str]) -> bool:
+        if not self.admin_token or token is None:
+            return False
+        # Constant time, so response timing does not reveal the token
+        return hmac.compare_digest(token.encode("utf-8"), self.admin_token.encode("utf-8"))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "slow_ms": self.slow_seconds * 1000,
+            "sample_rate": self.sample_rate,
+            "directory": str(self.store.directory),
+        }
+
+    def requested_by(self, headers: Dict[bytes, bytes]) -> bool:
+        if headers.get(b"x-profile") != b"1":
+            return False
+        token = headers.get(b"x-admin-token", b"").decode("latin-1")
+        return self.token_valid(token)
+
+    async def capture(self, meta: Dict[str, Any], profile: Optional[cProfile.Profile]) -> None:
+        try:
+            await asyncio.to_thread(self.store.save, meta, profile)
+            self.stats["captured"] += 1
+        except OSError:
+            logger.exception("Could not save request capture")
+
+
+class ProfilingMiddleware:
+    """ASGI middleware; sits inside MetricsMiddleware so the Mongo trace is available"""
+
+    def __init__(self, app, profiler: Profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profiler = self.profiler
+        requested = profiler.requested_by(dict(scope.get("headers") or []))
+        sampled = not requested and profiler.sample_rate > 0 and random.random() < profiler.sample_rate
+        profile = None
+        if requested or sampled:
+            if profiler.active:
+                profiler.stats["busy"] += 1
+            else:
+                profile = cProfile.Profile()
+                try:
+                    profile.enable()
+                    profiler.active = True
+                except ValueError:
+                    # Another profiler (e.g. a debugger or coverage) owns the hook
+                    profile = None
+
+        status = {"code": 500, "streaming": False}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                content_type = dict(message.get("headers") or []).get(b"content-type", b"")
+                status["streaming"] = content_type.startswith(b"text/event-stream")
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            if profile is not None:
+                profile.disable()
+                profiler.active = False
+                profiler.stats["profiled"] += 1
+
+            # Event streams stay open by design; their duration says nothing
+            slow = elapsed >= profiler.slow_seconds and not status["streaming"]
+            if requested or slow:
+                trace = current_trace.get()
+                mongo_calls = [
+                    {**call, "started": round(call["started"] - started, 6), "duration": round(call["duration"], 6)}
+                    for call in (trace.commands if trace is not None else [])
+                ]
+                meta = {
+                    "captured_at": datetime.utcnow(),
+                    "trigger": "requested" if requested else ("sampled" if profile is not None else "slow"),
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": route_label(scope),
+                    "status": status["code"],
+                    "duration_ms": round(elapsed * 1000, 3),
+                    "db_wait_ms": round((trace.db_wait() if trace is not None else 0.0) * 1000, 3),
+                    "max_loop_lag_ms": round(profiler.loop_lag.max_lag(started) * 1000, 3),
+                    "mongo_calls": mongo_calls,
+                }
+                await profiler.capture(meta, profile)
@@ -0,0 +1,276 @@
+"""In-memory "last N minutes" counters for ``GET /analytics/realtime``.
+
+Every worker counts the events it ingests into per-second ring buffers:
+views per page, interactions per action and distinct session ids. Each
+buffer keeps a running total for every window (1, 5 and 15 minutes) and
+subtracts a second's bucket as soon as it slides out, so adding an event
+costs a few dict updates and reading a window costs nothing more than
+copying its totals.
+
+Workers share their numbers through one ``realtime_counters`` document.
+Every ``REALTIME_SYNC_SECONDS`` each worker writes its window totals to its
+own field in that document and reads everyone else's. The peers' totals
+are summed ahead of time, so a request only adds the local live totals to
+a precomputed sum. Peers that stop publishing are ignored after
+``REALTIME_STALE_SECONDS``. Active sessions cannot be summed across
+workers (one session may hit several), so workers publish a HyperLogLog
+of their active session ids per window. With peers present the merged
+estimate, as of the last sync, is reported.
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bson import Binary
+
+from services.hll import HyperLogLog
+
+logger = logging.getLogger(__name__)
+
+REALTIME_COLLECTION = "realtime_counters"
+REALTIME_DOC_ID = "workers"
+
+# Window length in seconds -> label used in responses
+WINDOWS = {60: "1m", 300: "5m", 900: "15m"}
+
+SESSION_SKETCH_PRECISION = 12
+
+
+class SlidingWindowCounter:
+    """Per-key counts over several trailing windows, in one-second buckets
+
+    With ``distinct=True`` a key counts at most once per second, and
+    ``distinct_count`` gives the number of different keys seen in a window.
+    """
+
+    def __init__(self, windows: Iterable[int] = tuple(WINDOWS), distinct: bool = False, clock=time.time):
+        self.windows = tuple(sorted(windows))
+        self.size = self.windows[-1]
+        self.distinct = distinct
+        self.clock = clock
+        self._buckets: List[Dict[str, int]] = [{} for _ in range(self.size)]
+        self._totals: Dict[int, Dict[str, int]] = {window: {} for window in self.windows}
+        self._current: Optional[int] = None
+
+    def add(self, key: str, amount: int = 1) -> None:
+        second = self._advance()
+        bucket = self._buckets[second % self.size]
+        if self.distinct:
+            if key in bucket:
+                return
+            amount = 1
+        bucket[key] = bucket.get(key, 0) + amount
+        for totals in self._totals.values():
+            totals[key] = totals.get(key, 0) + amount
+
+    def totals(self, window: int) -> Dict[str, int]:
+        """Counts per key over the last ``window`` seconds (a copy)"""
+        self._advance()
+        return dict(self._totals[window])
+
+    def distinct_count(self, window: int) -> int:
+        self._advance()
+        return len(self._totals[window])
+
+    def keys(self, window: int) -> Iterable[str]:
+        self._advance()
+        return list(self._totals[window])
+
+    def _advance(self) -> int:
+        """Slide to the current second, expiring buckets that left each window"""
+        second = int(self.clock())
+        current = self._current
+        if current is None or second - current >= self.size:
+            if current is not None:
+                self._reset()
+            self._current = second
+            return second
+        if second <= current:
+            # Clock stepped back: keep counting into the newest bucket
+            return current
+
+        for step in range(current + 1, second + 1):
+            for window, totals in self._totals.items():
+                for key, count in self._buckets[(step - window) % self.size].items():
+                    remaining = totals[key] - count
+                    if remaining > 0:
+                        totals[key] = remaining
+                    else:
+                        del totals[key]
+            # The bucket for ``step`` is the one that just left the longest window
+            self._buckets[step % self.size] = {}
+        self._current = second
+        return second
+
+    def _reset(self) -> None:
+        self._buckets = [{} for _ in range(self.size)]
+        self._totals = {window: {} for window in self.windows}
+
+
+def _merge_counts(target: Dict[str, int], counts: Iterable[Tuple[str, int]]) -> None:
+    for key, count in counts:
+        target[key] = target.get(key, 0) + count
+
+
+class RealtimeCounters:
+    def __init__(self, sync_interval: float = 2.0, stale_seconds: float = 10.0):
+        self.sync_interval = sync_interval
+        self.stale_seconds = stale_seconds
+        self.worker_id = uuid.uuid4().hex
+        self.page_views = SlidingWindowCounter()
+        self.interactions = SlidingWindowCounter()
+        self.sessions = SlidingWindowCounter(distinct=True)
+
+        # Summed totals of the other workers, as of the last sync
+        self._peers: Dict[int, Dict[str, Any]] = {}
+        self._peer_count = 0
+        self._synced_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"syncs": 0, "sync_failures": 0}
+
+    @classmethod
+    def from_env(cls) -> "RealtimeCounters":
+        return cls(
+            sync_interval=float(os.environ.get("REALTIME_SYNC_SECONDS", 2.0)),
+            stale_seconds=float(os.environ.get("REALTIME_STALE_SECONDS", 10.0)),
+        )
+
+    def record(self, collection: str, document: Dict[str, Any]) -> None:
+        """Count one ingested event"""
+        if collection == "page_views":
+            self.page_views.add(document.get("page") or "")
+        elif collection == "user_interactions":
+            self.interactions.add(document.get("action") or "", document.get("weight", 1))
+        else:
+            return
+        session_id = document.get("session_id")
+        if session_id:
+            self.sessions.add(session_id)
+
+    def local(self) -> Dict[int, Dict[str, Any]]:
+        """This worker's totals per window"""
+        return {
+            window: {
+                "page_views": self.page_views.totals(window),
+                "interactions": self.interactions.totals(window),
+                "active_sessions": self.sessions.distinct_count(window),
+            }
+            for window in WINDOWS
+        }
+
+    def view(self) -> Dict[str, Any]:
+        """Local live totals plus the peers' totals from the last sync"""
+        windows = {}
+        for window, counts in self.local().items():
+            peers = self._peers.get(window)
+            if peers is not None:
+                _merge_counts(counts["page_views"], peers["page_views"].items())
+                _merge_counts(counts["interactions"], peers["interactions"].items())
+                counts["active_sessions"] = peers["active_sessions"]
+            counts["total_views"] = sum(counts["page_views"].values())
+            counts["total_interactions"] = sum(counts["interactions"].values())
+            windows[WINDOWS[window]] = counts
+        return {
+            "windows": windows,
+            "workers": self._peer_count + 1,
+            "synced_at": self._synced_at,
+        }
+
+    def start(self, db) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(db))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "worker_id": self.worker_id, "peers": self._peer_count, "synced_at": self._synced_at}
+
+    def _session_sketches(self) -> Dict[int, HyperLogLog]:
+        sketches = {}
+        for window in WINDOWS:
+            sketch = HyperLogLog(SESSION_SKETCH_PRECISION)
+            sketch.update(self.sessions.keys(window))
+            sketches[window] = sketch
+        return sketches
+
+    async def sync(self, db) -> None:
+        """Publish our totals and fold in everyone else's"""
+        now = datetime.utcnow()
+        local = self.local()
+        sketches = self._session_sketches()
+        published = {
+            "updated_at": now,
+            "windows": {
+                # [key, count] pairs: pages may contain dots, which field names cannot
+                str(window): {
+                    "page_views": list(counts["page_views"].items()),
+                    "interactions": list(counts["interactions"].items()),
+                    "sessions": Binary(sketches[window].to_bytes()),
+                }
+                for window, counts in local.items()
+            },
+        }
+        document = await db[REALTIME_COLLECTION].find_one_and_update(
+            {"_id": REALTIME_DOC_ID},
+            {"$set": {f"workers.{self.worker_id}": published}},
+            upsert=True,
+            return_document=True
+        )
+
+        fresh_after = now - timedelta(seconds=self.stale_seconds)
+        peers: Dict[int, Dict[str, Any]] = {}
+        peer_count = 0
+        gone = []
+        for worker_id, state in (document.get("workers") or {}).items():
+            if worker_id == self.worker_id:
+                continue
+            if state["updated_at"] < fresh_after:
+                # Past the longest window it can never count again
+                if state["updated_at"] < now - timedelta(seconds=max(WINDOWS)):
+                    gone.append(worker_id)
+                continue
+            peer_count += 1
+            for window in WINDOWS:
+                counts = state["windows"][str(window)]
+                merged = peers.setdefault(window, {"page_views": {}, "interactions": {}, "sessions": sketches[window].copy()})
+                _merge_counts(merged["page_views"], counts["page_views"])
+                _merge_counts(merged["interactions"], counts["interactions"])
+                merged["sessions"].merge(HyperLogLog.from_bytes(counts["sessions"]))
+
+        if gone:
+            await db[REALTIME_COLLECTION].update_one(
+                {"_id": REALTIME_DOC_ID},
+                {"$unset": {f"workers.{worker_id}": "" for worker_id in gone}}
+            )
+
+        self._peers = {
+            window: {
+                "page_views": merged["page_views"],
+                "interactions": merged["interactions"],
+                "active_sessions": merged["sessions"].count(),
+            }
+            for window, merged in peers.items()
+        }
+        self._peer_count = peer_count
+        self._synced_at = now
+        self.stats["syncs"] += 1
+
+    async def _run(self, db) -> None:
+        while True:
+            try:
+                await self.sync(db)
+            except Exception:
+                self.stats["sync_failures"] += 1
+                logger.exception("Realtime counter sync failed")
+            await asyncio.sleep(self.sync_interval)
@@ -0,0 +1,216 @@
+"""Tiered retention: raw events expire, daily aggregates stay.
+
+Raw ``page_views`` and ``user_interactions`` can carry a TTL index on
+``timestamp`` so Mongo deletes them ``ANALYTICS_RAW_RETENTION_DAYS`` after
+they happened. Expiry is opt-in: the default of 0 keeps raw events forever,
+which the export, ``exact=true`` summaries and ``rebuild-rollups`` rely on
+for full history. Everything the summary and dashboard read
+for long windows lives in durable collections that are never expired: the
+rollups, the visitor sketches and the session rollup.
+
+Those aggregates are maintained at ingest time, which can miss events (a
+failed flush hook, a hand-edited collection). Compaction closes that gap:
+``ANALYTICS_COMPACTION_LEAD_DAYS`` before a day's raw events expire, the
+day's rollups and sketches are rebuilt from the raw events once more, and
+the day is optionally written to the Parquet archive. Days are compacted in
+order and ``compacted_through`` records progress, so each day is folded
+exactly once. A lease keeps the job to one worker at a time.
+
+On a deployment that already holds raw history, the TTL index is not
+created until compaction has covered every day it would delete. Until
+then nothing expires, and the compactor works through the existing
+history from the oldest day, backfilling the rollups and sketches for
+events ingested before they existed. The index is created at the end of
+the run that catches up.
+"""
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from pymongo import ASCENDING, IndexModel
+
+from services import archive, rollups, sketches
+from services.leases import acquire_lease, release_lease
+
+logger = logging.getLogger(__name__)
+
+RAW_COLLECTIONS = ["page_views", "user_interactions"]
+TTL_INDEX_NAME = "timestamp_ttl"
+STATE_COLLECTION = "retention_state"
+STATE_ID = "compaction"
+LEASE_NAME = "compaction"
+
+RAW_RETENTION_DAYS = int(os.environ.get("ANALYTICS_RAW_RETENTION_DAYS", 0))
+COMPACTION_LEAD_DAYS = int(os.environ.get("ANALYTICS_COMPACTION_LEAD_DAYS", 2))
+ARCHIVE_BEFORE_EXPIRY = os.environ.get("ANALYTICS_ARCHIVE_BEFORE_EXPIRY", "false").lower() in ("1", "true", "yes")
+
+
+def retention_enabled() -> bool:
+    return RAW_RETENTION_DAYS > 0
+
+
+def raw_horizon(now: Optional[datetime] = None) -> Optional[datetime]:
+    """Oldest timestamp still guaranteed to be present in the raw collections"""
+    if not retention_enabled():
+        return None
+    return (now or datetime.utcnow()) - timedelta(days=RAW_RETENTION_DAYS)
+
+
+def clamp_to_horizon(start: Optional[datetime]) -> Optional[datetime]:
+    """Keep raw-data rebuilds from wiping aggregates the raw data no longer covers"""
+    horizon = raw_horizon()
+    if horizon is None:
+        return start
+    horizon = rollups.truncate(horizon, "day") + timedelta(days=1)
+    return horizon if start is None or start < horizon else start
+
+
+async def _oldest_day(db) -> Optional[datetime]:
+    oldest = None
+    for collection in RAW_COLLECTIONS:
+        first = await db[collection].find_one({}, {"_id": 0, "timestamp": 1}, sort=[("timestamp", 1)])
+        if first and (oldest is None or first["timestamp"] < oldest):
+            oldest = first["timestamp"]
+    return rollups.truncate(oldest, "day") if oldest else None
+
+
+async def ttl_active(db) -> bool:
+    """True if raw events are already being expired"""
+    for collection in RAW_COLLECTIONS:
+        if TTL_INDEX_NAME in await db[collection].index_information():
+            return True
+    return False
+
+
+async def history_compacted(db, now: Optional[datetime] = None) -> bool:
+    """True once every raw day a new TTL index would delete has been compacted"""
+    horizon_day = rollups.truncate(raw_horizon(now), "day")
+    state = await db[STATE_COLLECTION].find_one({"_id": STATE_ID}) or {}
+    if state.get("compacted_through") is not None:
+        return state["compacted_through"] >= horizon_day
+    oldest = await _oldest_day(db)
+    return oldest is None or oldest > horizon_day
+
+
+async def ensure_ttl_indexes(db) -> Dict[str, Optional[int]]:
+    """Create, retune or drop the raw-event TTL indexes to match the config
+
+    A missing index is only created once ``history_compacted``; until then
+    the collection is reported with ``None`` (nothing expires).
+    """
+    seconds = RAW_RETENTION_DAYS * 86400 if retention_enabled() else None
+    if seconds is not None and not await ttl_active(db) and not await history_compacted(db):
+        logger.info("Raw event TTL deferred until compaction has covered the existing history")
+        return {collection: None for collection in RAW_COLLECTIONS}
+
+    applied = {}
+    for collection in RAW_COLLECTIONS:
+        existing = (await db[collection].index_information()).get(TTL_INDEX_NAME)
+        if seconds is None:
+            if existing is not None:
+                await db[collection].drop_index(TTL_INDEX_NAME)
+        elif existing is None:
+            await db[collection].create_indexes([
+                IndexModel([("timestamp", ASCENDING)], name=TTL_INDEX_NAME, expireAfterSeconds=seconds)
+            ])
+        elif existing.get("expireAfterSeconds") != seconds:
+            await db.command("collMod", collection, index={"name": TTL_INDEX_NAME, "expireAfterSeconds": seconds})
+        applied[collection] = seconds
+    return applied
+
+
+async def compact_day(db, day: datetime) -> Dict[str, Any]:
+    """Rebuild one UTC day of aggregates from raw events (idempotent)"""
+    end = day + timedelta(days=1)
+    written = await rollups.rebuild_rollups(db, start=day, end=end)
+    written[sketches.SKETCH_COLLECTION] = await sketches.rebuild_sketches(db, start=day, end=end)
+    if ARCHIVE_BEFORE_EXPIRY:
+        for collection in archive.COLUMNS:
+            written[f"archive.{collection}"] = await archive.archive_day(db, collection, day.date())
+    return written
+
+
+class Compactor:
+    def __init__(self, interval: float = 3600.0, lease_seconds: float = 1800.0):
+        self.interval = interval
+        self.lease_seconds = lease_seconds
+        self.owner = uuid.uuid4().hex
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"runs": 0, "days_compacted": 0, "skipped_runs": 0}
+
+    @classmethod
+    def from_env(cls) -> "Compactor":
+        return cls(interval=float(os.environ.get("ANALYTICS_COMPACTION_SECONDS", 3600)))
+
+    def start(self, db) -> None:
+        if self._task is None and retention_enabled():
+            self._task = asyncio.create_task(self._loop(db))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "raw_retention_days": RAW_RETENTION_DAYS,
+            "lead_days": COMPACTION_LEAD_DAYS,
+        }
+
+    async def run_once(self, db, now: Optional[datetime] = None) -> Optional[List[str]]:
+        """Compact every day due for it; None if another worker holds the lease"""
+        now = now or datetime.utcnow()
+        if not retention_enabled():
+            return []
+        if not await acquire_lease(db, LEASE_NAME, self.owner, self.lease_seconds, now):
+            self.stats["skipped_runs"] += 1
+            return None
+
+        compacted = []
+        try:
+            # Days strictly before this one expire within the lead time
+            cutoff = rollups.truncate(now - timedelta(days=RAW_RETENTION_DAYS - COMPACTION_LEAD_DAYS), "day")
+            state = await db[STATE_COLLECTION].find_one({"_id": STATE_ID}) or {}
+            day = state.get("compacted_through")
+            day = day + timedelta(days=1) if day else await _oldest_day(db)
+            horizon = raw_horizon(now)
+            # Without a TTL index every raw day is still complete
+            expiring = await ttl_active(db)
+            while day is not None and day < cutoff:
+                if not expiring or day >= horizon:
+                    await compact_day(db, day)
+                    compacted.append(day.date().isoformat())
+                else:
+                    # Raw events are already partly gone (e.g. retention was
+                    # shortened); rebuilding would erase ingest-time aggregates
+                    logger.warning("Skipping compaction of %s: raw events already expiring", day.date())
+                await db[STATE_COLLECTION].update_one(
+                    {"_id": STATE_ID},
+                    {"$set": {"compacted_through": day}},
+                    upsert=True
+                )
+                day += timedelta(days=1)
+            if not expiring:
+                await ensure_ttl_indexes(db)
+        finally:
+            await release_lease(db, LEASE_NAME, self.owner)
+
+        self.stats["runs"] += 1
+        self.stats["days_compacted"] += len(compacted)
+        return compacted
+
+    async def _loop(self, db) -> None:
+        while True:
+            try:
+                await self.run_once(db)
+            except Exception:
+                logger.exception("Compaction run failed")
+            await asyncio.sleep(self.interval)
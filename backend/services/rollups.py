@@ -0,0 +1,213 @@
+"""Pre-aggregated analytics rollups.
+
+Raw ``page_views`` and ``user_interactions`` are folded into small bucketed
+collections so read endpoints only touch one document per (bucket, key)
+instead of one per event:
+
+* ``rollup_page_views_hourly``   - (bucket hour, page)     -> views
+* ``rollup_referrers_daily``     - (bucket day, referrer)  -> count
+* ``rollup_interactions_daily``  - (bucket day, action)    -> count
+
+Each event adds its ``weight`` (1 unless it was kept by interaction
+sampling, see ``services/sampling.py``), so counts stay unbiased.
+
+Rollups are maintained with ``$inc`` upserts whenever events are written
+(see ``apply_rollups``) and can be regenerated from raw data with
+``rebuild_rollups`` (``python manage.py rebuild-rollups``). Buckets are UTC;
+a window is widened to whole buckets at its start edge.
+"""
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pymongo import UpdateOne
+
+
+@dataclass(frozen=True)
+class RollupSpec:
+    collection: str
+    source: str
+    granularity: str  # "hour" or "day"
+    key_field: str
+    value_field: str
+
+
+PAGE_VIEWS_HOURLY = RollupSpec("rollup_page_views_hourly", "page_views", "hour", "page", "views")
+REFERRERS_DAILY = RollupSpec("rollup_referrers_daily", "page_views", "day", "referrer", "count")
+INTERACTIONS_DAILY = RollupSpec("rollup_interactions_daily", "user_interactions", "day", "action", "count")
+
+ROLLUPS = [PAGE_VIEWS_HOURLY, REFERRERS_DAILY, INTERACTIONS_DAILY]
+
+
+def truncate(timestamp: datetime, granularity: str) -> datetime:
+    """Floor a timestamp to the start of its hour or day bucket"""
+    if granularity == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _bucket_expression(granularity: str) -> Dict[str, Any]:
+    parts = {
+        "year": {"$year": "$timestamp"},
+        "month": {"$month": "$timestamp"},
+        "day": {"$dayOfMonth": "$timestamp"},
+    }
+    if granularity == "hour":
+        parts["hour"] = {"$hour": "$timestamp"}
+    return {"$dateFromParts": parts}
+
+
+async def apply_rollups(db, source: str, documents: List[Dict[str, Any]]) -> None:
+    """Increment every rollup fed by ``source`` for freshly written documents"""
+    for spec in ROLLUPS:
+        if spec.source != source:
+            continue
+
+        increments = Counter()
+        for document in documents:
+            key = document.get(spec.key_field)
+            if not key:
+                continue
+            increments[(truncate(document["timestamp"], spec.granularity), key)] += document.get("weight", 1)
+
+        if not increments:
+            continue
+
+        await db[spec.collection].bulk_write(
+            [
+                UpdateOne(
+                    {"bucket": bucket, spec.key_field: key},
+                    {"$inc": {spec.value_field: amount}},
+                    upsert=True
+                )
+                for (bucket, key), amount in increments.items()
+            ],
+            ordered=False
+        )
+
+
+async def rebuild_rollups(
+    db,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> Dict[str, int]:
+    """Regenerate rollups from raw events for [start, end).
+
+    ``start`` is floored to a day boundary so whole buckets are replaced.
+    With no ``start`` every rollup is rebuilt from the beginning of time.
+    Returns the number of buckets written per rollup collection.
+    """
+    written = {}
+    for spec in ROLLUPS:
+        time_filter = {}
+        if start is not None:
+            time_filter["$gte"] = truncate(start, "day")
+        if end is not None:
+            time_filter["$lt"] = end
+
+        match = {spec.key_field: {"$nin": [None, ""]}}
+        if time_filter:
+            match["timestamp"] = time_filter
+
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": {
+                    "bucket": _bucket_expression(spec.granularity),
+                    "key": f"${spec.key_field}"
+                },
+                "value": {"$sum": {"$ifNull": ["$weight", 1]}}
+            }},
+        ]
+        buckets = await db[spec.source].aggregate(pipeline, allowDiskUse=True).to_list(None)
+
+        await db[spec.collection].delete_many({"bucket": time_filter} if time_filter else {})
+        if buckets:
+            await db[spec.collection].insert_many([
+                {
+                    "bucket": bucket["_id"]["bucket"],
+                    spec.key_field: bucket["_id"]["key"],
+                    spec.value_field: bucket["value"],
+                }
+                for bucket in buckets
+            ], ordered=False)
+        written[spec.collection] = len(buckets)
+
+    return written
+
+
+def _window_match(spec: RollupSpec, start: datetime, end: datetime) -> Dict[str, Any]:
+    return {"bucket": {"$gte": truncate(start, spec.granularity), "$lte": end}}
+
+
+async def page_view_facets(
+    db,
+    start: datetime,
+    end: datetime,
+    limit: int = 10,
+    include_daily: bool = False
+) -> Dict[str, Any]:
+    """Total views, popular pages and (optionally) daily views in one $facet"""
+    spec = PAGE_VIEWS_HOURLY
+    facets = {
+        "totals": [
+            {"$group": {"_id": None, "views": {"$sum": "$views"}}},
+        ],
+        "popular_pages": [
+            {"$group": {"_id": "$page", "views": {"$sum": "$views"}}},
+            {"$project": {"page": "$_id", "views": 1}},
+            {"$sort": {"views": -1}},
+            {"$limit": limit},
+        ],
+    }
+    if include_daily:
+        facets["daily_views"] = [
+            {"$group": {
+                "_id": {
+                    "$dateFromParts": {
+                        "year": {"$year": "$bucket"},
+                        "month": {"$month": "$bucket"},
+                        "day": {"$dayOfMonth": "$bucket"}
+                    }
+                },
+                "views": {"$sum": "$views"}
+            }},
+            {"$project": {"date": "$_id", "views": 1}},
+            {"$sort": {"date": 1}},
+        ]
+
+    result = await db[spec.collection].aggregate([
+        {"$match": _window_match(spec, start, end)},
+        {"$facet": facets},
+    ]).to_list(1)
+    result = result[0] if result else {}
+
+    totals = result.get("totals") or [{"views": 0}]
+    return {
+        "total_views": totals[0]["views"],
+        "popular_pages": result.get("popular_pages", []),
+        "daily_views": result.get("daily_views", []),
+    }
+
+
+async def top_referrers(db, start: datetime, end: datetime, limit: int = 10) -> List[Dict[str, Any]]:
+    spec = REFERRERS_DAILY
+    return await db[spec.collection].aggregate([
+        {"$match": _window_match(spec, start, end)},
+        {"$group": {"_id": "$referrer", "count": {"$sum": "$count"}}},
+        {"$project": {"referrer": "$_id", "count": 1}},
+        {"$sort": {"count": -1}},
+        {"$limit": limit},
+    ]).to_list(limit)
+
+
+async def top_interactions(db, start: datetime, end: datetime, limit: int = 10) -> List[Dict[str, Any]]:
+    spec = INTERACTIONS_DAILY
+    return await db[spec.collection].aggregate([
+        {"$match": _window_match(spec, start, end)},
+        {"$group": {"_id": "$action", "count": {"$sum": "$count"}}},
+        {"$project": {"action": "$_id", "count": 1}},
+        {"$sort": {"count": -1}},
+        {"$limit": limit},
+    ]).to_list(limit)
@@ -0,0 +1,118 @@
+"""Per-action sampling of high-volume interactions.
+
+Scrolls and similar interactions far outnumber page views. A policy per
+action keeps every event while that action arrives at up to ``threshold``
+events per second on this worker, and 1 in ``keep_one_in`` beyond that.
+A kept event is stored with ``weight = keep_one_in`` (1 while nothing is
+sampled). Everything that counts interactions sums weights instead of
+counting documents: rollups, ``top_interactions``, sessions, the live
+dashboard and the realtime counters. Totals therefore stay unbiased,
+while storage and write load follow the budget rather than the traffic.
+
+``SAMPLING_POLICY`` lists ``action=threshold:keep_one_in`` entries
+separated by commas, e.g. ``scroll=20:10,section_view=20:5``. An empty
+value disables sampling.
+
+For an event with a client ``event_id`` the keep/drop decision is a hash of
+that id, so a resent event gets the same answer as the original.
+"""
+import hashlib
+import os
+import random
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from services import metrics
+
+DEFAULT_POLICY = "scroll=20:10"
+
+SAMPLED_OUT = metrics.registry.counter(
+    "interactions_sampled_out_total", "Interactions dropped by the sampling policy", ("action",)
+)
+
+
+def parse_policy(spec: str) -> Dict[str, Tuple[float, int]]:
+    """``action=threshold:keep_one_in,...`` -> {action: (threshold, keep_one_in)}"""
+    policies = {}
+    for entry in spec.split(","):
+        action, _, rule = entry.strip().partition("=")
+        if not action or not rule:
+            continue
+        threshold, _, keep_one_in = rule.partition(":")
+        policies[action.strip()] = (float(threshold), max(1, int(keep_one_in or 1)))
+    return policies
+
+
+class RateMeter:
+    """Events per second, from the current and the previous whole second"""
+
+    __slots__ = ("second", "current", "previous")
+
+    def __init__(self):
+        self.second = None
+        self.current = 0
+        self.previous = 0
+
+    def hit(self, now: float) -> int:
+        second = int(now)
+        if second != self.second:
+            self.previous = self.current if self.second is not None and second == self.second + 1 else 0
+            self.current = 0
+            self.second = second
+        self.current += 1
+        return max(self.previous, self.current)
+
+
+class InteractionSampler:
+    def __init__(
+        self,
+        policies: Optional[Dict[str, Tuple[float, int]]] = None,
+        clock: Callable[[], float] = time.monotonic,
+        rng: Callable[[], float] = random.random
+    ):
+        self.policies = dict(policies or {})
+        self.clock = clock
+        self.rng = rng
+        self._meters: Dict[str, RateMeter] = {}
+        self.stats = {"seen": 0, "kept": 0, "weighted": 0, "dropped": 0}
+
+    @classmethod
+    def from_env(cls) -> "InteractionSampler":
+        return cls(policies=parse_policy(os.environ.get("SAMPLING_POLICY", DEFAULT_POLICY)))
+
+    def weight(self, action: str, event_id: Optional[str] = None) -> int:
+        """Weight to store the event with, or 0 if it is sampled out"""
+        policy = self.policies.get(action)
+        if policy is None:
+            return 1
+
+        threshold, keep_one_in = policy
+        meter = self._meters.get(action)
+        if meter is None:
+            meter = self._meters[action] = RateMeter()
+        self.stats["seen"] += 1
+        if meter.hit(self.clock()) <= threshold or keep_one_in == 1:
+            self.stats["kept"] += 1
+            return 1
+
+        if event_id:
+            digest = hashlib.blake2b(event_id.encode("utf-8"), digest_size=8).digest()
+            keep = int.from_bytes(digest, "big") % keep_one_in == 0
+        else:
+            keep = self.rng() * keep_one_in < 1
+        if keep:
+            self.stats["weighted"] += 1
+            return keep_one_in
+
+        self.stats["dropped"] += 1
+        SAMPLED_OUT.inc(action=action)
+        return 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "policies": {
+                action: {"threshold": threshold, "keep_one_in": keep_one_in}
+                for action, (threshold, keep_one_in) in self.policies.items()
+            },
+        }
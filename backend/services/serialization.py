@@ -0,0 +1,50 @@
+"""Fast JSON encoding and pre-built validators.
+
+FastAPI runs every plain ``dict`` a handler returns through
+``jsonable_encoder`` (a recursive Python walk) before encoding it.
+Handlers with large payloads return ``json_response(...)`` instead, which
+goes straight to orjson; pydantic models inside the payload are dumped by
+pydantic-core on the way. Validators for the ingest models are built once
+as ``TypeAdapter``s rather than per request.
+
+Run ``python -m benchmarks.serialization`` to compare against the old path.
+"""
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, TypeAdapter
+
+from models.analytics import PageViewCreate, UserInteractionCreate
+
+JSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+PAGE_VIEW_CREATE = TypeAdapter(PageViewCreate)
+INTERACTION_CREATE = TypeAdapter(UserInteractionCreate)
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=JSON_OPTIONS)
+
+
+loads = orjson.loads
+
+
+class FastJSONResponse(JSONResponse):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def json_response(content: Any, **kwargs) -> FastJSONResponse:
+    """Return from a handler to skip FastAPI's jsonable_encoder pass"""
+    return FastJSONResponse(content, **kwargs)
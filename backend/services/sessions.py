@@ -0,0 +1,325 @@
+"""Incremental sessionization of page views and interactions.
+
+Events sharing a ``session_id`` belong to the same ``AnalyticsSession`` until
+the visitor is idle for longer than the inactivity gap; the next event then
+opens a new session. The sessionizer keeps a ``(timestamp, id)`` watermark
+(``processed_until``, ``processed_id``) and each run only reads events after
+it, in keyset chunks as in ``services/pagination.py``, so it never rescans
+history and never skips events sharing a timestamp across chunks. Events
+younger than the settle delay are left for the next run so writes still
+sitting in the event buffer are not skipped.
+
+Once no further event can extend a session it is marked closed and added to
+``rollup_sessions_daily`` (bucket day of session start -> sessions, bounces,
+total duration), which is what the summary endpoints read.
+
+Every worker runs the loop, but a lease (``services/leases.py``) ensures
+only one of them sessionizes at a time. The lease is renewed after every
+chunk, and a run that loses it stops before touching the rollup again.
+``python manage.py sessionize`` runs a single pass by hand.
+"""
+import asyncio
+import logging
+import os
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import ReplaceOne, UpdateOne
+
+from models.analytics import AnalyticsSession
+from services.leases import acquire_lease, release_lease
+from services.rollups import truncate
+
+logger = logging.getLogger(__name__)
+
+SESSION_COLLECTION = "analytics_sessions"
+ROLLUP_COLLECTION = "rollup_sessions_daily"
+STATE_COLLECTION = "sessionizer_state"
+STATE_ID = "sessionizer"
+LEASE_NAME = "sessionizer"
+
+SOURCES = {
+    "page_views": {"_id": 0, "id": 1, "page": 1, "session_id": 1, "timestamp": 1, "ip_address": 1, "user_agent": 1},
+    "user_interactions": {"_id": 0, "id": 1, "page": 1, "session_id": 1, "timestamp": 1, "weight": 1},
+}
+
+# (timestamp, id) of the last processed event; an id of None stands for
+# every event at that timestamp
+Watermark = Tuple[datetime, Optional[str]]
+
+
+def _order(watermark: Watermark) -> Tuple[datetime, bool, str]:
+    """Sort key for watermarks and (timestamp, id) event positions"""
+    timestamp, event_id = watermark
+    return timestamp, event_id is None, event_id or ""
+
+
+def _position(document: Dict[str, Any]) -> Watermark:
+    return document["timestamp"], document.get("id") or ""
+
+
+def is_bounce(session: Dict[str, Any]) -> bool:
+    """A single page seen with no interactions"""
+    return len(session["pages_visited"]) <= 1 and session["interactions_count"] == 0
+
+
+class Sessionizer:
+    def __init__(
+        self,
+        gap: float = 1800.0,
+        settle: float = 60.0,
+        interval: float = 60.0,
+        chunk_size: int = 5000,
+        lease_seconds: float = 300.0
+    ):
+        self.gap = timedelta(seconds=gap)
+        self.settle = timedelta(seconds=settle)
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self.lease_seconds = lease_seconds
+        self.owner = uuid.uuid4().hex
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"runs": 0, "events": 0, "opened": 0, "closed": 0, "skipped_runs": 0}
+
+    @classmethod
+    def from_env(cls) -> "Sessionizer":
+        return cls(
+            gap=float(os.environ.get("ANALYTICS_SESSION_GAP_SECONDS", 1800)),
+            settle=float(os.environ.get("ANALYTICS_SESSION_SETTLE_SECONDS", 60)),
+            interval=float(os.environ.get("ANALYTICS_SESSIONIZE_SECONDS", 60)),
+            chunk_size=int(os.environ.get("ANALYTICS_SESSIONIZE_CHUNK_SIZE", 5000)),
+        )
+
+    def start(self, db) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop(db))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "gap_seconds": self.gap.total_seconds()}
+
+    async def run_once(self, db, now: Optional[datetime] = None) -> Optional[Dict[str, int]]:
+        """Process everything up to ``now - settle``; None if another worker holds the lease"""
+        now = now or datetime.utcnow()
+        if not await acquire_lease(db, LEASE_NAME, self.owner, self.lease_seconds, now):
+            self.stats["skipped_runs"] += 1
+            return None
+
+        processed = {"events": 0, "opened": 0, "closed": 0}
+        try:
+            until = now - self.settle
+            state = await db[STATE_COLLECTION].find_one({"_id": STATE_ID}) or {}
+            if state.get("processed_until"):
+                watermark = (state["processed_until"], state.get("processed_id"))
+            else:
+                watermark = await self._initial_watermark(db)
+            while watermark is not None and _order(watermark) < _order((until, None)):
+                events, watermark = await self._next_chunk(db, watermark, until)
+                opened, closed = await self._apply(db, events)
+                closed += await self._close_idle(db, watermark[0])
+                await db[STATE_COLLECTION].update_one(
+                    {"_id": STATE_ID},
+                    {"$set": {"processed_until": watermark[0], "processed_id": watermark[1]}},
+                    upsert=True
+                )
+                processed["events"] += len(events)
+                processed["opened"] += opened
+                processed["closed"] += closed
+                # A long catch-up can outlast the lease; if another worker
+                # has taken over, carrying on would count sessions twice
+                if not await acquire_lease(db, LEASE_NAME, self.owner, self.lease_seconds):
+                    logger.warning("Sessionizer lease lost; stopping this run")
+                    break
+        finally:
+            await release_lease(db, LEASE_NAME, self.owner)
+
+        self.stats["runs"] += 1
+        for name, value in processed.items():
+            self.stats[name] += value
+        return processed
+
+    async def _initial_watermark(self, db) -> Optional[Watermark]:
+        """Just before the oldest event, so the first run starts at the beginning"""
+        oldest = None
+        for source in SOURCES:
+            first = await db[source].find_one({}, {"_id": 0, "timestamp": 1}, sort=[("timestamp", 1)])
+            if first and (oldest is None or first["timestamp"] < oldest):
+                oldest = first["timestamp"]
+        return (oldest - timedelta(microseconds=1), None) if oldest else None
+
+    async def _next_chunk(
+        self,
+        db,
+        after: Watermark,
+        until: datetime
+    ) -> Tuple[List[Tuple[str, Dict[str, Any]]], Watermark]:
+        """Up to ``chunk_size`` events per source after ``after``; returns them and the new watermark"""
+        after_time, after_id = after
+        if after_id is None:
+            query = {"timestamp": {"$gt": after_time, "$lte": until}}
+        else:
+            query = {"timestamp": {"$lte": until}, "$or": [
+                {"timestamp": {"$gt": after_time}},
+                {"timestamp": after_time, "id": {"$gt": after_id}},
+            ]}
+
+        fetched = {}
+        chunk_end: Watermark = (until, None)
+        for source, projection in SOURCES.items():
+            documents = await db[source].find(query, projection).sort(
+                [("timestamp", 1), ("id", 1)]
+            ).limit(self.chunk_size).to_list(self.chunk_size)
+            fetched[source] = documents
+            if len(documents) == self.chunk_size:
+                # A full batch: this source is only known to be complete up
+                # to its last event
+                chunk_end = min(chunk_end, _position(documents[-1]), key=_order)
+
+        events = [
+            (source, document)
+            for source, documents in fetched.items()
+            for document in documents
+            if _order(_position(document)) <= _order(chunk_end) and document.get("session_id")
+        ]
+        events.sort(key=lambda event: _order(_position(event[1])))
+        return events, chunk_end
+
+    async def _apply(self, db, events: List[Tuple[str, Dict[str, Any]]]) -> Tuple[int, int]:
+        """Fold events into sessions; returns (sessions opened, sessions closed)"""
+        if not events:
+            return 0, 0
+
+        session_ids = list({document["session_id"] for _, document in events})
+        current: Dict[str, Dict[str, Any]] = {
+            session["session_id"]: session
+            async for session in db[SESSION_COLLECTION].find(
+                {"session_id": {"$in": session_ids}, "closed": False},
+                {"_id": 0}
+            )
+        }
+
+        touched: Dict[str, Dict[str, Any]] = {}
+        finished: List[Dict[str, Any]] = []
+        opened = 0
+        for source, document in events:
+            timestamp = document["timestamp"]
+            session = current.get(document["session_id"])
+            if session is not None and timestamp - session["end_time"] > self.gap:
+                finished.append(self._close(session))
+                touched[session["id"]] = session
+                session = None
+            if session is None:
+                session = {
+                    **AnalyticsSession(
+                        session_id=document["session_id"],
+                        start_time=timestamp,
+                        end_time=timestamp,
+                        total_duration=0
+                    ).model_dump(),
+                    "closed": False,
+                }
+                current[document["session_id"]] = session
+                opened += 1
+
+            if source == "page_views":
+                if not session["ip_address"]:
+                    session["ip_address"] = document.get("ip_address")
+                    session["user_agent"] = document.get("user_agent")
+                if document.get("page") and document["page"] not in session["pages_visited"]:
+                    session["pages_visited"].append(document["page"])
+            else:
+                session["interactions_count"] += document.get("weight", 1)
+            session["end_time"] = max(session["end_time"], timestamp)
+            session["total_duration"] = int((session["end_time"] - session["start_time"]).total_seconds())
+            session["is_bounce"] = is_bounce(session)
+            touched[session["id"]] = session
+
+        await db[SESSION_COLLECTION].bulk_write(
+            [ReplaceOne({"id": session_id}, session, upsert=True) for session_id, session in touched.items()],
+            ordered=False
+        )
+        await self._add_to_rollup(db, finished)
+        return opened, len(finished)
+
+    async def _close_idle(self, db, chunk_end: datetime) -> int:
+        """Close open sessions that no event at or after ``chunk_end`` can extend"""
+        idle = await db[SESSION_COLLECTION].find(
+            {"closed": False, "end_time": {"$lt": chunk_end - self.gap}},
+            {"_id": 0}
+        ).to_list(None)
+        if not idle:
+            return 0
+
+        finished = [self._close(session) for session in idle]
+        await db[SESSION_COLLECTION].bulk_write(
+            [
+                UpdateOne({"id": session["id"], "closed": False}, {"$set": {"closed": True}})
+                for session in finished
+            ],
+            ordered=False
+        )
+        await self._add_to_rollup(db, finished)
+        return len(finished)
+
+    @staticmethod
+    def _close(session: Dict[str, Any]) -> Dict[str, Any]:
+        session["closed"] = True
+        session["is_bounce"] = is_bounce(session)
+        return session
+
+    @staticmethod
+    async def _add_to_rollup(db, sessions: List[Dict[str, Any]]) -> None:
+        totals: Dict[datetime, Dict[str, int]] = defaultdict(lambda: {"sessions": 0, "bounces": 0, "duration": 0})
+        for session in sessions:
+            day = totals[truncate(session["start_time"], "day")]
+            day["sessions"] += 1
+            day["bounces"] += int(session["is_bounce"])
+            day["duration"] += session["total_duration"] or 0
+        if not totals:
+            return
+        await db[ROLLUP_COLLECTION].bulk_write(
+            [
+                UpdateOne({"bucket": bucket}, {"$inc": increments}, upsert=True)
+                for bucket, increments in totals.items()
+            ],
+            ordered=False
+        )
+
+    async def _loop(self, db) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once(db)
+            except Exception:
+                logger.exception("Sessionizer run failed")
+
+
+async def session_stats(db, start: datetime, end: datetime) -> Dict[str, Any]:
+    """Sessions, average duration and bounce rate for sessions started in the window"""
+    result = await db[ROLLUP_COLLECTION].aggregate([
+        {"$match": {"bucket": {"$gte": truncate(start, "day"), "$lte": end}}},
+        {"$group": {
+            "_id": None,
+            "sessions": {"$sum": "$sessions"},
+            "bounces": {"$sum": "$bounces"},
+            "duration": {"$sum": "$duration"},
+        }},
+    ]).to_list(1)
+    totals = result[0] if result else {"sessions": 0, "bounces": 0, "duration": 0}
+
+    sessions = totals["sessions"]
+    return {
+        "sessions": sessions,
+        "avg_session_duration": round(totals["duration"] / sessions, 1) if sessions else 0.0,
+        "bounce_rate": round(totals["bounces"] / sessions, 4) if sessions else 0.0,
+    }
@@ -0,0 +1,70 @@
+"""Application settings, read once per process.
+
+``load_env()`` loads ``backend/.env`` once per process (variables already
+set in the environment win). ``get_settings()`` calls it and turns the
+app-level options into a frozen, cached ``Settings``. Services with their
+own knobs (event buffer, caches, admission, ...) keep reading them in their
+``from_env`` constructors; ``create_app`` calls ``load_env()`` before
+building them, so ``.env`` applies to them even when the app is given
+explicit ``Settings``.
+
+Nothing here needs a database: ``MONGO_URL`` and ``DB_NAME`` are only
+required when a client is actually created (``MongoProvider.from_settings``),
+so the app can be imported and built by tests and tooling without one.
+"""
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Mapping, Optional, Tuple
+
+from dotenv import load_dotenv
+
+ENV_FILE = Path(__file__).resolve().parent.parent / ".env"
+
+TRUE_VALUES = ("1", "true", "yes")
+
+
+def _optional_int(value: Optional[str]) -> Optional[int]:
+    return int(value) if value else None
+
+
+@dataclass(frozen=True)
+class Settings:
+    mongo_url: Optional[str] = None
+    db_name: Optional[str] = None
+    mongo_max_pool_size: int = 100
+    mongo_min_pool_size: int = 0
+    mongo_wait_queue_timeout_ms: Optional[int] = None
+    mongo_server_selection_timeout_ms: int = 5000
+    mongo_connect_timeout_ms: Optional[int] = None
+    # Create missing indexes when a worker starts
+    ensure_indexes: bool = True
+    cors_origins: Tuple[str, ...] = ("*",)
+
+    @classmethod
+    def from_env(cls, environ: Mapping[str, str] = os.environ) -> "Settings":
+        return cls(
+            mongo_url=environ.get("MONGO_URL"),
+            db_name=environ.get("DB_NAME"),
+            mongo_max_pool_size=int(environ.get("MONGO_MAX_POOL_SIZE", 100)),
+            mongo_min_pool_size=int(environ.get("MONGO_MIN_POOL_SIZE", 0)),
+            mongo_wait_queue_timeout_ms=_optional_int(environ.get("MONGO_WAIT_QUEUE_TIMEOUT_MS")),
+            mongo_server_selection_timeout_ms=int(environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000)),
+            mongo_connect_timeout_ms=_optional_int(environ.get("MONGO_CONNECT_TIMEOUT_MS")),
+            ensure_indexes=environ.get("MONGO_ENSURE_INDEXES", "true").lower() in TRUE_VALUES,
+            cors_origins=tuple(environ.get("CORS_ORIGINS", "*").split(",")),
+        )
+
+
+@lru_cache(maxsize=None)
+def load_env() -> None:
+    """Load backend/.env into the environment, once"""
+    load_dotenv(ENV_FILE)
+
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """Settings from .env and the environment, loaded on first use"""
+    load_env()
+    return Settings.from_env()
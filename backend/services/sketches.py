@@ -0,0 +1,182 @@
+"""Per-day unique-visitor sketches stored in Mongo.
+
+Each ``visitor_sketches`` document holds one serialised HyperLogLog for a
+(bucket day, page) pair. Per-page sketches count distinct IP addresses; the
+site-wide sketch (``page == SITE_WIDE``) counts distinct IP + user agent
+pairs. Any window is answered by merging the daily sketches it covers, so
+memory per counter stays fixed no matter how busy a page is.
+"""
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bson import Binary
+from pymongo.errors import DuplicateKeyError
+
+from services.hll import HyperLogLog, precision_for_error
+from services.rollups import truncate
+
+SKETCH_COLLECTION = "visitor_sketches"
+SITE_WIDE = "*"
+MAX_UPDATE_RETRIES = 5
+
+PRECISION = precision_for_error(float(os.environ.get("HLL_ERROR_RATE", 0.01)))
+
+
+def _visitor_keys(document: Dict[str, Any]) -> Tuple[str, str]:
+    ip_address = document.get("ip_address") or ""
+    return ip_address, f"{ip_address}|{document.get('user_agent') or ''}"
+
+
+def build_sketches(documents: Iterable[Dict[str, Any]]) -> Dict[Tuple[datetime, str], HyperLogLog]:
+    """Build per-(day, page) and site-wide sketches for a set of page views"""
+    sketches: Dict[Tuple[datetime, str], HyperLogLog] = defaultdict(lambda: HyperLogLog(PRECISION))
+    for document in documents:
+        day = truncate(document["timestamp"], "day")
+        ip_key, visitor_key = _visitor_keys(document)
+        sketches[(day, document["page"])].add(ip_key)
+        sketches[(day, SITE_WIDE)].add(visitor_key)
+    return sketches
+
+
+async def _merge_into_store(db, bucket: datetime, page: str, delta: HyperLogLog) -> None:
+    """Merge ``delta`` into the stored sketch using optimistic versioning"""
+    collection = db[SKETCH_COLLECTION]
+    for _ in range(MAX_UPDATE_RETRIES):
+        existing = await collection.find_one({"bucket": bucket, "page": page})
+        if existing is None:
+            try:
+                await collection.insert_one({
+                    "bucket": bucket,
+                    "page": page,
+                    "sketch": Binary(delta.to_bytes()),
+                    "version": 1,
+                })
+                return
+            except DuplicateKeyError:
+                # Another writer created it first; merge into theirs
+                continue
+
+        merged = HyperLogLog.from_bytes(existing["sketch"]).merge(delta)
+        result = await collection.update_one(
+            {"_id": existing["_id"], "version": existing["version"]},
+            {"$set": {"sketch": Binary(merged.to_bytes())}, "$inc": {"version": 1}}
+        )
+        if result.modified_count:
+            return
+
+    raise RuntimeError(f"Could not update visitor sketch for {page} on {bucket:%Y-%m-%d}")
+
+
+async def apply_sketches(db, source: str, documents: List[Dict[str, Any]]) -> None:
+    """Flush hook: fold freshly written page views into the daily sketches"""
+    if source != "page_views" or not documents:
+        return
+    for (bucket, page), delta in build_sketches(documents).items():
+        await _merge_into_store(db, bucket, page, delta)
+
+
+async def rebuild_sketches(db, start: Optional[datetime] = None, end: Optional[datetime] = None) -> int:
+    """Regenerate sketches from raw page views, one day at a time"""
+    time_filter = {}
+    if start is not None:
+        time_filter["$gte"] = truncate(start, "day")
+    if end is not None:
+        time_filter["$lt"] = end
+
+    query = {"timestamp": time_filter} if time_filter else {}
+    first = await db.page_views.find_one(query, {"timestamp": 1}, sort=[("timestamp", 1)])
+    if first is None:
+        await db[SKETCH_COLLECTION].delete_many({"bucket": time_filter} if time_filter else {})
+        return 0
+
+    day = truncate(start if start is not None else first["timestamp"], "day")
+    last_day = end or datetime.utcnow()
+    written = 0
+    while day < last_day:
+        next_day = day + timedelta(days=1)
+        cursor = db.page_views.find(
+            {"timestamp": {"$gte": day, "$lt": min(next_day, last_day)}},
+            {"_id": 0, "page": 1, "ip_address": 1, "user_agent": 1, "timestamp": 1}
+        )
+        sketches = build_sketches([document async for document in cursor])
+
+        await db[SKETCH_COLLECTION].delete_many({"bucket": day})
+        if sketches:
+            await db[SKETCH_COLLECTION].insert_many([
+                {"bucket": bucket, "page": page, "sketch": Binary(sketch.to_bytes()), "version": 1}
+                for (bucket, page), sketch in sketches.items()
+            ])
+        written += len(sketches)
+        day = next_day
+
+    return written
+
+
+async def window_uniques(db, start: datetime, end: datetime) -> Dict[str, Any]:
+    """Site-wide, per-page and per-day unique visitors from one sketch query"""
+    site: Optional[HyperLogLog] = None
+    by_page: Dict[str, HyperLogLog] = {}
+    by_day: Dict[datetime, HyperLogLog] = {}
+
+    cursor = db[SKETCH_COLLECTION].find(
+        {"bucket": {"$gte": truncate(start, "day"), "$lte": end}},
+        {"_id": 0, "bucket": 1, "page": 1, "sketch": 1}
+    )
+    async for document in cursor:
+        sketch = HyperLogLog.from_bytes(document["sketch"])
+        if document["page"] == SITE_WIDE:
+            targets = [(by_day, document["bucket"])]
+            site = sketch.copy() if site is None else site.merge(sketch)
+        else:
+            targets = [(by_page, document["page"])]
+        for merged, key in targets:
+            if key in merged:
+                merged[key].merge(sketch)
+            else:
+                merged[key] = sketch
+
+    return {
+        "unique_visitors": site.count() if site is not None else 0,
+        "by_page": {page: sketch.count() for page, sketch in by_page.items()},
+        "by_day": {day: sketch.count() for day, sketch in by_day.items()},
+    }
+
+
+async def exact_window_uniques(db, start: datetime, end: datetime) -> Dict[str, Any]:
+    """Same shape as ``window_uniques`` but counted exactly from raw page views"""
+    result = await db.page_views.aggregate([
+        {"$match": {"timestamp": {"$gte": start, "$lte": end}}},
+        {"$facet": {
+            "unique_visitors": [
+                {"$group": {"_id": {"ip": "$ip_address", "ua": "$user_agent"}}},
+                {"$count": "count"}
+            ],
+            "by_page": [
+                {"$group": {"_id": "$page", "visitors": {"$addToSet": "$ip_address"}}},
+                {"$project": {"count": {"$size": "$visitors"}}}
+            ],
+            "by_day": [
+                {"$group": {
+                    "_id": {
+                        "$dateFromParts": {
+                            "year": {"$year": "$timestamp"},
+                            "month": {"$month": "$timestamp"},
+                            "day": {"$dayOfMonth": "$timestamp"}
+                        }
+                    },
+                    "visitors": {"$addToSet": {"ip": "$ip_address", "ua": "$user_agent"}}
+                }},
+                {"$project": {"count": {"$size": "$visitors"}}}
+            ],
+        }},
+    ], allowDiskUse=True).to_list(1)
+    result = result[0] if result else {}
+
+    total = result.get("unique_visitors") or [{"count": 0}]
+    return {
+        "unique_visitors": total[0]["count"],
+        "by_page": {row["_id"]: row["count"] for row in result.get("by_page", [])},
+        "by_day": {row["_id"]: row["count"] for row in result.get("by_day", [])},
+    }
@@ -0,0 +1,38 @@
+"""Lightweight per-request query timing, reported through Server-Timing."""
+import os
+import time
+from typing import Any, Awaitable, Dict
+
+from fastapi import Request
+
+DEBUG_TIMING = os.environ.get("ANALYTICS_DEBUG_TIMING", "").lower() in ("1", "true", "yes")
+
+
+def timing_requested(request: Request) -> bool:
+    """Timing is reported when enabled globally or asked for with X-Debug-Timing: 1"""
+    return DEBUG_TIMING or request.headers.get("x-debug-timing") == "1"
+
+
+class QueryTimer:
+    """Records how long each named awaitable took, from a common start point.
+
+    When queries run concurrently the total should sit close to the slowest
+    single query rather than the sum of all of them.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings: Dict[str, float] = {}
+
+    async def track(self, name: str, awaitable: Awaitable[Any]) -> Any:
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.timings[name] = (time.perf_counter() - start) * 1000
+
+    def header_value(self) -> str:
+        total = (time.perf_counter() - self.started) * 1000
+        entries = [f"{name};dur={duration:.1f}" for name, duration in self.timings.items()]
+        entries.append(f"total;dur={total:.1f}")
+        return ", ".join(entries)
@@ -172,7 +172,8 @@ class PortfolioAPITester:
             
             if response.status_code == 200:
                 data = response.json()
-                if isinstance(data, list):
+                if isinstance(data, dict) and isinstance(data.get("items"), list):
+                    data = data["items"]
                     self.log_test("Get Contact Messages", True, f"Retrieved {len(data)} messages")
                     
                     # Check if our test message is in the list
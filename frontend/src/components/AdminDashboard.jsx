@@ -14,32 +14,85 @@ import {
   RefreshCw
 } from 'lucide-react';
 
+const STREAM_URL = `${process.env.REACT_APP_BACKEND_URL}/api/analytics/dashboard/stream`;
+
+// Add delta counts into a [{[key]: ..., [field]: n}] list, keeping it sorted
+const mergeCounts = (items = [], counts, key, field) => {
+  const merged = items.map(item => (
+    counts[item[key]] ? { ...item, [field]: item[field] + counts[item[key]] } : item
+  ));
+  Object.entries(counts).forEach(([name, count]) => {
+    if (!merged.some(item => item[key] === name)) {
+      merged.push({ [key]: name, [field]: count });
+    }
+  });
+  return merged.sort((a, b) => b[field] - a[field]);
+};
+
+const applyDelta = (data, delta) => {
+  if (!data) return data;
+  const newViews = Object.values(delta.page_views).reduce((sum, count) => sum + count, 0);
+  const summary = data.summary || {};
+  const today = new Date().toISOString().slice(0, 10);
+
+  const dailyViews = [...(data.daily_views || [])];
+  const last = dailyViews[dailyViews.length - 1];
+  if (newViews && last && String(last.date).slice(0, 10) === today) {
+    dailyViews[dailyViews.length - 1] = { ...last, views: last.views + newViews };
+  } else if (newViews) {
+    dailyViews.push({ date: today, views: newViews, unique_visitors: 0 });
+  }
+
+  return {
+    ...data,
+    summary: {
+      ...summary,
+      total_views: (summary.total_views || 0) + newViews,
+      popular_pages: mergeCounts(summary.popular_pages, delta.page_views, 'page', 'views')
+        .map(page => ({ unique_visitors: 0, ...page })),
+      contact_form_submissions: (summary.contact_form_submissions || 0) + delta.contact_messages.length
+    },
+    daily_views: dailyViews,
+    top_interactions: mergeCounts(data.top_interactions, delta.interactions, 'action', 'count'),
+    recent_contacts: [...delta.contact_messages, ...(data.recent_contacts || [])].slice(0, 5)
+  };
+};
+
 const AdminDashboard = () => {
   const [dashboardData, setDashboardData] = useState(null);
   const [isLoading, setIsLoading] = useState(true);
   const [lastUpdated, setLastUpdated] = useState(null);
+  const [isLive, setIsLive] = useState(false);
+  const [connection, setConnection] = useState(0);
 
-  const fetchDashboardData = async () => {
+  // One snapshot, then deltas as events arrive; EventSource reconnects on its
+  // own and every (re)connect starts again from a fresh snapshot
+  useEffect(() => {
     setIsLoading(true);
-    try {
-      const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/analytics/dashboard`);
-      const data = await response.json();
-      setDashboardData(data);
+    const source = new EventSource(STREAM_URL);
+
+    source.addEventListener('snapshot', (event) => {
+      setDashboardData(JSON.parse(event.data));
       setLastUpdated(new Date());
-    } catch (error) {
-      console.error('Failed to fetch dashboard data:', error);
-    } finally {
       setIsLoading(false);
-    }
-  };
+      setIsLive(true);
+    });
 
-  useEffect(() => {
-    fetchDashboardData();
-    
-    // Auto-refresh every 5 minutes
-    const interval = setInterval(fetchDashboardData, 5 * 60 * 1000);
-    return () => clearInterval(interval);
-  }, []);
+    source.addEventListener('delta', (event) => {
+      const delta = JSON.parse(event.data);
+      setDashboardData(data => applyDelta(data, delta));
+      setLastUpdated(new Date());
+    });
+
+    source.onerror = () => {
+      console.error('Dashboard stream interrupted, reconnecting');
+      setIsLive(false);
+    };
+
+    return () => source.close();
+  }, [connection]);
+
+  const reconnect = () => setConnection(count => count + 1);
 
   if (isLoading && !dashboardData) {
     return (
@@ -60,12 +113,17 @@ const AdminDashboard = () => {
         <div className="flex items-center justify-between mb-8">
           <div>
             <h1 className="text-3xl font-bold heading-font">Portfolio Analytics</h1>
-            <p className="text-gray-400 body-font">
-              {lastUpdated && `Last updated: ${lastUpdated.toLocaleString()}`}
-            </p>
+            <div className="flex items-center gap-3">
+              <p className="text-gray-400 body-font">
+                {lastUpdated && `Last updated: ${lastUpdated.toLocaleString()}`}
+              </p>
+              <Badge className={isLive ? 'bg-green-500/20 text-green-300' : 'bg-yellow-500/20 text-yellow-300'}>
+                {isLive ? 'Live' : 'Reconnecting'}
+              </Badge>
+            </div>
           </div>
           <Button 
-            onClick={fetchDashboardData}
+            onClick={reconnect}
             disabled={isLoading}
             className="bg-blue-600 hover:bg-blue-500"
           >
@@ -9,49 +9,98 @@ const AnalyticsTracker = () => {
     return Math.random().toString(36).substring(2, 15) + Math.random().toString(36).substring(2, 15);
   }
 
-  const trackPageView = async (page) => {
-    if (!isTracking.current) return;
-    
+  const eventQueue = useRef([]);
+  const flushTimer = useRef(null);
+
+  const BATCH_URL = `${process.env.REACT_APP_BACKEND_URL}/api/analytics/batch`;
+  const FLUSH_INTERVAL_MS = 5000;
+  const MAX_BATCH_SIZE = 20;
+  const MAX_QUEUED_EVENTS = 200;
+
+  // Every event carries an event_id so the server can drop duplicates:
+  // retried batches reuse their ids, and events that should only count once
+  // (a page view per mount, a scroll milestone per page) get ids derived
+  // from what they describe
+  const newEventId = () => (
+    window.crypto?.randomUUID?.() ||
+    `${Date.now().toString(36)}-${Math.random().toString(36).substring(2, 12)}`
+  );
+
+  // Send everything queued so far in a single request. keepalive lets the
+  // request outlive the page when we flush on hide/unload.
+  const flushEvents = async () => {
+    clearTimeout(flushTimer.current);
+    flushTimer.current = null;
+
+    if (eventQueue.current.length === 0) return;
+    const events = eventQueue.current.splice(0, eventQueue.current.length);
+    const body = JSON.stringify({ events });
+
+    let retryAfterMs = null;
     try {
-      await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/analytics/pageview`, {
+      const response = await fetch(BATCH_URL, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
         },
-        body: JSON.stringify({
-          page: page,
-          user_agent: navigator.userAgent,
-          referrer: document.referrer || null,
-          session_id: sessionId.current
-        }),
+        body,
+        keepalive: true,
       });
+      if (response.status === 429 || response.status >= 500) {
+        const retryAfter = Number(response.headers.get('Retry-After'));
+        retryAfterMs = retryAfter > 0 ? retryAfter * 1000 : FLUSH_INTERVAL_MS;
+      }
     } catch (error) {
-      console.error('Failed to track page view:', error);
+      console.error('Failed to flush analytics events:', error);
+      retryAfterMs = FLUSH_INTERVAL_MS;
+    }
+
+    if (retryAfterMs !== null) {
+      // Same events, same ids: anything that did get stored is dropped as a duplicate
+      eventQueue.current = [...events, ...eventQueue.current].slice(-MAX_QUEUED_EVENTS);
+      if (!flushTimer.current) {
+        flushTimer.current = setTimeout(flushEvents, retryAfterMs);
+      }
     }
   };
 
-  const trackInteraction = async (action, element = null, data = null) => {
-    if (!isTracking.current) return;
+  const enqueueEvent = (event, flushNow = false, eventId = newEventId()) => {
+    eventQueue.current.push({ ...event, event_id: eventId });
 
-    try {
-      await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/analytics/interaction`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          action: action,
-          element: element,
-          page: window.location.pathname,
-          session_id: sessionId.current,
-          data: data
-        }),
-      });
-    } catch (error) {
-      console.error('Failed to track interaction:', error);
+    if (flushNow || eventQueue.current.length >= MAX_BATCH_SIZE) {
+      flushEvents();
+    } else if (!flushTimer.current) {
+      flushTimer.current = setTimeout(flushEvents, FLUSH_INTERVAL_MS);
     }
   };
 
+  const trackPageView = (page) => {
+    if (!isTracking.current) return;
+
+    // Stable across re-renders and effect re-runs of the same page load
+    const eventId = `${sessionId.current}:pageview:${pageStartTime.current}:${page}`.slice(0, 128);
+    enqueueEvent({
+      type: 'pageview',
+      page: page,
+      user_agent: navigator.userAgent,
+      referrer: document.referrer || null,
+      session_id: sessionId.current
+    }, true, eventId);
+  };
+
+  const trackInteraction = (action, element = null, data = null, eventId = newEventId()) => {
+    if (!isTracking.current) return;
+
+    enqueueEvent({
+      type: 'interaction',
+      action: action,
+      element: element,
+      page: window.location.pathname,
+      session_id: sessionId.current,
+      data: data
+    }, false, eventId);
+  };
+
   useEffect(() => {
     // Track initial page view
     trackPageView(window.location.pathname);
@@ -66,7 +115,9 @@ const AnalyticsTracker = () => {
         );
         
         if (scrollPercentage > 0 && scrollPercentage % 25 === 0) {
-          trackInteraction('scroll', null, { scroll_percentage: scrollPercentage });
+          // Each milestone counts once per page and session
+          const eventId = `${sessionId.current}:scroll:${scrollPercentage}:${window.location.pathname}`.slice(0, 128);
+          trackInteraction('scroll', null, { scroll_percentage: scrollPercentage }, eventId);
         }
       }, 100);
     };
@@ -105,6 +156,7 @@ const AnalyticsTracker = () => {
         trackInteraction('page_hidden', null, {
           time_on_page: Date.now() - pageStartTime.current
         });
+        flushEvents();
       } else {
         trackInteraction('page_visible', null, null);
         pageStartTime.current = Date.now();
@@ -143,6 +195,7 @@ const AnalyticsTracker = () => {
       trackInteraction('session_end', null, {
         session_duration: Date.now() - pageStartTime.current
       });
+      flushEvents();
     };
 
     window.addEventListener('beforeunload', handleBeforeUnload);
@@ -155,6 +208,7 @@ const AnalyticsTracker = () => {
       document.removeEventListener('visibilitychange', handleVisibilityChange);
       window.removeEventListener('beforeunload', handleBeforeUnload);
       observer.disconnect();
+      flushEvents();
     };
   }, []);
 
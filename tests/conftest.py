@@ -0,0 +1,54 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# The backend is run from its own directory and imports ``services.*`` directly
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+
+class FakeClock:
+    """Stands in for ``time.monotonic``/``time.time``; moves only when ``now`` is set"""
+
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def run():
+    """Runs coroutines to completion, all on one event loop per test"""
+    with asyncio.Runner() as runner:
+        yield runner.run
+
+
+@pytest.fixture
+def db():
+    """An empty in-memory Mongo database"""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    return mongomock_motor.AsyncMongoMockClient()["tests"]
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """TestClient for an app on an in-memory database, its lifespan running"""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from fastapi.testclient import TestClient
+
+    import server
+    from services import database
+    from services.settings import Settings
+
+    client = mongomock_motor.AsyncMongoMockClient()
+    monkeypatch.setattr(database, "AsyncIOMotorClient", lambda *args, **kwargs: client)
+    app = server.create_app(Settings(mongo_url="mongodb://in-memory", db_name="tests"))
+    with TestClient(app) as test_client:
+        yield test_client
@@ -0,0 +1,91 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException, Request
+
+from services.admission import AdmissionController, TokenBucket, client_address, rate_limit
+
+
+def make_request(peer="10.0.0.1", forwarded=None, admission=None):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    app = SimpleNamespace(state=SimpleNamespace(services=SimpleNamespace(admission=admission)))
+    return Request({"type": "http", "headers": headers, "client": (peer, 40000), "app": app})
+
+
+def test_bucket_starts_full_and_reports_wait():
+    bucket = TokenBucket(rate=2.0, burst=3.0, now=0.0)
+    assert [bucket.take(1, 0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.take(1, 0.0) == pytest.approx(0.5)
+
+
+def test_bucket_refills_up_to_burst():
+    bucket = TokenBucket(rate=2.0, burst=3.0, now=0.0)
+    bucket.take(3, 0.0)
+    assert bucket.take(1, 0.5) == 0.0
+    assert bucket.take(3, 100.0) == 0.0
+    assert bucket.tokens == 0.0
+
+
+def test_cost_above_burst_is_charged_as_full_bucket():
+    bucket = TokenBucket(rate=1.0, burst=5.0, now=0.0)
+    assert bucket.take(50, 0.0) == 0.0
+    assert bucket.take(1, 0.0) == pytest.approx(1.0)
+
+
+def test_controller_limits_each_client_separately(clock):
+    admission = AdmissionController(limits={"pageview": (1.0, 2.0)}, clock=clock)
+    assert admission.admit("pageview", "a") == 0.0
+    assert admission.admit("pageview", "a") == 0.0
+    assert admission.admit("pageview", "a") == pytest.approx(1.0)
+    assert admission.admit("pageview", "b") == 0.0
+
+    clock.now = 1.0
+    assert admission.admit("pageview", "a") == 0.0
+    assert admission.stats["rejected"] == 1
+
+
+def test_global_rejection_refunds_the_client(clock):
+    admission = AdmissionController(limits={"pageview": (1.0, 2.0), "global": (1.0, 1.0)}, clock=clock)
+    assert admission.admit("pageview", "a") == 0.0
+    assert admission.admit("pageview", "a") == pytest.approx(1.0)
+
+    clock.now = 1.0
+    # The client's second token was given back, so only the refill is needed
+    assert admission.admit("pageview", "a") == 0.0
+
+
+def test_least_recent_client_is_evicted(clock):
+    admission = AdmissionController(limits={"pageview": (1.0, 1.0)}, max_clients=2, clock=clock)
+    for client in ("a", "b", "c"):
+        admission.admit("pageview", client)
+    assert admission.stats["evictions"] == 1
+    # "a" was evicted and starts again with a full bucket
+    assert admission.admit("pageview", "a") == 0.0
+
+
+def test_rate_limit_raises_429_with_retry_after(clock, run):
+    admission = AdmissionController(limits={"contact": (0.05, 1.0)}, clock=clock)
+    dependency = rate_limit("contact")
+    request = make_request(admission=admission)
+
+    run(dependency(request))
+    with pytest.raises(HTTPException) as raised:
+        run(dependency(request))
+    assert raised.value.status_code == 429
+    assert raised.value.headers["Retry-After"] == "20"
+
+
+def test_client_address_ignores_forwarded_for_by_default():
+    request = make_request(forwarded="1.2.3.4")
+    assert client_address(request) == "10.0.0.1"
+
+
+def test_client_address_reads_hop_added_by_trusted_proxy():
+    request = make_request(forwarded="6.6.6.6, 1.2.3.4, 172.16.0.2")
+    assert client_address(request, trusted_proxies=1) == "172.16.0.2"
+    assert client_address(request, trusted_proxies=2) == "1.2.3.4"
+
+
+def test_client_address_falls_back_when_proxies_were_bypassed():
+    request = make_request(forwarded="1.2.3.4")
+    assert client_address(request, trusted_proxies=2) == "10.0.0.1"
@@ -0,0 +1,85 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+pytest.importorskip("pyarrow")
+pytest.importorskip("pandas")
+
+from services import archive, archive_query  # noqa: E402
+
+START = datetime(2024, 1, 1)
+
+
+def page_view(number, hours, page="/", ip="10.0.0.1", referrer=None):
+    return {
+        "id": f"pv-{number}", "page": page, "referrer": referrer, "session_id": "s1",
+        "ip_address": ip, "user_agent": "Firefox", "timestamp": START + timedelta(hours=hours)
+    }
+
+
+async def seed(db):
+    await db.page_views.insert_many([
+        page_view(0, 1, "/", referrer="https://github.com"),
+        page_view(1, 2, "/", ip="10.0.0.2"),
+        page_view(2, 3, "/projects"),
+        page_view(3, 26, "/", referrer=""),
+        page_view(4, 50, "/contact"),
+    ])
+    await db.user_interactions.insert_many([
+        {"id": "ui-0", "action": "scroll", "page": "/", "timestamp": START, "weight": 10},
+        {"id": "ui-1", "action": "click", "page": "/", "timestamp": START, "data": {"x": 1}},
+    ])
+
+
+def test_closed_days_are_archived_once(run, db, tmp_path):
+    async def scenario():
+        await seed(db)
+        first = await archive.archive_closed_days(db, tmp_path, until=date(2024, 1, 3))
+        again = await archive.archive_closed_days(db, tmp_path, until=date(2024, 1, 4))
+        return first, again
+
+    first, again = run(scenario())
+    assert first == {
+        "page_views": {"2024-01-01": 3, "2024-01-02": 1},
+        "user_interactions": {"2024-01-01": 2},
+    }
+    # Only the day that closed since is new
+    assert again == {"page_views": {"2024-01-03": 1}, "user_interactions": {}}
+    assert archive.archived_days(tmp_path, "page_views") == [date(2024, 1, 1), date(2024, 1, 2), date(2024, 1, 3)]
+    assert not list(tmp_path.rglob("*.tmp"))
+
+
+def test_archive_summary_matches_the_raw_events(run, db, tmp_path):
+    run(seed(db))
+    run(archive.archive_closed_days(db, tmp_path, until=date(2024, 1, 4)))
+
+    report = archive_query.summary(START, START + timedelta(days=2, hours=23), root=tmp_path)
+    assert report["total_views"] == 5
+    assert report["unique_visitors"] == 2
+    assert report["popular_pages"][0] == {"page": "/", "views": 3, "unique_visitors": 2}
+    assert report["top_referrers"] == [{"referrer": "https://github.com", "count": 1}]
+    assert [(day["date"], day["views"]) for day in report["daily_views"]] == [
+        (START, 3), (START + timedelta(days=1), 1), (START + timedelta(days=2), 1)
+    ]
+
+    # The window cuts inside the first and last partitions
+    narrow = archive_query.summary(START + timedelta(hours=2), START + timedelta(hours=26), root=tmp_path)
+    assert narrow["total_views"] == 3
+
+
+def test_archived_interactions_keep_their_weights(run, db, tmp_path):
+    run(seed(db))
+    run(archive.archive_closed_days(db, tmp_path, until=date(2024, 1, 2)))
+
+    assert archive_query.top_interactions(START, START + timedelta(days=1), root=tmp_path) == [
+        {"action": "scroll", "count": 10}, {"action": "click", "count": 1}
+    ]
+    frame = archive_query.load_events("user_interactions", START, START + timedelta(days=1), root=tmp_path)
+    assert sorted(frame["data"].dropna()) == ['{"x": 1}']
+
+
+def test_window_without_partitions_is_empty(tmp_path):
+    report = archive_query.summary(START, START + timedelta(days=1), root=tmp_path)
+    assert report["total_views"] == 0
+    assert report["popular_pages"] == []
+    assert archive_query.archive_coverage(tmp_path) == {"page_views": None, "user_interactions": None}
@@ -0,0 +1,54 @@
+import math
+
+
+def test_each_event_in_a_batch_gets_its_own_status(api, run):
+    batch = {"events": [
+        {"type": "pageview", "page": "/", "session_id": "s1", "event_id": "page-view-0001"},
+        {"type": "interaction", "action": "click", "page": "/", "session_id": "s1", "event_id": "interaction-0001"},
+        {"type": "pageview", "session_id": "s1"},
+        {"type": "purchase", "page": "/"},
+        {"type": "pageview", "page": "/", "session_id": "s1", "event_id": "page-view-0001"},
+        {"page": "/about"},
+    ]}
+    response = api.post("/api/analytics/batch", json=batch)
+    assert response.status_code == 200
+    body = response.json()
+
+    assert [result["status"] for result in body["results"]] == [
+        "accepted", "accepted", "rejected", "rejected", "duplicate", "rejected"
+    ]
+    assert [result["index"] for result in body["results"]] == list(range(6))
+    assert "page" in body["results"][2]["error"]
+    assert body["results"][3]["error"] == "Unknown event type: 'purchase'"
+    assert body["results"][5]["error"] == "Unknown event type: None"
+    assert {key: body[key] for key in ("accepted", "rejected", "duplicates", "shed", "sampled")} == {
+        "accepted": 2, "rejected": 3, "duplicates": 1, "shed": 0, "sampled": 0
+    }
+
+    db = api.app.state.mongo.db
+
+    async def stored():
+        page_views = await db.page_views.find({}, {"_id": 0, "id": 1, "ip_address": 1}).to_list(None)
+        interactions = await db.user_interactions.count_documents({})
+        hourly = await db.rollup_page_views_hourly.find({}, {"_id": 0, "page": 1, "views": 1}).to_list(None)
+        return page_views, interactions, hourly
+
+    page_views, interactions, hourly = run(stored())
+    assert page_views == [{"id": "page-view-0001", "ip_address": "testclient"}]
+    assert interactions == 1
+    assert hourly == [{"page": "/", "views": 1}]
+
+
+def test_batch_is_charged_per_event(api, clock):
+    admission = api.app.state.services.admission
+    admission.clock = clock
+    rate, burst = admission.limits["batch"]
+    events = [{"type": "pageview", "page": "/", "session_id": "s1"}] * int(burst)
+
+    assert api.post("/api/analytics/batch", json={"events": events}).status_code == 200
+    limited = api.post("/api/analytics/batch", json={"events": events[:1]})
+    assert limited.status_code == 429
+    assert limited.headers["Retry-After"] == str(math.ceil(1 / rate))
+
+    clock.now += 1 / rate
+    assert api.post("/api/analytics/batch", json={"events": events[:1]}).status_code == 200
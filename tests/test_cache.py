@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+
+from services.cache import ResponseCache, cache_key
+
+
+def test_cache_key_ignores_order_and_missing_params():
+    assert cache_key("summary", days=7, page=None, exact=True) == cache_key("summary", exact=True, days=7)
+
+
+def test_entries_expire_after_ttl(clock, run):
+    cache = ResponseCache(clock=clock)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return len(calls)
+
+    async def scenario():
+        assert await cache.get_or_compute("k", 10, compute) == 1
+        clock.now = 9.9
+        assert await cache.get_or_compute("k", 10, compute) == 1
+        clock.now = 10.0
+        assert await cache.get_or_compute("k", 10, compute) == 2
+
+    run(scenario())
+    assert cache.stats["hits"] == 1
+    assert cache.stats["misses"] == 2
+
+
+def test_least_recently_used_entry_is_evicted(run):
+    cache = ResponseCache(max_entries=2)
+
+    async def value(name):
+        return await cache.get_or_compute(name, 60, lambda: asyncio.sleep(0, result=name))
+
+    async def scenario():
+        await value("a")
+        await value("b")
+        await value("a")  # "b" is now the least recently used
+        await value("c")
+
+    run(scenario())
+    assert list(cache._entries) == ["a", "c"]
+    assert cache.stats["evictions"] == 1
+
+
+def test_concurrent_callers_share_one_computation(run):
+    cache = ResponseCache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_compute("k", 60, compute) for _ in range(5)))
+
+    assert run(scenario()) == ["value"] * 5
+    assert len(calls) == 1
+    assert cache.stats["coalesced"] == 4
+    assert cache.snapshot()["inflight"] == 0
+
+
+def test_cancelled_leader_does_not_cancel_followers(run):
+    cache = ResponseCache()
+    release = None
+
+    async def compute():
+        await release.wait()
+        return "value"
+
+    async def scenario():
+        nonlocal release
+        release = asyncio.Event()
+        leader = asyncio.create_task(cache.get_or_compute("k", 60, compute))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(cache.get_or_compute("k", 60, compute))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert run(scenario()) == "value"
+    assert cache.stats["hits"] == 0
+    assert list(cache._entries) == ["k"]
+
+
+def test_failed_computation_is_not_cached(run):
+    cache = ResponseCache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+        return "value"
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await cache.get_or_compute("k", 60, compute)
+        return await cache.get_or_compute("k", 60, compute)
+
+    assert run(scenario()) == "value"
+    assert len(calls) == 2
+
+
+def test_invalidate_drops_one_endpoint_or_everything(run):
+    cache = ResponseCache()
+
+    async def fill():
+        for key in (cache_key("summary", days=7), cache_key("summary", days=30), cache_key("dashboard")):
+            await cache.get_or_compute(key, 60, lambda: asyncio.sleep(0, result=key))
+
+    run(fill())
+    cache.invalidate("summary")
+    assert list(cache._entries) == [cache_key("dashboard")]
+    cache.invalidate()
+    assert cache.snapshot()["entries"] == 0
+
+
+def test_repeated_summary_requests_are_served_from_the_cache(api):
+    first = api.get("/api/analytics/summary?days=7")
+    api.post("/api/analytics/batch", json={"events": [{"type": "pageview", "page": "/", "session_id": "s1"}]})
+    second = api.get("/api/analytics/summary?days=7")
+    other_window = api.get("/api/analytics/summary?days=1")
+
+    # Within the TTL the cached summary is returned as is
+    assert second.content == first.content
+    assert other_window.json()["total_views"] == 1
+
+    cache = api.get("/api/analytics/stats").json()["cache"]
+    assert (cache["hits"], cache["misses"]) == (1, 2)
@@ -0,0 +1,98 @@
+import gzip
+
+import brotli
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from services.compression import CompressionMiddleware, EncodedBody, encoded_response, negotiate
+
+LARGE = b'{"pages": [' + b", ".join(b'{"page": "/projects", "views": 1}' for _ in range(200)) + b"]}"
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, deflate, br", "br"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("gzip;q=0", None),
+    ("*", "br"),
+    ("*;q=0.1, br;q=0", "gzip"),
+    ("identity", None),
+    (None, None),
+    ("GZIP;q=abc, gzip", "gzip"),
+])
+def test_negotiate_prefers_the_highest_q_value(header, expected):
+    assert negotiate(header, ("br", "gzip")) == expected
+
+
+def test_small_bodies_are_not_precompressed():
+    encoded = EncodedBody(b'{"ok": true}')
+    assert encoded.variants == {}
+    assert encoded.headers("gzip, br") == (b'{"ok": true}', {})
+
+
+def test_variants_round_trip_and_vary_on_every_response():
+    encoded = EncodedBody(LARGE)
+    assert gzip.decompress(encoded.variants["gzip"]) == LARGE
+    assert brotli.decompress(encoded.variants["br"]) == LARGE
+    assert encoded.sizes()["br"] < encoded.sizes()["identity"]
+
+    body, headers = encoded.headers("gzip")
+    assert body is encoded.variants["gzip"]
+    assert headers == {"Vary": "Accept-Encoding", "Content-Encoding": "gzip"}
+    # Identity responses vary too, or a shared cache could hand them to everyone
+    assert encoded.headers(None) == (LARGE, {"Vary": "Accept-Encoding"})
+
+    response = encoded_response(encoded, "br", {"Server-Timing": "total;dur=1.0"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.headers["server-timing"] == "total;dur=1.0"
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, min_bytes=100)
+
+    @app.get("/large")
+    def large():
+        return PlainTextResponse(LARGE, media_type="application/json", headers={"Vary": "Origin"})
+
+    @app.get("/small")
+    def small():
+        return PlainTextResponse(b"{}", media_type="application/json")
+
+    @app.get("/precompressed")
+    def precompressed():
+        return encoded_response(EncodedBody(LARGE, min_bytes=100), "gzip")
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter([b"data: 1\n\n"] * 100), media_type="text/event-stream")
+
+    return TestClient(app)
+
+
+def test_middleware_compresses_large_complete_bodies(client):
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Origin, Accept-Encoding"
+    assert response.content == LARGE
+    assert int(response.headers["content-length"]) < len(LARGE)
+
+    identity = client.get("/large", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers
+    assert identity.headers["vary"] == "Origin, Accept-Encoding"
+
+
+def test_middleware_passes_through_small_encoded_and_streamed_bodies(client):
+    small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+
+    # Pre-compressed bodies are not compressed twice
+    precompressed = client.get("/precompressed", headers={"Accept-Encoding": "br"})
+    assert precompressed.headers["content-encoding"] == "gzip"
+    assert precompressed.content == LARGE
+
+    stream = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in stream.headers
+    assert stream.text.count("data: 1") == 100
@@ -0,0 +1,91 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from services.dashboard_stream import DashboardStream, build_delta
+
+
+def test_batch_ingest_wakes_the_dashboard_stream(api, monkeypatch):
+    stream = api.app.state.services.dashboard_stream
+    notified = []
+
+    async def notify(db, collection, documents):
+        notified.append((collection, len(documents)))
+
+    monkeypatch.setattr(stream, "notify", notify)
+    batch = {"events": [
+        {"type": "pageview", "page": "/", "session_id": "s1"},
+        {"type": "interaction", "action": "click", "page": "/", "session_id": "s1"},
+    ]}
+    assert api.post("/api/analytics/batch", json=batch).status_code == 200
+    assert notified == [("page_views", 1), ("user_interactions", 1)]
+
+
+def test_build_delta_weights_interactions_and_orders_contacts():
+    earlier, later = datetime(2024, 1, 1), datetime(2024, 1, 2)
+    delta = build_delta([
+        ("page_views", {"page": "/"}),
+        ("page_views", {"page": "/"}),
+        ("user_interactions", {"action": "scroll", "page": "/", "weight": 10}),
+        ("user_interactions", {"action": "click", "page": "/about"}),
+        ("contact_messages", {"name": "first", "created_at": earlier}),
+        ("contact_messages", {"name": "second", "created_at": later}),
+    ])
+    assert delta["page_views"] == {"/": 2}
+    assert delta["interactions"] == {"scroll": 10, "click": 1}
+    assert delta["interactions_by_page"] == {"/": 10, "/about": 1}
+    assert [contact["name"] for contact in delta["contact_messages"]] == ["second", "first"]
+
+
+def test_catch_up_then_deltas_without_repeats(run, db):
+    stream = DashboardStream(interval=60, settle=5, replay=120)
+
+    async def scenario():
+        now = datetime.utcnow()
+        await db.page_views.insert_many([
+            {"id": "old", "page": "/", "timestamp": now - timedelta(minutes=10)},
+            {"id": "before-snapshot", "page": "/", "timestamp": now - timedelta(seconds=30)},
+            {"id": "after-snapshot", "page": "/about", "timestamp": now - timedelta(seconds=1)},
+        ])
+        subscription = stream.subscribe(db)
+        # Only what is newer than the (possibly cached) snapshot is replayed
+        caught_up, covered = await stream.catch_up(now - timedelta(seconds=10))
+        first = subscription.queue.get_nowait()
+
+        # Written by this worker: the next poll comes straight away, and
+        # looks back past ids it already published
+        await db.page_views.insert_one({"id": "live", "page": "/", "timestamp": datetime.utcnow()})
+        await stream.notify(db, "page_views", [])
+        second = await asyncio.wait_for(subscription.queue.get(), 5)
+
+        stream.unsubscribe(subscription)
+        await stream.stop()
+        return caught_up, covered, first, second
+
+    caught_up, covered, first, second = run(scenario())
+    assert caught_up["page_views"] == {"/about": 1}
+    assert covered == first["seq"] == 1
+    assert first["page_views"] == {"/": 1, "/about": 1}
+    assert second["seq"] == 2
+    assert second["page_views"] == {"/": 1}
+    assert stream.stats["events"] == 3
+
+
+def test_subscriber_that_falls_behind_is_closed(run, db):
+    stream = DashboardStream(interval=60, settle=5, queue_size=1)
+
+    async def scenario():
+        fast, slow = stream.subscribe(db), stream.subscribe(db)
+        await stream.catch_up(datetime.utcnow())
+        for number in range(2):
+            await db.page_views.insert_one({"id": f"pv-{number}", "page": "/", "timestamp": datetime.utcnow()})
+            await stream.notify(db, "page_views", [])
+            await asyncio.wait_for(fast.queue.get(), 5)
+        closing = slow.queue.get_nowait()
+        await stream.stop()
+        return closing, slow.closed
+
+    closing, closed = run(scenario())
+    # Its backlog is dropped for the end-of-stream marker
+    assert closing is None
+    assert closed is True
+    assert stream.stats["lagged"] == 1
@@ -0,0 +1,115 @@
+import pytest
+from pymongo.errors import AutoReconnect
+
+from services.dedup import BloomFilter, EventDeduplicator, RotatingBloomFilter
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    keys = [f"event-{number}" for number in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    false_positives = sum(f"other-{number}" in bloom for number in range(10000))
+    assert false_positives < 300
+
+
+def test_rotates_one_partition_per_slice(clock):
+    bloom = RotatingBloomFilter(window_seconds=40, partitions=4, clock=clock)
+    assert bloom.seen_or_add("a") is False
+    assert bloom.seen_or_add("a") is True
+
+    for step in range(1, 4):
+        clock.now = step * 10
+        bloom.seen_or_add(f"key-{step}")
+    assert bloom.partition_count == 4
+    assert bloom.rotations == 4
+    assert bloom.seen_or_add("a") is True
+
+    # The slice holding "a" falls out of the ring
+    clock.now = 40
+    assert bloom.seen_or_add("a") is False
+    assert bloom.partition_count == 4
+
+
+def test_rotates_when_partition_is_full(clock):
+    bloom = RotatingBloomFilter(window_seconds=40, partitions=2, partition_capacity=2, clock=clock)
+    for key in ("a", "b", "c", "d", "e"):
+        bloom.seen_or_add(key)
+    assert bloom.rotations == 3
+    assert bloom.partition_count == 2
+    assert bloom.seen_or_add("a") is False
+
+
+def test_idle_filters_expire_after_the_window(clock):
+    bloom = RotatingBloomFilter(window_seconds=40, partitions=4, clock=clock)
+    bloom.seen_or_add("a")
+    clock.now = 1000
+    assert bloom.seen_or_add("a") is False
+    assert bloom.partition_count == 1
+
+
+def test_deduplicator_confirms_against_recent_ids_and_the_collection(clock, run, db):
+    deduplicator = EventDeduplicator(RotatingBloomFilter(clock=clock), recent_size=1)
+
+    async def scenario():
+        assert await deduplicator.is_duplicate(db, "page_views", "a") is False
+        assert await deduplicator.is_duplicate(db, "page_views", "a") is True
+
+        # "a" leaves the recent list, so the Bloom hit is checked in Mongo
+        assert await deduplicator.is_duplicate(db, "page_views", "b") is False
+        assert await deduplicator.is_duplicate(db, "page_views", "a") is False
+        await db.page_views.insert_one({"id": "b"})
+        deduplicator.forget("page_views", "b")
+        assert await deduplicator.is_duplicate(db, "page_views", "b") is True
+
+    run(scenario())
+    assert deduplicator.stats["db_checks"] == 2
+    assert deduplicator.stats["unconfirmed"] == 1
+
+
+def test_batch_retry_after_connection_error_is_stored(api, monkeypatch):
+    from mongomock_motor import AsyncMongoMockCollection
+
+    insert_many = AsyncMongoMockCollection.insert_many
+    attempts = []
+
+    async def flaky_insert_many(self, *args, **kwargs):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise AutoReconnect("connection reset by peer")
+        return await insert_many(self, *args, **kwargs)
+
+    monkeypatch.setattr(AsyncMongoMockCollection, "insert_many", flaky_insert_many)
+    batch = {"events": [
+        {"type": "pageview", "page": "/", "session_id": "s1", "event_id": "page-view-0001"},
+        {"type": "pageview", "page": "/about", "session_id": "s1", "event_id": "page-view-0002"},
+    ]}
+
+    assert api.post("/api/analytics/batch", json=batch).status_code == 500
+    retry = api.post("/api/analytics/batch", json=batch)
+    assert retry.status_code == 200
+    assert [result["status"] for result in retry.json()["results"]] == ["accepted", "accepted"]
+
+    resent = api.post("/api/analytics/batch", json=batch).json()
+    assert [result["status"] for result in resent["results"]] == ["duplicate", "duplicate"]
+
+
+def test_single_event_retry_after_failure_is_accepted(api, monkeypatch):
+    counters = api.app.state.services.realtime_counters
+    record = counters.record
+    attempts = []
+
+    def flaky_record(collection, document):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("counter failure")
+        record(collection, document)
+
+    monkeypatch.setattr(counters, "record", flaky_record)
+    page_view = {"page": "/", "session_id": "s1", "event_id": "page-view-0001"}
+    assert api.post("/api/analytics/pageview", json=page_view).status_code == 500
+
+    retry = api.post("/api/analytics/pageview", json=page_view)
+    assert retry.status_code == 202
+    assert retry.json()["message"] == "Page view accepted"
@@ -0,0 +1,57 @@
+import pytest
+
+from services.hll import HyperLogLog, precision_for_error
+
+
+def visitors(start, stop):
+    return (f"visitor-{number}" for number in range(start, stop))
+
+
+def test_precision_for_error():
+    assert precision_for_error(0.01) == 14
+    with pytest.raises(ValueError):
+        precision_for_error(0)
+
+
+def test_small_counts_are_exact_enough():
+    sketch = HyperLogLog(14)
+    sketch.update(visitors(0, 100))
+    sketch.update(visitors(0, 100))
+    assert sketch.count() == 100
+
+
+def test_count_within_three_standard_errors():
+    sketch = HyperLogLog.for_error_rate(0.01)
+    sketch.update(visitors(0, 100_000))
+    assert abs(sketch.count() - 100_000) <= 3 * sketch.error_rate * 100_000
+
+
+def test_merge_counts_the_union():
+    first, second, both = HyperLogLog(12), HyperLogLog(12), HyperLogLog(12)
+    first.update(visitors(0, 30_000))
+    second.update(visitors(20_000, 50_000))
+    both.update(visitors(0, 50_000))
+
+    first.merge(second)
+    assert first.count() == both.count()
+    assert abs(first.count() - 50_000) <= 3 * first.error_rate * 50_000
+
+
+def test_merge_across_precisions_uses_the_lower_one():
+    fine, coarse = HyperLogLog(14), HyperLogLog(10)
+    fine.update(visitors(0, 20_000))
+    coarse.update(visitors(10_000, 30_000))
+
+    fine.merge(coarse)
+    expected = HyperLogLog(10)
+    expected.update(visitors(0, 30_000))
+    assert fine.precision == 10
+    assert (fine.registers == expected.registers).all()
+
+
+def test_serialisation_round_trip():
+    sketch = HyperLogLog(12)
+    sketch.update(visitors(0, 5_000))
+    restored = HyperLogLog.from_bytes(sketch.to_bytes())
+    assert restored.precision == 12
+    assert restored.count() == sketch.count()
@@ -0,0 +1,49 @@
+import base64
+import json
+from datetime import datetime
+
+import pytest
+
+from services.pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursor, after_cursor, clamp_limit, decode_cursor, encode_cursor
+)
+
+
+def raw_cursor(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def test_cursor_round_trip():
+    timestamp = datetime(2024, 5, 1, 12, 30, 15, 123000)
+    cursor = encode_cursor(timestamp, "event-1")
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (timestamp, "event-1")
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor!",
+    "bm90IGpzb24",
+    raw_cursor({"v": {"$date": 0}}),
+    raw_cursor({"v": {"$gt": ""}, "id": "event-1"}),
+    raw_cursor({"v": {"$date": 0}, "id": {"$ne": None}}),
+    raw_cursor({"v": "2024-05-01", "id": "event-1"}),
+])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+def test_after_cursor_builds_keyset_filter():
+    timestamp = datetime(2024, 5, 1)
+    cursor = encode_cursor(timestamp, "event-1")
+    assert after_cursor("timestamp", None) == {}
+    assert after_cursor("timestamp", cursor) == {"$or": [
+        {"timestamp": {"$lt": timestamp}},
+        {"timestamp": timestamp, "id": {"$lt": "event-1"}},
+    ]}
+
+
+def test_clamp_limit():
+    assert clamp_limit(None) == DEFAULT_PAGE_SIZE
+    assert clamp_limit(-5) == 1
+    assert clamp_limit(10 ** 6) == MAX_PAGE_SIZE
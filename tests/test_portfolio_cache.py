@@ -0,0 +1,86 @@
+from services.portfolio_cache import PortfolioCache, etag_matches, variant_etag
+
+
+def portfolio(tagline="Engineer"):
+    return {
+        "personal": {
+            "name": "Ada", "tagline": tagline, "description": "", "email": "ada@example.com",
+            "phone": "", "location": "", "bio": "", "education": []
+        },
+        "skills": {"technical": [], "tools": [], "soft": []},
+        "experience": [],
+        "projects": [],
+        "certifications": [],
+        "contact": {"email": "ada@example.com", "phone": "", "location": "", "availability": "", "social": {}},
+        "activities": [],
+    }
+
+
+def test_variant_etags_match_the_document_tag():
+    assert variant_etag('"abc"', None) == '"abc"'
+    assert variant_etag('"abc"', "gzip") == '"abc-gzip"'
+
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('W/"abc-br"', '"abc"')
+    assert etag_matches('"other", "abc-gzip"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"abcd"', '"abc"')
+    assert not etag_matches(None, '"abc"')
+
+
+def test_other_workers_rebuild_when_the_version_moves(run, db):
+    writer, reader = PortfolioCache(), PortfolioCache()
+
+    async def scenario():
+        assert await reader.get(db) is None
+        await db.portfolio.insert_one(portfolio())
+        await writer.invalidate(db)
+        # The reader keeps serving its copy until it sees the new stamp
+        stale = await reader.get(db)
+        await reader.rebuild(db)
+        return stale, await reader.get(db), await writer.get(db)
+
+    stale, fresh, written = run(scenario())
+    assert stale is None
+    assert fresh[1] == written[1]
+    assert reader.version == writer.version == 1
+    assert reader.stats["misses"] == 1
+
+
+def test_get_answers_304_until_the_portfolio_changes(api):
+    assert api.get("/api/portfolio").status_code == 404
+    assert api.put("/api/portfolio", json=portfolio()).status_code == 200
+
+    first = api.get("/api/portfolio")
+    assert first.status_code == 200
+    assert first.json()["personal"]["tagline"] == "Engineer"
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "no-cache"
+
+    not_modified = api.get("/api/portfolio", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["ETag"] == etag
+
+    assert api.put("/api/portfolio", json=portfolio("Architect")).status_code == 200
+    changed = api.get("/api/portfolio", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json()["personal"]["tagline"] == "Architect"
+
+
+def test_compressed_variant_has_its_own_tag(api):
+    api.put("/api/portfolio", json=portfolio("x" * 2000))
+    identity = api.get("/api/portfolio", headers={"Accept-Encoding": "identity"})
+    compressed = api.get("/api/portfolio", headers={"Accept-Encoding": "gzip"})
+
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert compressed.headers["ETag"] == variant_etag(identity.headers["ETag"], "gzip")
+    assert compressed.json() == identity.json()
+
+    # A tag for the gzip variant revalidates any variant of the same document
+    revalidated = api.get("/api/portfolio", headers={
+        "Accept-Encoding": "identity", "If-None-Match": compressed.headers["ETag"]
+    })
+    assert revalidated.status_code == 304
+    assert "Content-Encoding" not in revalidated.headers
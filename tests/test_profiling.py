@@ -0,0 +1,16 @@
+from services.profiling import Profiler
+
+
+def test_admin_token_check(tmp_path):
+    profiler = Profiler(tmp_path, admin_token="s3cret")
+    assert profiler.token_valid("s3cret")
+    assert not profiler.token_valid("s3cre")
+    assert not profiler.token_valid("")
+    assert not profiler.token_valid(None)
+    assert not profiler.token_valid("sécret")
+
+
+def test_no_token_configured_rejects_everything(tmp_path):
+    profiler = Profiler(tmp_path)
+    assert not profiler.token_valid("")
+    assert not profiler.token_valid(None)
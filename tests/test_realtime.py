@@ -0,0 +1,68 @@
+from services.realtime import RealtimeCounters, SlidingWindowCounter
+
+
+def test_counts_leave_each_window_on_time(clock):
+    counter = SlidingWindowCounter(windows=(5, 10), clock=clock)
+    counter.add("home")
+    clock.now += 3
+    counter.add("home", 2)
+    counter.add("about")
+    assert counter.totals(5) == {"home": 3, "about": 1}
+
+    clock.now += 2
+    # The first add is 5 seconds old: out of the 5s window, still in the 10s one
+    assert counter.totals(5) == {"home": 2, "about": 1}
+    assert counter.totals(10) == {"home": 3, "about": 1}
+
+    clock.now += 3
+    assert counter.totals(5) == {}
+    assert counter.totals(10) == {"home": 3, "about": 1}
+
+    clock.now += 5
+    assert counter.totals(10) == {}
+
+
+def test_long_idle_gap_resets_everything(clock):
+    counter = SlidingWindowCounter(windows=(5, 10), clock=clock)
+    counter.add("home")
+    clock.now += 1000
+    assert counter.totals(10) == {}
+    counter.add("home")
+    assert counter.totals(5) == {"home": 1}
+
+
+def test_clock_stepping_back_counts_into_newest_bucket(clock):
+    counter = SlidingWindowCounter(windows=(5,), clock=clock)
+    counter.add("home")
+    clock.now -= 30
+    counter.add("home")
+    assert counter.totals(5) == {"home": 2}
+
+
+def test_distinct_counts_a_key_once_per_second(clock):
+    sessions = SlidingWindowCounter(windows=(5,), distinct=True, clock=clock)
+    sessions.add("s1")
+    sessions.add("s1")
+    sessions.add("s2")
+    assert sessions.distinct_count(5) == 2
+    assert sessions.totals(5) == {"s1": 1, "s2": 1}
+
+    clock.now += 1
+    sessions.add("s1")
+    assert sessions.distinct_count(5) == 2
+    clock.now += 5
+    assert sessions.distinct_count(5) == 0
+
+
+def test_view_sums_weighted_interactions(clock):
+    counters = RealtimeCounters()
+    for counter in (counters.page_views, counters.interactions, counters.sessions):
+        counter.clock = clock
+    counters.record("page_views", {"page": "home", "session_id": "s1"})
+    counters.record("user_interactions", {"action": "scroll", "weight": 10, "session_id": "s1"})
+    counters.record("contact_messages", {"session_id": "s2"})
+
+    window = counters.view()["windows"]["1m"]
+    assert window["page_views"] == {"home": 1}
+    assert window["total_interactions"] == 10
+    assert window["active_sessions"] == 1
@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from services import retention
+from services.rollups import truncate
+
+# History ensure_ttl_indexes checks is measured against the wall clock
+TODAY = truncate(datetime.utcnow(), "day")
+NOW = TODAY + timedelta(hours=12)
+
+
+def day(offset):
+    return TODAY + timedelta(days=offset)
+
+
+@pytest.fixture
+def fourteen_day_retention(monkeypatch):
+    monkeypatch.setattr(retention, "RAW_RETENTION_DAYS", 14)
+    monkeypatch.setattr(retention, "COMPACTION_LEAD_DAYS", 2)
+    monkeypatch.setattr(retention, "ARCHIVE_BEFORE_EXPIRY", False)
+
+
+async def seed_raw_history(db, first_offset=-20):
+    # Raw events only: the ingest-time rollups never saw them
+    await db.page_views.insert_many([
+        {"id": f"pv{offset}", "page": "/", "session_id": f"s{offset}", "timestamp": day(offset) + timedelta(hours=1)}
+        for offset in range(first_offset, 1)
+    ])
+
+
+async def hourly_view_days(db):
+    rows = await db.rollup_page_views_hourly.find({}, {"_id": 0}).to_list(None)
+    return sorted({truncate(row["bucket"], "day") for row in rows})
+
+
+def test_compaction_is_a_no_op_while_retention_is_disabled(run, db):
+    async def scenario():
+        await seed_raw_history(db)
+        return await retention.Compactor().run_once(db, now=NOW), await retention.ensure_ttl_indexes(db)
+
+    compacted, applied = run(scenario())
+    assert compacted == []
+    assert applied == {"page_views": None, "user_interactions": None}
+
+
+def test_ttl_waits_until_existing_history_is_compacted(run, db, fourteen_day_retention):
+    compactor = retention.Compactor()
+
+    async def scenario():
+        await seed_raw_history(db)
+        deferred = await retention.ensure_ttl_indexes(db)
+        ttl_before = await retention.ttl_active(db)
+        compacted = await compactor.run_once(db, now=NOW)
+        state = await db[retention.STATE_COLLECTION].find_one({"_id": retention.STATE_ID})
+        return deferred, ttl_before, compacted, state, await retention.ttl_active(db), await hourly_view_days(db)
+
+    deferred, ttl_before, compacted, state, ttl_after, rollup_days = run(scenario())
+    assert deferred == {"page_views": None, "user_interactions": None}
+    assert ttl_before is False
+
+    # Oldest day first, up to (not including) the day that expires past the lead time
+    expected = [day(offset) for offset in range(-20, -12)]
+    assert compacted == [value.date().isoformat() for value in expected]
+    assert state["compacted_through"] == day(-13)
+    assert rollup_days == expected
+    assert ttl_after is True
+    assert compactor.stats["days_compacted"] == 8
+
+
+def test_compaction_resumes_after_the_last_compacted_day(run, db, fourteen_day_retention):
+    compactor = retention.Compactor()
+
+    async def scenario():
+        await seed_raw_history(db)
+        first = await compactor.run_once(db, now=NOW)
+        again = await compactor.run_once(db, now=NOW)
+        next_day = await compactor.run_once(db, now=NOW + timedelta(days=1))
+        return first, again, next_day
+
+    first, again, next_day = run(scenario())
+    assert len(first) == 8
+    assert again == []
+    assert next_day == [day(-12).date().isoformat()]
+
+
+def test_days_already_expiring_are_skipped_not_rebuilt(run, db, fourteen_day_retention):
+    compactor = retention.Compactor()
+
+    async def scenario():
+        await seed_raw_history(db)
+        await compactor.run_once(db, now=NOW)
+        # Forget progress with the TTL index in place, as after shortening retention
+        await db[retention.STATE_COLLECTION].delete_many({})
+        await db.rollup_page_views_hourly.delete_many({})
+        compacted = await compactor.run_once(db, now=NOW)
+        state = await db[retention.STATE_COLLECTION].find_one({"_id": retention.STATE_ID})
+        return compacted, state, await hourly_view_days(db)
+
+    compacted, state, rollup_days = run(scenario())
+    # Only the day at the horizon still has complete raw events
+    assert compacted == [day(-13).date().isoformat()]
+    assert state["compacted_through"] == day(-13)
+    assert rollup_days == [day(-13)]
+
+
+def test_a_held_lease_skips_the_run(run, db, fourteen_day_retention):
+    first, second = retention.Compactor(), retention.Compactor()
+
+    async def scenario():
+        await seed_raw_history(db)
+        await db.leases.insert_one({
+            "_id": retention.LEASE_NAME, "owner": first.owner, "lease_until": NOW + timedelta(minutes=5)
+        })
+        return await second.run_once(db, now=NOW)
+
+    assert run(scenario()) is None
+    assert second.stats["skipped_runs"] == 1
@@ -0,0 +1,97 @@
+import random
+from datetime import datetime, timedelta
+
+from services.rollups import ROLLUPS, apply_rollups, rebuild_rollups, truncate
+
+START = datetime(2024, 3, 1)
+
+
+def make_events(count=300, seed=7):
+    rng = random.Random(seed)
+    page_views, interactions = [], []
+    for number in range(count):
+        timestamp = START + timedelta(minutes=rng.randrange(3 * 24 * 60), seconds=rng.randrange(60))
+        page_views.append({
+            "id": f"pv-{number}",
+            "page": rng.choice(["/", "/projects", "/contact"]),
+            "referrer": rng.choice([None, "", "https://google.com", "https://github.com"]),
+            "timestamp": timestamp,
+        })
+        interactions.append({
+            "id": f"ui-{number}",
+            "action": rng.choice(["click", "scroll", None]),
+            "page": "/",
+            "timestamp": timestamp,
+            "weight": rng.choice([1, 1, 10]),
+        })
+    return {"page_views": page_views, "user_interactions": interactions}
+
+
+async def rollup_contents(db):
+    contents = {}
+    for spec in ROLLUPS:
+        documents = await db[spec.collection].find({}, {"_id": 0}).to_list(None)
+        contents[spec.collection] = {
+            (document["bucket"], document[spec.key_field]): document[spec.value_field] for document in documents
+        }
+    return contents
+
+
+async def ingest(db, events, batch_size=50):
+    for source, documents in events.items():
+        await db[source].insert_many([dict(document) for document in documents])
+        for offset in range(0, len(documents), batch_size):
+            await apply_rollups(db, source, documents[offset:offset + batch_size])
+
+
+def test_truncate():
+    timestamp = datetime(2024, 3, 1, 13, 45, 12, 500)
+    assert truncate(timestamp, "hour") == datetime(2024, 3, 1, 13)
+    assert truncate(timestamp, "day") == datetime(2024, 3, 1)
+
+
+def test_incremental_rollups_count_weighted_events(run, db):
+    events = {
+        "page_views": [
+            {"page": "/", "referrer": "https://google.com", "timestamp": START + timedelta(minutes=5)},
+            {"page": "/", "referrer": None, "timestamp": START + timedelta(minutes=50)},
+            {"page": "/", "referrer": "", "timestamp": START + timedelta(hours=1)},
+        ],
+        "user_interactions": [
+            {"action": "scroll", "timestamp": START, "weight": 10},
+            {"action": "click", "timestamp": START},
+            {"action": None, "timestamp": START},
+        ],
+    }
+    run(ingest(db, events, batch_size=1))
+    contents = run(rollup_contents(db))
+    assert contents["rollup_page_views_hourly"] == {(START, "/"): 2, (START + timedelta(hours=1), "/"): 1}
+    assert contents["rollup_referrers_daily"] == {(START, "https://google.com"): 1}
+    assert contents["rollup_interactions_daily"] == {(START, "scroll"): 10, (START, "click"): 1}
+
+
+def test_rebuild_matches_incremental_rollups(run, db):
+    run(ingest(db, make_events()))
+    incremental = run(rollup_contents(db))
+
+    run(rebuild_rollups(db))
+    assert run(rollup_contents(db)) == incremental
+
+
+def test_partial_rebuild_only_replaces_its_window(run, db):
+    run(ingest(db, make_events()))
+    expected = run(rollup_contents(db))
+
+    async def drift_and_rebuild():
+        # Ingest-time aggregates that went wrong on both days
+        for spec in ROLLUPS:
+            await db[spec.collection].update_many({}, {"$inc": {spec.value_field: 100}})
+        second_day = START + timedelta(days=1)
+        await rebuild_rollups(db, start=second_day + timedelta(hours=6), end=second_day + timedelta(days=1))
+        return await rollup_contents(db)
+
+    rebuilt = run(drift_and_rebuild())
+    for collection, buckets in rebuilt.items():
+        for (bucket, key), value in buckets.items():
+            in_window = START + timedelta(days=1) <= bucket < START + timedelta(days=2)
+            assert value == expected[collection][(bucket, key)] + (0 if in_window else 100)
@@ -0,0 +1,63 @@
+from services.sampling import InteractionSampler, RateMeter, parse_policy
+
+
+def test_parse_policy():
+    assert parse_policy("scroll=20:10, section_view=5, =3:2, hover") == {
+        "scroll": (20.0, 10), "section_view": (5.0, 1)
+    }
+    assert parse_policy("") == {}
+
+
+def test_rate_meter_carries_the_previous_second():
+    meter = RateMeter()
+    assert [meter.hit(0.1) for _ in range(3)] == [1, 2, 3]
+    assert meter.hit(1.5) == 3
+    # A skipped second resets the rate
+    assert meter.hit(3.0) == 1
+
+
+def test_keeps_everything_up_to_the_threshold(clock):
+    sampler = InteractionSampler(policies={"scroll": (3, 10)}, clock=clock, rng=lambda: 0.99)
+    assert [sampler.weight("scroll") for _ in range(5)] == [1, 1, 1, 0, 0]
+    assert sampler.weight("click") == 1
+    assert sampler.stats == {"seen": 5, "kept": 3, "weighted": 0, "dropped": 2}
+
+    clock.now = 10
+    assert sampler.weight("scroll") == 1
+
+
+def test_kept_events_carry_keep_one_in_as_weight(clock):
+    draws = iter([0.05, 0.5])
+    sampler = InteractionSampler(policies={"scroll": (0, 10)}, clock=clock, rng=lambda: next(draws))
+    assert sampler.weight("scroll") == 10
+    assert sampler.weight("scroll") == 0
+
+
+def test_event_id_decides_the_same_way_every_time(clock):
+    sampler = InteractionSampler(policies={"scroll": (0, 4)}, clock=clock)
+    event_ids = [f"interaction-{number:04d}" for number in range(4000)]
+    weights = [sampler.weight("scroll", event_id) for event_id in event_ids]
+    assert weights == [sampler.weight("scroll", event_id) for event_id in event_ids]
+    assert set(weights) == {0, 4}
+    # Weighted totals stay close to the true count
+    assert abs(sum(weights) - len(event_ids)) < 0.1 * len(event_ids)
+
+
+def test_sampled_batch_counts_by_weight(api, clock, run):
+    sampler = api.app.state.services.sampler
+    sampler.policies = {"scroll": (1, 2)}
+    sampler.clock = clock
+    # Draws alternate between kept and dropped
+    draws = iter([0.1, 0.9] * 10)
+    sampler.rng = lambda: next(draws)
+
+    events = [{"type": "interaction", "action": "scroll", "page": "/", "session_id": "s1"} for _ in range(5)]
+    body = api.post("/api/analytics/batch", json={"events": events}).json()
+    assert [result["status"] for result in body["results"]] == ["accepted", "accepted", "sampled", "accepted", "sampled"]
+    assert body["sampled"] == 2
+
+    db = api.app.state.mongo.db
+    weights = run(db.user_interactions.distinct("weight"))
+    rollup = run(db.rollup_interactions_daily.find_one({"action": "scroll"}))
+    assert sorted(weights) == [1, 2]
+    assert rollup["count"] == 5
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+from services.sessions import SESSION_COLLECTION, Sessionizer, session_stats
+
+START = datetime(2024, 1, 1)
+
+
+def page_view(event_id, session_id, minutes, page="/"):
+    return {
+        "id": event_id, "page": page, "session_id": session_id,
+        "timestamp": START + timedelta(minutes=minutes), "ip_address": "10.0.0.1"
+    }
+
+
+async def sessions_by_start(db):
+    sessions = await db[SESSION_COLLECTION].find({}, {"_id": 0}).sort("start_time", 1).to_list(None)
+    return [
+        (session["session_id"], session["pages_visited"], session["total_duration"], session["closed"])
+        for session in sessions
+    ]
+
+
+def test_gap_splits_a_visitor_into_two_sessions(run, db):
+    async def scenario():
+        await db.page_views.insert_many([
+            page_view("a0", "s1", 0, "/"),
+            page_view("a1", "s1", 10, "/projects"),
+            # 40 minutes idle: past the 30 minute gap
+            page_view("a2", "s1", 50, "/contact"),
+        ])
+        sessionizer = Sessionizer(gap=1800, settle=0)
+        processed = await sessionizer.run_once(db, now=START + timedelta(hours=2))
+        return processed, await sessions_by_start(db), await session_stats(db, START, START + timedelta(days=1))
+
+    processed, sessions, stats = run(scenario())
+    assert processed == {"events": 3, "opened": 2, "closed": 2}
+    assert sessions == [
+        ("s1", ["/", "/projects"], 600, True),
+        ("s1", ["/contact"], 0, True),
+    ]
+    assert stats == {"sessions": 2, "avg_session_duration": 300.0, "bounce_rate": 0.5}
+
+
+def test_events_within_the_gap_extend_one_session_across_runs(run, db):
+    async def scenario():
+        sessionizer = Sessionizer(gap=1800, settle=0)
+        await db.page_views.insert_one(page_view("a0", "s1", 0, "/"))
+        await sessionizer.run_once(db, now=START + timedelta(minutes=1))
+        await db.page_views.insert_one(page_view("a1", "s1", 20, "/about"))
+        await db.user_interactions.insert_one({
+            "id": "i0", "page": "/about", "session_id": "s1",
+            "timestamp": START + timedelta(minutes=21), "weight": 5
+        })
+        await sessionizer.run_once(db, now=START + timedelta(minutes=30))
+        return await db[SESSION_COLLECTION].find({}, {"_id": 0}).to_list(None)
+
+    sessions = run(scenario())
+    assert len(sessions) == 1
+    assert sessions[0]["pages_visited"] == ["/", "/about"]
+    assert sessions[0]["interactions_count"] == 5
+    assert sessions[0]["closed"] is False
+
+
+def test_events_sharing_a_timestamp_are_not_skipped_between_chunks(run, db):
+    async def scenario():
+        await db.page_views.insert_many([page_view(f"e{number}", f"s{number}", 0) for number in range(7)])
+        sessionizer = Sessionizer(gap=1800, settle=0, chunk_size=3)
+        return await sessionizer.run_once(db, now=START + timedelta(minutes=1))
+
+    assert run(scenario())["events"] == 7
+
+
+def test_events_younger_than_settle_delay_wait_for_the_next_run(run, db):
+    async def scenario():
+        await db.page_views.insert_many([page_view("a0", "s1", 0), page_view("a1", "s2", 9)])
+        sessionizer = Sessionizer(gap=1800, settle=120)
+        first = await sessionizer.run_once(db, now=START + timedelta(minutes=10))
+        second = await sessionizer.run_once(db, now=START + timedelta(minutes=12))
+        return first, second
+
+    first, second = run(scenario())
+    assert first["events"] == 1
+    assert second["events"] == 1
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+from routes.analytics import _contact_facets
+from services.rollups import apply_rollups, page_view_facets
+
+START = datetime(2024, 1, 1)
+
+
+def test_page_view_facets_totals_pages_and_days(run, db):
+    page_views = [
+        {"page": page, "timestamp": START + timedelta(hours=hours)}
+        for page, hours in [("/", 1), ("/", 2), ("/", 30), ("/projects", 3), ("/projects", 26), ("/contact", 50)]
+    ]
+
+    async def scenario():
+        await apply_rollups(db, "page_views", page_views)
+        return await page_view_facets(db, START, START + timedelta(days=3), limit=2, include_daily=True)
+
+    facets = run(scenario())
+    assert facets["total_views"] == 6
+    assert [(page["page"], page["views"]) for page in facets["popular_pages"]] == [("/", 3), ("/projects", 2)]
+    assert [(day["date"], day["views"]) for day in facets["daily_views"]] == [
+        (START, 3), (START + timedelta(days=1), 2), (START + timedelta(days=2), 1)
+    ]
+
+
+def test_page_view_facets_of_an_empty_window(run, db):
+    facets = run(page_view_facets(db, START, START + timedelta(days=1)))
+    assert facets == {"total_views": 0, "popular_pages": [], "daily_views": []}
+
+
+def test_contact_facets_count_and_recent_without_message_bodies(run, db):
+    async def scenario():
+        await db.contact_messages.insert_many([
+            {"name": f"sender {number}", "message": "private", "created_at": START + timedelta(hours=number)}
+            for number in range(7)
+        ])
+        return (
+            await _contact_facets(db, START, START + timedelta(days=1), include_recent=True),
+            await _contact_facets(db, START, START + timedelta(days=1), include_recent=False),
+            await _contact_facets(db, START - timedelta(days=2), START - timedelta(days=1), include_recent=True),
+        )
+
+    with_recent, count_only, empty = run(scenario())
+    assert with_recent["count"] == 7
+    assert [message["name"] for message in with_recent["recent"]] == [f"sender {number}" for number in range(6, 1, -1)]
+    assert all("message" not in message for message in with_recent["recent"])
+    assert count_only == {"count": 7, "recent": []}
+    assert empty == {"count": 0, "recent": []}
+
+
+def test_summary_reads_every_collection_in_one_response(api):
+    api.post("/api/analytics/batch", json={"events": [
+        {"type": "pageview", "page": "/", "session_id": "s1", "referrer": "https://github.com"},
+        {"type": "pageview", "page": "/", "session_id": "s2"},
+        {"type": "pageview", "page": "/projects", "session_id": "s1"},
+    ]})
+
+    response = api.get("/api/analytics/summary?days=1&exact=true", headers={"X-Debug-Timing": "1"})
+    assert response.status_code == 200
+    summary = response.json()
+    assert summary["total_views"] == 3
+    assert summary["unique_visitors"] == 1
+    assert [(page["page"], page["views"]) for page in summary["popular_pages"]] == [("/", 2), ("/projects", 1)]
+    assert [(referrer["referrer"], referrer["count"]) for referrer in summary["top_referrers"]] == [
+        ("https://github.com", 1)
+    ]
+    assert summary["contact_form_submissions"] == 0
+
+    # Queries finish in any order; each is timed once
+    timed = {entry.split(";")[0] for entry in response.headers["Server-Timing"].split(", ")}
+    assert timed == {"page_view_rollups", "referrer_rollups", "uniques", "contact_messages", "sessions", "total"}